@@ -0,0 +1,127 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken to evaluate the calculations of a calculationset
+# converted from a REDCap data dictionary for a large batch of assessments
+# with evaluate_batch, on NumPy arrays and one assessment at a time.
+#
+# Usage:
+#
+#   python benchmarks/batch_evaluation.py [--rows N] [--scalar-rows M]
+#
+# The calculationset has the calculations of a synthetic data dictionary
+# (means of several fields) and BMI and age calculations. The evaluation
+# one assessment at a time is timed on the first M rows only, and
+# extrapolated to N rows.
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import random
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+EXTRA_CALCULATIONS = (
+    'bmi,form_0,,calc,BMI,"round(([weight]*10000)/(([height])^(2)),1)"'
+    + ',' * 12 + '\n'
+    'age,form_0,,calc,Age,"rounddown(datediff([dob],\'2020-01-01\',\'y\'),0)"'
+    + ',' * 12 + '\n'
+)
+
+
+def make_columns(calculationset, rows):
+    rng = random.Random(0)
+    names = set()
+    for calculation in calculationset['calculations']:
+        expression = calculation['options']['expression']
+        names.update(
+            part.split('"]')[0]
+            for part in expression.split('assessment["')[1:]
+        )
+    columns = dict(
+        (name, [rng.randint(1, 5) for _ in range(rows)])
+        for name in names
+    )
+    columns['weight'] = [rng.uniform(40, 120) for _ in range(rows)]
+    columns['height'] = [rng.uniform(140, 210) for _ in range(rows)]
+    columns['dob'] = [
+        '%04d-%02d-%02d' % (
+            rng.randint(1930, 2010),
+            rng.randint(1, 12),
+            rng.randint(1, 28),
+        )
+        for _ in range(rows)
+    ]
+    # About 1% of values are missing
+    for values in columns.values():
+        for index in range(0, rows, 97):
+            values[index] = None
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--scalar-rows', type=int, default=50000)
+    parser.add_argument('--fields', type=int, default=100)
+    args = parser.parse_args()
+    common.use_source_tree(SRC)
+    from rios.conversion import redcap_to_rios
+    from rios.conversion.redcap import evaluate_batch
+
+    text = common.redcap_dictionary(args.fields) + EXTRA_CALCULATIONS
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    calculationset = redcap_to_rios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=io.StringIO(text),
+    )['calculationset']
+    columns = make_columns(calculationset, args.rows)
+    print('%d calculations, %d assessments' % (
+        len(calculationset['calculations']),
+        args.rows,
+    ))
+
+    try:
+        import numpy
+    except ImportError:
+        print('numpy       not installed')
+    else:
+        arrays = dict(
+            (name, numpy.asarray(values, dtype=(
+                float if name != 'dob' else object)))
+            for name, values in columns.items()
+        )
+        start = time.time()
+        evaluate_batch(calculationset, arrays, use_numpy=True)
+        seconds = time.time() - start
+        print('numpy    %10.2f s %12.0f assessments/s' % (
+            seconds,
+            args.rows / seconds,
+        ))
+
+    sample = dict(
+        (name, values[:args.scalar_rows])
+        for name, values in columns.items()
+    )
+    start = time.time()
+    evaluate_batch(calculationset, sample, use_numpy=False)
+    seconds = (time.time() - start) * args.rows / args.scalar_rows
+    print('scalar   %10.2f s %12.0f assessments/s (extrapolated)' % (
+        seconds,
+        args.rows / seconds,
+    ))
+
+
+if __name__ == '__main__':
+    main()
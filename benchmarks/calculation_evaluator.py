@@ -0,0 +1,117 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken to score one assessment with the calculations of
+# a calculationset converted from a REDCap data dictionary:
+#
+# - by evaluating each expression string, as is
+# - with a CalculationEvaluator, with and without timing counters
+# - with get_evaluator, which also looks the evaluator up by the hash of
+#   the calculationset for every assessment
+#
+# Usage:
+#
+#   python benchmarks/calculation_evaluator.py [--assessments N]
+#
+# The calculationset is that of benchmarks/batch_evaluation.py.
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import math
+import os
+import time
+
+import batch_evaluation
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--assessments', type=int, default=20000)
+    parser.add_argument('--fields', type=int, default=100)
+    args = parser.parse_args()
+    common.use_source_tree(SRC)
+    import rios.conversion.redcap.functions  # noqa: F401
+    from rios.conversion import redcap_to_rios
+    from rios.conversion.redcap import CalculationEvaluator, get_evaluator
+
+    text = common.redcap_dictionary(args.fields) \
+        + batch_evaluation.EXTRA_CALCULATIONS
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    calculationset = redcap_to_rios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=io.StringIO(text),
+    )['calculationset']
+    columns = batch_evaluation.make_columns(calculationset, args.assessments)
+    assessments = [
+        dict((name, values[index]) for name, values in columns.items())
+        for index in range(args.assessments)
+    ]
+
+    expressions = [
+        (calculation['id'], calculation['options']['expression'])
+        for calculation in calculationset['calculations']
+    ]
+    namespace = {'rios': rios, 'math': math}
+
+    def strings(values):
+        calculations = {}
+        for name, expression in expressions:
+            try:
+                calculations[name] = eval(expression, namespace, {
+                    'assessment': values,
+                    'calculations': calculations,
+                })
+            except Exception:
+                calculations[name] = None
+        return calculations
+
+    evaluator = CalculationEvaluator(calculationset)
+    untimed = CalculationEvaluator(calculationset, timing=False)
+    methods = [
+        ('expression strings', strings),
+        ('evaluator', evaluator.evaluate),
+        ('evaluator, no timing', untimed.evaluate),
+        ('get_evaluator', lambda values:
+            get_evaluator(calculationset).evaluate(values)),
+    ]
+
+    print('%d calculations, %d assessments' % (
+        len(expressions),
+        args.assessments,
+    ))
+    for name, method in methods:
+        start = time.time()
+        for values in assessments:
+            method(values)
+        seconds = time.time() - start
+        print('%-22s %8.1f us/assessment' % (
+            name,
+            seconds * 1e6 / args.assessments,
+        ))
+
+    print('\nslowest calculations (evaluator):')
+    slowest = sorted(
+        evaluator.timings.items(),
+        key=lambda item: -item[1].seconds,
+    )
+    for name, timing in slowest[:3]:
+        print('  %-8s %6.2f us %6d errors' % (
+            name,
+            timing.mean * 1e6,
+            timing.errors,
+        ))
+
+
+if __name__ == '__main__':
+    main()
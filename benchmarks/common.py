@@ -0,0 +1,114 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Helpers shared by the benchmark scripts.
+
+
+from __future__ import print_function
+
+import os
+import resource
+import subprocess
+import sys
+
+
+REDCAP_COLUMNS = [
+    "Variable / Field Name",
+    "Form Name",
+    "Section Header",
+    "Field Type",
+    "Field Label",
+    "Choices, Calculations, OR Slider Labels",
+    "Field Note",
+    "Text Validation Type OR Show Slider Number",
+    "Text Validation Min",
+    "Text Validation Max",
+    "Identifier?",
+    "Branching Logic (Show field only if...)",
+    "Required Field?",
+    "Custom Alignment",
+    "Question Number (surveys only)",
+    "Matrix Group Name",
+    "Matrix Ranking?",
+    "Field Annotation",
+]
+
+SCALE = "1, Never | 2, Rarely | 3, Sometimes | 4, Often | 5, Always"
+
+
+def _quote(cell):
+    if any(c in cell for c in ',"\n'):
+        return '"%s"' % cell.replace('"', '""')
+    return cell
+
+
+def redcap_dictionary(fields, fields_per_form=500):
+    """
+    Returns the text of a synthetic REDCap data dictionary with `fields`
+    rows that mixes the common field types, matrices, branching logic, and
+    calculations.
+    """
+
+    lines = [','.join(_quote(c) for c in REDCAP_COLUMNS)]
+    for i in range(fields):
+        form = 'form_%d' % (i // fields_per_form)
+        kind = i % 10
+        row = ['q%d' % i, form, '', 'text', 'Question %d' % i] + [''] * 13
+        if kind in (0, 1):
+            row[3] = 'radio'
+            row[5] = SCALE
+        elif kind == 2:
+            row[3] = 'checkbox'
+            row[5] = SCALE
+        elif kind == 3:
+            row[3] = 'yesno'
+        elif kind == 4:
+            row[3] = 'dropdown'
+            row[5] = SCALE
+            row[11] = '[q%d] = "1"' % (i - 4)
+        elif kind == 5:
+            row[7] = 'integer'
+            row[8] = '0'
+            row[9] = '100'
+        elif kind == 6:
+            row[3] = 'notes'
+        elif kind in (7, 8):
+            row[3] = 'radio'
+            row[5] = SCALE
+            row[15] = 'matrix_%d' % (i // 10)
+        else:
+            row[3] = 'calc'
+            row[5] = 'round(mean([q%d], [q%d], [q%d]) * 2, 1)' % (
+                i - 9, i - 8, i - 4)
+        lines.append(','.join(_quote(c) for c in row))
+    return '\n'.join(lines) + '\n'
+
+
+def peak_rss():
+    """ Returns the peak resident set size of this process in bytes """
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def use_source_tree(src):
+    """
+    Makes ``import rios.conversion`` load the package found in the `src`
+    directory of another checkout, e.g. one made with ``git worktree add``.
+    """
+
+    import rios
+    rios.__path__[:] = [os.path.join(os.path.abspath(src), 'rios')] + [
+        path
+        for path in rios.__path__
+        if os.path.isdir(os.path.join(path, 'core'))
+    ]
+
+
+def run_child(script, args):
+    """ Runs `script` with `args` in a fresh interpreter; returns stdout """
+
+    return subprocess.check_output(
+        [sys.executable, script] + list(args),
+        universal_newlines=True,
+    )
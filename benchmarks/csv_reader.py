@@ -0,0 +1,83 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the throughput, in rows per second, of reading a large REDCap
+# data dictionary with CsvReader in its default mode (OrderedDict rows, a
+# regular expression applied to every line), in fast mode (CsvRow tuples,
+# universal newlines), and in fast mode with a memory-mapped file.
+#
+# Usage:
+#
+#   python benchmarks/csv_reader.py [--fields N] [--repeat R]
+#
+# The data dictionary is written with "\r\n" line endings, as REDCap
+# exports are, to a temporary file which is read by name.
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+MODES = [
+    ('default', dict()),
+    ('fast', dict(fast=True)),
+    ('fast, mmap', dict(fast=True, mmap=True)),
+]
+
+
+def read(fname, options):
+    from rios.conversion.utils import CsvReader
+
+    start = time.time()
+    count = 0
+    for row in CsvReader(fname, **options):
+        row['Field Type']
+        count += 1
+    return count, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    common.use_source_tree(SRC)
+
+    text = common.redcap_dictionary(args.fields)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    fd, fname = tempfile.mkstemp(suffix='.csv')
+    try:
+        with io.open(fd, 'w', encoding='utf-8', newline='\r\n') as fo:
+            fo.write(text)
+        print('%d rows, %.1f MB' % (
+            args.fields,
+            os.path.getsize(fname) / 1e6,
+        ))
+        for name, options in MODES:
+            best = min(
+                read(fname, options)[1]
+                for _ in range(args.repeat)
+            )
+            print('%-12s %8.3f s %10.0f rows/s' % (
+                name,
+                best,
+                args.fields / best,
+            ))
+    finally:
+        os.remove(fname)
+
+
+if __name__ == '__main__':
+    main()
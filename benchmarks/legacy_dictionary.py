@@ -0,0 +1,137 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken to convert a large legacy format REDCap data
+# dictionary, whose enumeration rows repeat a few JSON "data_type" choice
+# lists. Validation is skipped, so the figures are those of the processor.
+#
+# Usage:
+#
+#   python benchmarks/legacy_dictionary.py [--fields N] [--baseline SRC]
+#
+# SRC is the src directory of another checkout to compare against, e.g.:
+#
+#   git worktree add /tmp/baseline <commit>
+#   python benchmarks/legacy_dictionary.py --baseline /tmp/baseline/src
+#
+# Legacy data dictionaries with choices only convert on Python 2 before
+# the choices were decoded with ParsedChoices.from_data_type.
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+LEGACY_COLUMNS = [
+    'fieldID',
+    'text',
+    'data_type',
+    'page',
+    'repeating_group_name',
+    'help',
+    'error',
+    'enumeration_type',
+]
+
+SCALES = [
+    json.dumps({'Choices': [
+        {'never': 'Never'},
+        {'rarely': 'Rarely'},
+        {'sometimes': 'Sometimes'},
+        {'often': 'Often'},
+        {'always': 'Always'},
+    ]}, indent=4),
+    json.dumps({'choices': [
+        {'yes': 'Yes'},
+        {'no': 'No'},
+        {'unknown': 'Unknown'},
+    ]}, indent=4),
+]
+
+
+def legacy_dictionary(fields, fields_per_page=100):
+    """
+    Returns the text of a synthetic legacy REDCap data dictionary with
+    `fields` rows, most of which are enumerations.
+    """
+
+    lines = [','.join(LEGACY_COLUMNS)]
+    for i in range(fields):
+        page = 'p%d' % (i // fields_per_page)
+        kind = i % 5
+        if kind == 4:
+            data_type, enumeration_type = 'text', ''
+        else:
+            data_type = SCALES[kind % 2]
+            enumeration_type = 'enumerationSet' if kind == 2 \
+                else 'enumeration'
+        row = [
+            'q%d' % i,
+            'Question %d' % i,
+            data_type,
+            page,
+            '',
+            '',
+            '',
+            enumeration_type,
+        ]
+        lines.append(','.join(common._quote(c) for c in row))
+    return '\n'.join(lines) + '\n'
+
+
+def child(src, fields):
+    common.use_source_tree(src)
+    from rios.conversion.redcap.to_rios import RedcapToRios
+
+    text = legacy_dictionary(fields)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    start = time.time()
+    converter = RedcapToRios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=io.StringIO(text),
+    )
+    converter.validate = lambda: None
+    converter()
+    print(json.dumps({'seconds': time.time() - start}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=20000)
+    parser.add_argument('--baseline')
+    parser.add_argument('--child')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.fields)
+
+    trees = [('current', SRC)]
+    if args.baseline:
+        trees.insert(0, ('baseline', args.baseline))
+    print('Converting a %d field legacy REDCap data dictionary' % (
+        args.fields,
+    ))
+    for name, src in trees:
+        result = json.loads(common.run_child(
+            __file__,
+            ['--child', src, '--fields', str(args.fields)],
+        ))
+        print('%-10s %8.2f s' % (name, result['seconds']))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time to convert the rows of a large REDCap data dictionary
+# serially and with RedcapToRios(workers=N). Validation is skipped, because
+# it runs serially after the rows are converted.
+#
+# Usage:
+#
+#   python benchmarks/parallel_conversion.py [--fields N] [--workers N ...]
+#
+# Note that the speed-up is bounded by the number of CPUs available.
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import multiprocessing
+import os
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def convert(text, workers):
+    from rios.conversion.redcap.to_rios import RedcapToRios
+
+    converter = RedcapToRios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=io.StringIO(text),
+        workers=workers,
+    )
+    converter.validate = lambda: None
+    start = time.time()
+    converter()
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='*', default=[2, 4])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    common.use_source_tree(SRC)
+
+    text = common.redcap_dictionary(args.fields)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    print('Converting a %d field REDCap data dictionary on %d CPUs' % (
+        args.fields,
+        multiprocessing.cpu_count(),
+    ))
+    print('%-10s %10s' % ('workers', 's'))
+    for workers in [None] + args.workers:
+        best = min(convert(text, workers) for _ in range(args.repeat))
+        print('%-10s %10.2f' % (workers or 'serial', best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken, and the peak memory allocated (with tracemalloc,
+# so on Python 3 only), to convert a Qualtrics *.qsf file whose questions
+# are those of tests/qualtrics/qualtrics_health.qsf, but which also holds
+# large graphics and translation survey elements, as exported surveys with
+# images and several languages do, with the id, title, and description
+# given, and read from the file (filemetadata).
+#
+# Usage:
+#
+#   python benchmarks/qsf_reader.py [--megabytes M] [--baseline SRC]
+#
+# SRC is the src directory of another checkout to compare against, e.g.:
+#
+#   git worktree add /tmp/baseline <commit>
+#   python benchmarks/qsf_reader.py --baseline /tmp/baseline/src
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+QSF = os.path.join(
+    os.path.dirname(HERE),
+    'tests',
+    'qualtrics',
+    'qualtrics_health.qsf',
+)
+
+
+def padded_qsf(fname, megabytes):
+    """
+    Writes to `fname` the survey of qualtrics_health.qsf with about
+    `megabytes` of graphics and translation survey elements added.
+    """
+
+    with open(QSF, 'r') as stream:
+        document = json.load(stream)
+    image = ('iVBORw0KGgo\\/AAAANSUhEUgAA' * 40)[:1000]
+    elements = document['SurveyElements']
+    for i in range(megabytes):
+        elements.append({
+            'SurveyID': document['SurveyEntry']['SurveyID'],
+            'Element': 'GR',
+            'PrimaryAttribute': 'Graphic_%d' % i,
+            'Payload': {
+                'Graphic_%d_%d' % (i, j): {'Data': image, 'Alt': '[{"}'}
+                for j in range(1000)
+            },
+        })
+    elements.append({
+        'SurveyID': document['SurveyEntry']['SurveyID'],
+        'Element': 'TR',
+        'Payload': [
+            {'QID%d' % i: {'QuestionText': u'Question \u00e9 %d' % i}}
+            for i in range(10000)
+        ],
+    })
+    with open(fname, 'w') as stream:
+        json.dump(document, stream)
+
+
+def child(src, fname, filemetadata):
+    common.use_source_tree(src)
+    from rios.conversion import qualtrics_to_rios
+
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    with open(fname, 'r') as stream:
+        if filemetadata == 'yes':
+            qualtrics_to_rios(stream=stream, filemetadata=True)
+        else:
+            qualtrics_to_rios(
+                stream=stream,
+                instrument_version='1.0',
+                title='Benchmark',
+                description='',
+                id='urn:benchmark',
+            )
+    print(json.dumps({
+        'peak': tracemalloc.get_traced_memory()[1] if tracemalloc else None,
+        'seconds': time.time() - start,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--megabytes', type=int, default=100)
+    parser.add_argument('--baseline')
+    parser.add_argument('--child', nargs=3)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+
+    fd, fname = tempfile.mkstemp(suffix='.qsf')
+    os.close(fd)
+    try:
+        padded_qsf(fname, args.megabytes)
+        trees = [('current', SRC)]
+        if args.baseline:
+            trees.insert(0, ('baseline', args.baseline))
+        print('Converting a %.1f MB Qualtrics file' % (
+            os.path.getsize(fname) / 1048576.0,
+        ))
+        print('%-10s %13s %10s %10s' % (
+            'tree', 'filemetadata', 'peak MB', 's',
+        ))
+        for name, src in trees:
+            for filemetadata in ('no', 'yes'):
+                result = json.loads(common.run_child(
+                    __file__,
+                    ['--child', src, fname, filemetadata],
+                ))
+                print('%-10s %13s %10s %10.2f' % (
+                    name,
+                    filemetadata,
+                    '%.1f' % (result['peak'] / 1048576.0)
+                    if result['peak'] is not None
+                    else 'n/a',
+                    result['seconds'],
+                ))
+    finally:
+        os.unlink(fname)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
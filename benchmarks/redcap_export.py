@@ -0,0 +1,134 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures writing the REDCap data dictionary of a large RIOS instrument to
+# a CSV file:
+#
+# - rows: converting all of its rows with RedcapFromRios, then writing
+#   them with csv.writer
+# - write_csv: writing each row as it is converted, with
+#   RedcapFromRios.write_csv
+#
+# Each is run in a fresh interpreter, which loads the RIOS definitions
+# before measuring the peak memory allocated while writing (with
+# tracemalloc, so on Python 3 only), the total time, and the time until the
+# first row is written.
+#
+# Usage:
+#
+#   python benchmarks/redcap_export.py [--fields N]
+
+
+from __future__ import print_function
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+class TimedFile(object):
+    """ A write-only null file which records the time of its first write """
+
+    def __init__(self):
+        self.first = None
+
+    def write(self, data):
+        if self.first is None:
+            self.first = time.time()
+
+
+def child(definitions, mode):
+    common.use_source_tree(SRC)
+    from rios.conversion.redcap.from_rios import RedcapFromRios
+
+    with io.open(definitions, encoding='utf-8') as fi:
+        kwargs = json.load(fi)
+    if tracemalloc:
+        tracemalloc.start()
+    output = TimedFile()
+    start = time.time()
+    converter = RedcapFromRios(**kwargs)
+    if mode == 'rows':
+        converter()
+        writer = csv.writer(output)
+        for row in converter.instrument[0]:
+            writer.writerow(row)
+    else:
+        converter.write_csv(output)
+    elapsed = time.time() - start
+    print(json.dumps({
+        'peak': tracemalloc.get_traced_memory()[1] if tracemalloc else None,
+        'seconds': elapsed,
+        'first': output.first - start,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=20000)
+    parser.add_argument('--child', nargs=2)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+
+    common.use_source_tree(SRC)
+    from rios.conversion.redcap.to_rios import RedcapToRios
+
+    text = common.redcap_dictionary(args.fields)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    converter = RedcapToRios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=io.StringIO(text),
+    )
+    converter.validate = lambda: None
+    converter()
+    fd, definitions = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as fo:
+        json.dump({
+            'instrument': converter.instrument,
+            'form': converter.form,
+            'calculationset': converter.calculationset,
+        }, fo)
+
+    print('Writing the REDCap data dictionary of %d fields' % args.fields)
+    print('%-10s %14s %10s %14s' % ('mode', 'peak MB', 's', 'first row s'))
+    try:
+        for mode in ('rows', 'write_csv'):
+            result = json.loads(common.run_child(
+                __file__,
+                ['--child', definitions, mode],
+            ))
+            print('%-10s %14s %10.2f %14.3f' % (
+                mode,
+                '%.1f' % (result['peak'] / 1048576.0)
+                if result['peak'] is not None
+                else 'n/a',
+                result['seconds'],
+                result['first'],
+            ))
+    finally:
+        os.unlink(definitions)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
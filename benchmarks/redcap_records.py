@@ -0,0 +1,156 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the throughput, in records per second, and the peak memory of
+# converting REDCap record exports of growing sizes into RIOS assessments
+# with redcap_records_to_rios_assessments. Peak memory should not grow
+# with the number of records.
+#
+# Usage:
+#
+#   python benchmarks/redcap_records.py [--fields N] [--records R [R ...]]
+#
+# Each conversion runs in a fresh interpreter, so its peak memory is its
+# own. The exports are written record by record to temporary files, in the
+# flat CSV and JSON formats.
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def export_columns(fields):
+    """ Returns the columns and a cell value of each, for `fields` rows """
+
+    columns = [('record_id', None)]
+    for i in range(fields):
+        kind = i % 10
+        if kind == 2:
+            columns.extend(
+                ('q%d___%d' % (i, code), str(code % 2))
+                for code in range(1, 6)
+            )
+        elif kind == 5:
+            columns.append(('q%d' % i, '42'))
+        elif kind == 6:
+            columns.append(('q%d' % i, 'Some notes, "quoted"'))
+        elif kind == 9:
+            columns.append(('q%d' % i, '3.5'))
+        else:
+            # radio, dropdown, yesno, and matrix rows
+            columns.append(('q%d' % i, '1'))
+    return columns
+
+
+def write_export(fname, format, fields, records):
+    columns = export_columns(fields)
+    with io.open(fname, 'w', encoding='utf-8', newline='') as fo:
+        if format == 'csv':
+            fo.write(u','.join(name for name, _ in columns) + u'\r\n')
+        else:
+            fo.write(u'[')
+        for record in range(records):
+            values = [str(record)] + [value for _, value in columns[1:]]
+            if format == 'csv':
+                fo.write(u','.join(
+                    u'"%s"' % v.replace('"', '""') if ',' in v else v
+                    for v in values
+                ) + u'\r\n')
+            else:
+                fo.write(u'%s%s' % (
+                    u',\n' if record else u'',
+                    json.dumps(dict(zip(
+                        (name for name, _ in columns),
+                        values,
+                    ))),
+                ))
+        if format == 'json':
+            fo.write(u']\n')
+
+
+def child(format, fields, records):
+    common.use_source_tree(SRC)
+    from rios.conversion import (
+        redcap_to_rios,
+        redcap_records_to_rios_assessments,
+    )
+
+    text = common.redcap_dictionary(fields)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    instrument = redcap_to_rios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=io.StringIO(text),
+    )['instrument']
+    fd, fname = tempfile.mkstemp(suffix='.' + format)
+    os.close(fd)
+    try:
+        write_export(fname, format, fields, records)
+        size = os.path.getsize(fname)
+        start = time.time()
+        count = 0
+        for _ in redcap_records_to_rios_assessments(
+                instrument,
+                fname,
+                format=format,
+                record_id_field='record_id'):
+            count += 1
+        seconds = time.time() - start
+    finally:
+        os.remove(fname)
+    assert count == records
+    print(json.dumps([size, seconds, common.peak_rss()]))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        format, fields, records = sys.argv[2:5]
+        child(format, int(fields), int(records))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=200)
+    parser.add_argument(
+        '--records',
+        type=int,
+        nargs='+',
+        default=[1000, 10000, 100000],
+    )
+    args = parser.parse_args()
+
+    print('%d data dictionary fields' % args.fields)
+    print('%-6s %9s %9s %9s %12s %14s' % (
+        'format', 'records', 'MB', 'seconds', 'records/s', 'peak RSS MB'))
+    for format in ('csv', 'json'):
+        for records in args.records:
+            size, seconds, peak = json.loads(common.run_child(
+                __file__,
+                ['--child', format, str(args.fields), str(records)],
+            ))
+            print('%-6s %9d %9.1f %9.2f %12.0f %14.1f' % (
+                format,
+                records,
+                size / 1e6,
+                seconds,
+                records / seconds,
+                peak / 1e6,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken to translate long RIOS calculation expressions,
+# with hundreds of variable references, into REDCap expressions with
+# RedcapFromRios.convert_rexl_expression and convert_variables.
+#
+# Usage:
+#
+#   python benchmarks/rexl_expressions.py [--references N [N ...]]
+#                                         [--baseline SRC]
+#
+# SRC is the src directory of another checkout to compare against, e.g.:
+#
+#   git worktree add /tmp/baseline <commit>
+#   python benchmarks/rexl_expressions.py --baseline /tmp/baseline/src
+#
+# "first" times translations of distinct expressions, "repeated" times the
+# translation of an expression translated before, which current trees
+# memoize, and "variables" times convert_variables alone.
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+FUNCTIONS = 'rios.conversion.redcap.functions.'
+
+
+def scoring_expression(references, salt):
+    """
+    Returns a scoring expression which sums `references` assessment values,
+    some of them squared, and compares a calculation to `salt`.
+    """
+
+    terms = []
+    for i in range(references):
+        if i % 10 == 0:
+            terms.append('math.pow(assessment["q%d"], 2)' % i)
+        else:
+            terms.append('assessment["q%d"]' % i)
+    return '%sround_(%ssum_(%s), 1) != calculations["c%d"]' % (
+        FUNCTIONS,
+        FUNCTIONS,
+        ', '.join(terms),
+        salt,
+    )
+
+
+def measure(function, expressions, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        for expression in expressions:
+            function(expression)
+    return (time.time() - start) * 1e3 / (repeat * len(expressions))
+
+
+def child(src, references):
+    common.use_source_tree(src)
+    from rios.conversion.redcap.from_rios import RedcapFromRios
+
+    converter = RedcapFromRios.__new__(RedcapFromRios)
+    results = {}
+    for count in references:
+        number = max(1, 2000 // count)
+        distinct = [scoring_expression(count, i) for i in range(number)]
+        same = [scoring_expression(count, -1)]
+        converter.convert_rexl_expression(same[0])
+        results[count] = {
+            'first': measure(converter.convert_rexl_expression, distinct, 1),
+            'repeated': measure(
+                converter.convert_rexl_expression,
+                same,
+                number,
+            ),
+            'variables': measure(
+                RedcapFromRios.convert_variables,
+                distinct,
+                1,
+            ),
+        }
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--references',
+        type=int,
+        nargs='+',
+        default=[100, 500, 2000],
+    )
+    parser.add_argument('--baseline')
+    parser.add_argument('--child')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.references)
+
+    trees = [('current', SRC)]
+    if args.baseline:
+        trees.insert(0, ('baseline', args.baseline))
+    print('%-10s %10s %12s %12s %12s' % (
+        'tree', 'references', 'first ms', 'repeated ms', 'variables ms',
+    ))
+    for name, src in trees:
+        results = json.loads(common.run_child(
+            __file__,
+            ['--child', src, '--references']
+            + [str(count) for count in args.references],
+        ))
+        for count in args.references:
+            result = results[str(count)]
+            print('%-10s %10d %12.3f %12.3f %12.3f' % (
+                name,
+                count,
+                result['first'],
+                result['repeated'],
+                result['variables'],
+            ))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken to convert a large multi-form REDCap data
+# dictionary into one instrument, and into one instrument per form with
+# redcap_to_rios(split_forms=True), serially and on a process pool.
+#
+# Usage:
+#
+#   python benchmarks/split_forms.py [--fields N] [--fields-per-form M]
+#                                    [--workers W]
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=20000)
+    parser.add_argument('--fields-per-form', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    common.use_source_tree(SRC)
+    from rios.conversion import redcap_to_rios
+
+    text = common.redcap_dictionary(args.fields, args.fields_per_form)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+
+    def convert(**kwargs):
+        start = time.time()
+        payload = redcap_to_rios(
+            id='urn:benchmark',
+            title='Benchmark',
+            description='',
+            stream=io.StringIO(text),
+            **kwargs
+        )
+        return payload, time.time() - start
+
+    print('%d fields, %d forms' % (
+        args.fields,
+        -(-args.fields // args.fields_per_form),
+    ))
+    _, seconds = convert()
+    print('%-24s %8.2f s' % ('one instrument', seconds))
+    payload, seconds = convert(split_forms=True, workers=1)
+    print('%-24s %8.2f s' % ('split, serial', seconds))
+    _, seconds = convert(split_forms=True, workers=args.workers)
+    print('%-24s %8.2f s' % ('split, process pool', seconds))
+    print('%d cross-form references' % len(
+        payload['cross_form_references']
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the peak RSS of building the RIOS structures for a large REDCap
+# data dictionary. Validation is skipped, because rios.core's memory use
+# would otherwise dominate the figures.
+#
+# Usage:
+#
+#   python benchmarks/structures_memory.py [--fields N] [--baseline SRC]
+#                                          [--from-file]
+#
+# With --from-file, the data dictionary is written to a temporary file and
+# converted from there, so the figures include the memory needed to hold
+# the rows read from the file.
+#
+# SRC is the src directory of another checkout to compare against, e.g.:
+#
+#   git worktree add /tmp/baseline <commit>
+#   python benchmarks/structures_memory.py --baseline /tmp/baseline/src
+
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def child(src, fields, from_file):
+    common.use_source_tree(src)
+    from rios.conversion.redcap.to_rios import RedcapToRios
+
+    text = common.redcap_dictionary(fields)
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    if from_file:
+        fd, stream = tempfile.mkstemp(suffix='.csv')
+        with io.open(fd, 'w', encoding='utf-8') as fo:
+            fo.write(text)
+        del text
+    else:
+        stream = io.StringIO(text)
+    before = common.peak_rss()
+    start = time.time()
+    converter = RedcapToRios(
+        id='urn:benchmark',
+        title='Benchmark',
+        description='',
+        stream=stream,
+    )
+    converter.validate = lambda: None
+    try:
+        converter()
+    finally:
+        if from_file:
+            os.unlink(stream)
+    elapsed = time.time() - start
+    print(json.dumps({
+        'before': before,
+        'after': common.peak_rss(),
+        'seconds': elapsed,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=20000)
+    parser.add_argument('--baseline')
+    parser.add_argument('--from-file', action='store_true')
+    parser.add_argument('--child')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.fields, args.from_file)
+
+    trees = [('current', SRC)]
+    if args.baseline:
+        trees.insert(0, ('baseline', args.baseline))
+    print('Converting a %d field REDCap data dictionary' % args.fields)
+    print('%-10s %14s %14s %10s' % ('tree', 'peak RSS MB', 'growth MB', 's'))
+    for name, src in trees:
+        result = json.loads(common.run_child(
+            __file__,
+            ['--child', src, '--fields', str(args.fields)]
+            + (['--from-file'] if args.from_file else []),
+        ))
+        print('%-10s %14.1f %14.1f %10.2f' % (
+            name,
+            result['after'] / 1048576.0,
+            (result['after'] - result['before']) / 1048576.0,
+            result['seconds'],
+        ))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
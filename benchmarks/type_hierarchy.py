@@ -0,0 +1,131 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Measures the time taken to convert a RIOS instrument whose fields are of
+# named types derived from a deep chain of other named types into a REDCap
+# data dictionary, and into a Qualtrics file. Validation is skipped.
+#
+# Usage:
+#
+#   python benchmarks/type_hierarchy.py [--fields N] [--depth D]
+#                                       [--baseline SRC]
+#
+# SRC is the src directory of another checkout to compare against, e.g.:
+#
+#   git worktree add /tmp/baseline <commit>
+#   python benchmarks/type_hierarchy.py --baseline /tmp/baseline/src
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import common
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+
+def definitions(fields, depth):
+    """
+    Returns the RIOS instrument and form of `fields` enumeration fields of
+    the types at the end of a chain of `depth` named types.
+    """
+
+    types = {'level_0': {
+        'base': 'enumeration',
+        'enumerations': {'yes': {}, 'no': {}},
+    }}
+    for level in range(1, depth):
+        types['level_%d' % level] = {
+            'base': 'level_%d' % (level - 1),
+            'description': 'Level %d' % level,
+        }
+    record = []
+    elements = []
+    for i in range(fields):
+        record.append({
+            'id': 'q%d' % i,
+            'type': 'level_%d' % (depth - 1 - i % 3),
+        })
+        elements.append({
+            'type': 'question',
+            'options': {
+                'fieldId': 'q%d' % i,
+                'text': {'en': 'Question %d' % i},
+                'enumerations': [
+                    {'id': 'yes', 'text': {'en': 'Yes'}},
+                    {'id': 'no', 'text': {'en': 'No'}},
+                ],
+            },
+        })
+    instrument = {
+        'id': 'urn:benchmark',
+        'version': '1.0',
+        'title': 'Benchmark',
+        'types': types,
+        'record': record,
+    }
+    form = {
+        'instrument': {'id': 'urn:benchmark', 'version': '1.0'},
+        'defaultLocalization': 'en',
+        'pages': [{'id': 'page_0', 'elements': elements}],
+    }
+    return instrument, form
+
+
+def child(src, fields, depth):
+    common.use_source_tree(src)
+    from rios.conversion.redcap.from_rios import RedcapFromRios
+    from rios.conversion.qualtrics.from_rios import QualtricsFromRios
+
+    instrument, form = definitions(fields, depth)
+    results = {}
+    for name, cls in (
+            ('redcap', RedcapFromRios),
+            ('qualtrics', QualtricsFromRios)):
+        start = time.time()
+        cls(instrument=instrument, form=form, localization='en')()
+        results[name] = time.time() - start
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=5000)
+    parser.add_argument('--depth', type=int, default=50)
+    parser.add_argument('--baseline')
+    parser.add_argument('--child')
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.fields, args.depth)
+
+    trees = [('current', SRC)]
+    if args.baseline:
+        trees.insert(0, ('baseline', args.baseline))
+    print('%d fields, %d levels of named types' % (args.fields, args.depth))
+    print('%-10s %12s %12s' % ('tree', 'REDCap s', 'Qualtrics s'))
+    for name, src in trees:
+        result = json.loads(common.run_child(
+            __file__,
+            [
+                '--child', src,
+                '--fields', str(args.fields),
+                '--depth', str(args.depth),
+            ],
+        ))
+        print('%-10s %12.2f %12.2f' % (
+            name,
+            result['redcap'],
+            result['qualtrics'],
+        ))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
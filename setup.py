@@ -34,5 +34,8 @@ setup(
         'rios.core>=0.6.0,<1',
         'simplejson==3.8.2',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     test_suite='nose.collector',
 )
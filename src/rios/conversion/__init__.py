@@ -3,15 +3,33 @@
 #
 
 
+import collections
+import multiprocessing
+import multiprocessing.pool
+
+import six
+
+
 from rios.core import (
     ValidationError,
     validate_instrument,
     validate_form,
     validate_calculationset,
 )
-from rios.conversion.redcap import RedcapToRios, RedcapFromRios
+from rios.conversion.redcap import (
+    RedcapToRios,
+    RedcapFromRios,
+    RedcapRecordToRios,
+    iter_redcap_records,
+)
+from rios.conversion.redcap.forms import split_forms as split_redcap_forms
+from rios.conversion.redcap.records import shard_records
 from rios.conversion.base import structures
-from rios.conversion.qualtrics import QualtricsToRios, QualtricsFromRios
+from rios.conversion.qualtrics import (
+    QualtricsToRios,
+    QualtricsFromRios,
+    read_qsf,
+)
 from rios.conversion.exception import (
     Error,
     ConversionFailureError,
@@ -20,13 +38,17 @@ from rios.conversion.exception import (
     RiosRelationshipError,
 )
 from rios.conversion.utils import JsonReader
+from rios.conversion.cache import ConversionCache
 
 
 __all__ = (
     'redcap_to_rios',
+    'redcap_records_to_rios_assessments',
     'qualtrics_to_rios',
     'rios_to_redcap',
     'rios_to_qualtrics',
+    'convert_many',
+    'ConversionCache',
 )
 
 
@@ -85,7 +107,9 @@ def _validate_rios(instrument, form, calculationset=None):
 
 
 def redcap_to_rios(id, title, description, stream, localization=None,
-                        instrument_version=None, suppress=False):
+                        instrument_version=None, suppress=False, cache=None,
+                        extract_types=False, workers=None,
+                        split_forms=False):
     """
     Converts a REDCap configuration into a RIOS configuration.
 
@@ -114,19 +138,75 @@ def redcap_to_rios(id, title, description, stream, localization=None,
         the returned dict will not contain key-value pairs with conversion
         data if exception suppression is set.
     :type suppress: bool
+    :param cache:
+        A cache to look the conversion up in, and to store its result in if
+        it succeeds. See :class:`rios.conversion.ConversionCache`.
+    :type cache: ConversionCache or None
+    :param extract_types:
+        Define field types shared by several fields once, as named types in
+        the instrument ``types``, and make the fields refer to them by name.
+    :type extract_types: bool
+    :param workers:
+        Convert the rows of the data dictionary on a pool of this many
+        processes. Worthwhile for data dictionaries of many thousands of
+        rows on machines with several CPUs. Defaults to converting serially.
+        With `split_forms`, the number of processes converting forms
+        concurrently instead, which defaults to the number of CPUs.
+    :type workers: int or None
+    :param split_forms:
+        Convert each form of the data dictionary into an instrument of its
+        own, whose ID and title are `id` and `title` suffixed with the form
+        name. The forms are converted and validated concurrently.
+    :type split_forms: bool
     :returns:
         The RIOS instrument, form, and calculationset configuration. Includes
-        logging data if a logger is suplied.
+        logging data if a logger is suplied. With `split_forms`, a dict with
+        a ``forms`` key, an OrderedDict of form name: the configuration of
+        the form (or, if `suppress` is set, a dict with a single 'failure'
+        key if the form failed to convert), and a
+        ``cross_form_references`` key, the list of the references of
+        calculations and branching logic to the fields of other forms, which
+        the form configurations can't resolve.
     :rtype: dictionary
     """
 
+    if cache is not None:
+        content, stream = cache.read_stream(stream)
+        key = cache.key(
+            'redcap_to_rios:split_forms' if split_forms else 'redcap_to_rios',
+            content,
+            [id, title, description, localization, instrument_version,
+                extract_types],
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if split_forms:
+        payload = _redcap_forms_to_rios(
+            stream,
+            suppress,
+            workers,
+            id=id,
+            title=title,
+            description=description,
+            localization=localization,
+            instrument_version=instrument_version,
+            extract_types=extract_types,
+        )
+        if cache is not None and 'failure' not in payload:
+            cache.set(key, payload)
+        return payload
+
     converter = RedcapToRios(
         id=id,
         instrument_version=instrument_version,
         title=title,
         localization=localization,
         description=description,
-        stream=stream
+        stream=stream,
+        extract_types=extract_types,
+        workers=workers,
     )
 
     payload = dict()
@@ -143,13 +223,128 @@ def redcap_to_rios(id, title, description, stream, localization=None,
             raise error
     else:
         payload.update(converter.package)
+        if cache is not None:
+            cache.set(key, payload)
 
     return payload
 
 
+def _redcap_forms_to_rios(stream, suppress, workers, **kwargs):
+    """
+    Converts the forms of a REDCap data dictionary concurrently, see
+    redcap_to_rios(split_forms=True).
+    """
+
+    try:
+        forms, references = split_redcap_forms(stream)
+    except Exception as exc:
+        error = ConversionFailureError(
+            'Unable to convert REDCap data dictionary. Error:',
+            (str(exc) if isinstance(exc, Error) else repr(exc))
+        )
+        if suppress:
+            return {'failure': str(error)}
+        raise error
+
+    jobs = [
+        ('redcap_to_rios', dict(
+            kwargs,
+            id='%s:%s' % (kwargs['id'], form),
+            title='%s: %s' % (kwargs['title'], form),
+            stream=six.StringIO(text),
+            suppress=True,
+        ))
+        for form, text in forms.items()
+    ]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = min(workers, len(jobs))
+    if workers > 1 and not multiprocessing.current_process().daemon:
+        packages = convert_many(jobs, executor='process', workers=workers)
+    else:
+        packages = convert_many(jobs)
+
+    for form, package in zip(forms, packages):
+        if 'failure' in package and not suppress:
+            raise ConversionFailureError(
+                'Unable to convert REDCap data dictionary form "%s". Error:'
+                % form,
+                package['failure']
+            )
+    return {
+        'forms': collections.OrderedDict(zip(forms, packages)),
+        'cross_form_references': [
+            dict(reference._asdict())
+            for reference in references
+        ],
+    }
+
+
+def redcap_records_to_rios_assessments(instrument, records_stream,
+                                       format=None, record_id_field=None,
+                                       shard=None, validate=False):
+    """
+    Converts a REDCap record export into RIOS assessments, one record at a
+    time. Records are read and converted as the returned generator is
+    consumed, so memory use doesn't grow with the size of the export.
+
+    :param instrument:
+        The RIOS instrument definition the records are assessments of, as
+        converted from the REDCap data dictionary by :func:`redcap_to_rios`.
+    :type instrument: dict
+    :param records_stream:
+        A filename or file stream of a flat REDCap record export, in the CSV
+        or JSON format. Checkbox columns (``field___code``) and the columns
+        of matrix rows are gathered into their RIOS fields.
+    :type records_stream: str or File-like object
+    :param format:
+        The export format, "csv" or "json". Detected from the export if not
+        supplied, which requires a filename or a seekable stream.
+    :type format: str or None
+    :param record_id_field:
+        The instrument field identifying records. Defaults to the first field
+        of the instrument, like REDCap's record ID field.
+    :type record_id_field: str or None
+    :param shard:
+        Only convert the records of this shard, an (index, count) pair. Each
+        of `count` processes converting the same export with a different
+        `index` converts a distinct part of its records; all the events and
+        instances of a record are in the same shard. Requires the export to
+        have the record ID column.
+    :type shard: tuple or None
+    :param validate:
+        Validate the instrument once, and every assessment against it.
+    :type validate: bool
+    :returns:
+        A generator of RIOS assessments. The record ID, and the REDCap event
+        and repeat instance, are in each assessment's ``meta``.
+    :rtype: generator
+    """
+
+    try:
+        if validate:
+            validate_instrument(instrument)
+        convert = RedcapRecordToRios(
+            instrument,
+            record_id_field=record_id_field,
+            validate=validate,
+        )
+        records = iter_redcap_records(records_stream, format=format)
+        if shard is not None:
+            records = shard_records(records, convert.get_record_id, shard)
+        for record in records:
+            yield convert(record)
+    except Exception as exc:
+        raise ConversionFailureError(
+            'Unable to convert REDCap records. Error:',
+            (str(exc) if isinstance(exc, Error) else repr(exc))
+        )
+
+
 def qualtrics_to_rios(stream, instrument_version=None, title=None,
                         localization=None, description=None, id=None,
-                            filemetadata=False, suppress=False):
+                            filemetadata=False, suppress=False, cache=None,
+                            extract_types=False):
     """
     Converts a Qualtrics configuration into a RIOS configuration.
 
@@ -161,7 +356,7 @@ def qualtrics_to_rios(stream, instrument_version=None, title=None,
     :type description: str
     :param stream:
         A file stream containing a foriegn data dictionary to convert to the
-        RIOS specification.
+        RIOS specification. It is read once, so it need not be seekable.
     :type stream: File-like object
     :param localization:
         Localization must be in the form of an RFC5646 Language Tag. Defaults
@@ -181,6 +376,14 @@ def qualtrics_to_rios(stream, instrument_version=None, title=None,
         the returned dict will not contain key-value pairs with conversion
         data if exception suppression is set.
     :type suppress: bool
+    :param cache:
+        A cache to look the conversion up in, and to store its result in if
+        it succeeds. See :class:`rios.conversion.ConversionCache`.
+    :type cache: ConversionCache or None
+    :param extract_types:
+        Define field types shared by several fields once, as named types in
+        the instrument ``types``, and make the fields refer to them by name.
+    :type extract_types: bool
     :returns:
         The RIOS instrument, form, and calculationset configuration. Includes
         logging data if a logger is suplied.
@@ -195,11 +398,25 @@ def qualtrics_to_rios(stream, instrument_version=None, title=None,
             'Missing id, description, and/or title attributes'
         )
 
+    if cache is not None:
+        content, stream = cache.read_stream(stream)
+        key = cache.key(
+            'qualtrics_to_rios',
+            content,
+            [id, title, description, localization, instrument_version,
+                filemetadata, extract_types],
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
     payload = dict()
 
     if filemetadata:
-        # Process properties from the stream
+        # Process properties from the stream, which is read once, and hand
+        # the decoded file to the converter
         try:
+            stream = read_qsf(stream)
             reader = _JsonReaderMetaDataProcessor(stream)
             reader.process()
         except Exception as exc:
@@ -228,7 +445,8 @@ def qualtrics_to_rios(stream, instrument_version=None, title=None,
         title=title,
         localization=localization,
         description=description,
-        stream=stream
+        stream=stream,
+        extract_types=extract_types,
     )
 
     try:
@@ -244,12 +462,15 @@ def qualtrics_to_rios(stream, instrument_version=None, title=None,
             raise error
     else:
         payload.update(converter.package)
+        if cache is not None:
+            cache.set(key, payload)
 
     return payload
 
 
 def rios_to_redcap(instrument, form, calculationset=None,
-                                    localization=None, suppress=False):
+                            localization=None, suppress=False, cache=None,
+                            output=None):
     """
     Converts a RIOS configuration into a REDCap configuration.
 
@@ -270,11 +491,33 @@ def rios_to_redcap(instrument, form, calculationset=None,
         the returned dict will not contain key-value pairs with conversion
         data if exception suppression is set.
     :type suppress: bool
+    :param cache:
+        A cache to look the conversion up in, and to store its result in if
+        it succeeds. See :class:`rios.conversion.ConversionCache`.
+    :type cache: ConversionCache or None
+    :param output:
+        A file to write the REDCap data dictionary to as CSV, each row as
+        soon as it is converted, instead of returning its rows. See
+        :meth:`RedcapFromRios.write_csv`. The cache is not used, and rows
+        converted before a failure have already been written.
+    :type output: file or None
     :returns:
         A list where each element is a row. The first row is the header row.
+        With ``output``, the returned dict has no ``instrument`` key.
     :rtype: list
     """
 
+    if output is not None:
+        cache = None
+    if cache is not None:
+        key = cache.key(
+            'rios_to_redcap',
+            [instrument, form, calculationset, localization],
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
     payload = dict()
 
     try:
@@ -299,7 +542,10 @@ def rios_to_redcap(instrument, form, calculationset=None,
     )
 
     try:
-        converter()
+        if output is not None:
+            converter.write_csv(output)
+        else:
+            converter()
     except Exception as exc:
         error = ConversionFailureError(
             'Unable to convert RIOS data dictionary. Error:',
@@ -311,12 +557,16 @@ def rios_to_redcap(instrument, form, calculationset=None,
             raise error
     else:
         payload.update(converter.package)
+        if output is not None:
+            del payload['instrument']
+        if cache is not None:
+            cache.set(key, payload)
 
     return payload
 
 
 def rios_to_qualtrics(instrument, form, calculationset=None,
-                                    localization=None, suppress=False):
+                            localization=None, suppress=False, cache=None):
     """
     Converts a RIOS configuration into a Qualtrics configuration.
 
@@ -337,10 +587,23 @@ def rios_to_qualtrics(instrument, form, calculationset=None,
         the returned dict will not contain key-value pairs with conversion
         data if exception suppression is set.
     :type suppress: bool
+    :param cache:
+        A cache to look the conversion up in, and to store its result in if
+        it succeeds. See :class:`rios.conversion.ConversionCache`.
+    :type cache: ConversionCache or None
     :returns: The RIOS instrument, form, and calculationset configuration.
     :rtype: dictionary
     """
 
+    if cache is not None:
+        key = cache.key(
+            'rios_to_qualtrics',
+            [instrument, form, calculationset, localization],
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
     payload = dict()
 
     try:
@@ -377,5 +640,89 @@ def rios_to_qualtrics(instrument, form, calculationset=None,
             raise error
     else:
         payload.update(converter.package)
+        if cache is not None:
+            cache.set(key, payload)
 
     return payload
+
+
+_API_FUNCTIONS = {
+    'redcap_to_rios': redcap_to_rios,
+    'qualtrics_to_rios': qualtrics_to_rios,
+    'rios_to_redcap': rios_to_redcap,
+    'rios_to_qualtrics': rios_to_qualtrics,
+}
+
+
+def _run_job(job):
+    api, kwargs = job
+    return _API_FUNCTIONS[api](**kwargs)
+
+
+def _normalize_job(job):
+    try:
+        api, kwargs = job
+    except (TypeError, ValueError):
+        raise ValueError(
+            'Conversion jobs must be (api, kwargs) pairs. Got: ' + repr(job)
+        )
+    name = getattr(api, '__name__', api)
+    if name not in _API_FUNCTIONS:
+        raise ValueError(
+            'Unknown conversion API: ' + repr(api)
+        )
+    return (name, dict(kwargs))
+
+
+def convert_many(jobs, executor=None, workers=None):
+    """
+    Runs many conversions, optionally fanning them out across workers.
+
+    :param jobs:
+        An iterable of ``(api, kwargs)`` pairs, where ``api`` is one of
+        ``redcap_to_rios``, ``qualtrics_to_rios``, ``rios_to_redcap``, or
+        ``rios_to_qualtrics`` (either the function or its name), and
+        ``kwargs`` are the keyword arguments to call it with. Jobs run in a
+        process pool must be picklable, so pass file names instead of open
+        file objects as their ``stream`` arguments.
+    :type jobs: iterable
+    :param executor:
+        How to run the jobs. ``None`` or ``'serial'`` runs them one at a time
+        in the calling thread, ``'thread'`` uses a thread pool, and
+        ``'process'`` uses a process pool. Any object with a ``map`` method,
+        such as a ``concurrent.futures`` executor or a ``multiprocessing``
+        pool, is used as is and is not shut down afterwards.
+    :type executor: str, object, or None
+    :param workers:
+        Number of workers for the ``'thread'`` and ``'process'`` executors.
+        Defaults to the number of CPUs.
+    :type workers: int or None
+    :returns:
+        The payload of every job, in the same order as ``jobs``. Jobs that
+        set ``suppress`` return a dict with a single ``failure`` key on
+        errors, exactly like the corresponding API function; otherwise the
+        first error is raised.
+    :rtype: list
+    """
+
+    jobs = [_normalize_job(job) for job in jobs]
+
+    if executor is None or executor == 'serial':
+        return [_run_job(job) for job in jobs]
+    elif executor == 'thread':
+        pool = multiprocessing.pool.ThreadPool(workers)
+    elif executor == 'process':
+        pool = multiprocessing.Pool(workers)
+    elif hasattr(executor, 'map'):
+        return list(executor.map(_run_job, jobs))
+    else:
+        raise ValueError(
+            'Invalid executor. Expected "serial", "thread", "process", or'
+            ' an object with a map method. Got: ' + repr(executor)
+        )
+
+    try:
+        return pool.map(_run_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
@@ -11,5 +11,6 @@ from .base import (  # noqa:F401
     SUCCESS_MESSAGE,
 )
 from .from_rios import FromRios  # noqa:F401
+from .pool import StructurePool  # noqa:F401
 from .to_rios import ToRios  # noqa:F401
 from .structures import *  # noqa:F401,F403
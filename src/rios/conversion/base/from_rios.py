@@ -3,6 +3,12 @@
 #
 
 
+import six
+
+from rios.core.validation.instrument import (
+    TYPES_ALL,
+    get_full_type_definition,
+)
 from rios.conversion.base import ConversionBase, DEFAULT_LOCALIZATION
 
 
@@ -31,6 +37,60 @@ class FromRios(ConversionBase):
 
         self.fields = {f['id']: f for f in self._instrument['record']}
 
+        # Full type definitions by field ID, and by type name, resolved on
+        # first use
+        self._field_types = dict()
+        self._named_types = dict()
+
+    def get_full_type(self, field_id):
+        """
+        Returns the full type definition of the field `field_id`, like
+        rios.core's ``get_full_type_definition``.
+
+        Each field's type, and each named type of the instrument, is
+        resolved once per conversion, so fields of types derived from the
+        same named types share their resolution. The definitions returned
+        are shared, and must not be modified.
+        """
+
+        try:
+            return self._field_types[field_id]
+        except KeyError:
+            full_type = self._resolve_type(self.fields[field_id]['type'])
+            self._field_types[field_id] = full_type
+            return full_type
+
+    def _resolve_type(self, type_def):
+        if isinstance(type_def, six.string_types):
+            try:
+                return self._named_types[type_def]
+            except KeyError:
+                pass
+            types = self._instrument.get('types', {})
+            if type_def not in TYPES_ALL and type_def in types:
+                full_type = self._resolve_type(types[type_def])
+            else:
+                full_type = get_full_type_definition(
+                    self._instrument,
+                    type_def,
+                )
+            self._named_types[type_def] = full_type
+            return full_type
+        if isinstance(type_def, dict) and 'base' in type_def:
+            base = type_def['base']
+            if isinstance(base, six.string_types) and (
+                    base in TYPES_ALL
+                    or base in self._instrument.get('types', {})):
+                full_type = dict(self._resolve_type(base))
+                full_type.update(
+                    (key, value)
+                    for key, value in type_def.items()
+                    if key != 'base'
+                )
+                return full_type
+        # rios.core raises the errors of invalid definitions
+        return get_full_type_definition(self._instrument, type_def)
+
     @staticmethod
     def get_local_text(localization, localized_str_obj):
         return localized_str_obj.get(localization, '')
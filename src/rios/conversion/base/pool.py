@@ -0,0 +1,93 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+
+
+from . import structures
+
+
+__all__ = (
+    'StructurePool',
+)
+
+
+class StructurePool(object):
+    """
+    Per-conversion pool of shared RIOS sub-structures.
+
+    Data dictionaries repeat the same labels and choice scales many times,
+    so instead of building a new object for every occurrence, converters ask
+    the pool for it and get the object built the first time the same value
+    was requested.
+
+    Pooled objects are shared by every structure they are added to, so they
+    must not be modified. The converted definitions (see ToRios.output)
+    share nothing: each occurrence of a pooled object is a separate copy.
+    """
+
+    def __init__(self, localization):
+        self.localization = localization
+        self._strings = {}
+        self._descriptors = {}
+        self._enumerations = {}
+        self._types = {}
+
+    def localized_string(self, string):
+        """ Returns a LocalizedStringObject for `string` """
+
+        try:
+            return self._strings[string]
+        except KeyError:
+            value = structures.LocalizedStringObject(
+                {self.localization: string}
+            )
+            self._strings[string] = value
+            return value
+
+    def descriptor(self, id, text):
+        """ Returns a DescriptorObject with an `id` and `text` label """
+
+        key = (id, text)
+        try:
+            return self._descriptors[key]
+        except KeyError:
+            value = structures.DescriptorObject(
+                id=id,
+                text=self.localized_string(text),
+            )
+            self._descriptors[key] = value
+            return value
+
+    def enumerations(self, choices):
+        """
+        Returns an EnumerationCollectionObject for `choices`, a sequence of
+        (name, description) pairs. Empty descriptions are omitted.
+        """
+
+        key = tuple(choices)
+        try:
+            return self._enumerations[key]
+        except KeyError:
+            value = structures.EnumerationCollectionObject()
+            for name, description in key:
+                value.add(name, description)
+            self._enumerations[key] = value
+            return value
+
+    def enumeration_type(self, base, choices):
+        """
+        Returns a TypeObject of the `base` type, either "enumeration" or
+        "enumerationSet", whose enumerations are `choices`, a sequence of
+        (name, description) pairs.
+        """
+
+        key = (base, tuple(choices))
+        try:
+            return self._types[key]
+        except KeyError:
+            value = structures.TypeObject(
+                base=base,
+                enumerations=self.enumerations(key[1]),
+            )
+            self._types[key] = value
+            return value
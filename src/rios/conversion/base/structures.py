@@ -2,23 +2,42 @@
 # Copyright (c) 2016, Prometheus Research, LLC
 #
 # RIOS objects are all implemented as subclasses of DefinitionSpecification
-# which is a subclass of OrderedDict.
+# which is a mutable mapping.
 #
-# A dict would suffice, but the OrderedDict output matches the order
-# of the Rios on-line documentation at
+# A dict would suffice, but the items of a DefinitionSpecification are
+# ordered as in the Rios on-line documentation at
 # http://rios.readthedocs.org/en/latest/index.html
 #
-# The RIOS objects are instantiated with ALL their attributes however
-# all the "empty" attributes must be removed to pass RIOS validation.
-# DefinitionSpecification.clean() will recurse through the object and
-# remove all the "empty" attributes.
+# Large forms hold many thousands of RIOS objects, so each key listed in
+# ``props`` is stored in a slot of its own instead of in a per-object dict.
+# Keys which are not listed in ``props`` are kept in a dict which is only
+# allocated when the first such key is set.
+#
+# The RIOS objects behave as if they were instantiated with ALL their
+# attributes, however the default value of an attribute is only created the
+# first time it is read with obj[key]. Until then, the attribute is not
+# reported by ``in``, get(), or iteration, unless its default is False, 0,
+# 0.0, or None. All the "empty" attributes must be removed to pass RIOS
+# validation. DefinitionSpecification.clean() will recurse through the
+# object and remove all the "empty" attributes.
 #
 # Note that clean() does not consider False, 0, 0.0, or None to be empty.
 # Use '', the empty string, to ensure an attribute will be removed.
+#
+# DefinitionSpecification.to_plain() produces the same output as clean()
+# followed by as_dict() in a single pass, without modifying the objects.
 
 
+import abc
 import collections
 
+import six
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+
 
 __all__ = (
         'DefinitionSpecification',
@@ -51,7 +70,50 @@ __all__ = (
         )
 
 
-class DefinitionSpecification(collections.OrderedDict):
+# Falsy values which clean() keeps.
+NOT_EMPTY = [False, 0, 0.0, None]
+
+# Prefix of the slot holding the value of a key listed in ``props``.
+SLOT_PREFIX = '_p_'
+
+# Marks a missing slot or key.
+_MISSING = object()
+
+
+class SpecificationType(abc.ABCMeta):
+    """
+    Metaclass of DefinitionSpecification.
+
+    Adds a slot for each key in ``props`` that is not already stored in a
+    slot of a base class, and precomputes the slot names and the defaults
+    which must be set eagerly because clean() keeps them.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        if '__slots__' not in namespace:
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(getattr(klass, '__slots__', ()))
+            namespace['__slots__'] = tuple(
+                SLOT_PREFIX + key
+                for key in namespace.get('props', ())
+                if SLOT_PREFIX + key not in inherited)
+        cls = super(SpecificationType, mcs).__new__(
+                mcs, name, bases, namespace)
+        cls._slots = collections.OrderedDict(
+                (key, SLOT_PREFIX + key) for key in cls.props)
+        cls._kept_defaults = []
+        for key, factory in cls.props.items():
+            value = factory()
+            if not isinstance(value, MutableMapping) and value in NOT_EMPTY:
+                cls._kept_defaults.append((SLOT_PREFIX + key, value))
+        return cls
+
+
+@six.add_metaclass(SpecificationType)
+class DefinitionSpecification(MutableMapping):
+    __slots__ = ('_extra',)
     props = collections.OrderedDict()
     """
     props == {(key, type), ...}
@@ -62,16 +124,91 @@ class DefinitionSpecification(collections.OrderedDict):
         in  ``props`` and ``kwargs`` not in self.props;
         otherwise initialize from props and/or kwargs.
         """
-        super(DefinitionSpecification, self).__init__()
-        self.update({k: v() for k, v in self.props.items()})
-        self.update({
-                k: v
-                for k, v in props.items()
-                if not self.props or k in self.props})
-        self.update({
-                k: v
-                for k, v in kwargs.items()
-                if not self.props or k in self.props})
+        for slot, value in self._kept_defaults:
+            setattr(self, slot, value)
+        for items in (props.items(), kwargs.items()):
+            for k, v in items:
+                if not self.props or k in self.props:
+                    self[k] = v
+
+    def __getitem__(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            value = getattr(self, '_extra', {}).get(key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        value = getattr(self, slot, _MISSING)
+        if value is _MISSING:
+            # Create the default value on first use
+            value = self.props[key]()
+            setattr(self, slot, value)
+        return value
+
+    def __setitem__(self, key, value):
+        slot = self._slots.get(key)
+        if slot is not None:
+            setattr(self, slot, value)
+        else:
+            try:
+                self._extra[key] = value
+            except AttributeError:
+                self._extra = collections.OrderedDict([(key, value)])
+
+    def __delitem__(self, key):
+        slot = self._slots.get(key)
+        try:
+            if slot is not None:
+                delattr(self, slot)
+            else:
+                del self._extra[key]
+        except (AttributeError, KeyError):
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key, _ in self.iteritems():
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self.iteritems())
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, list(self.iteritems()))
+
+    def __reduce__(self):
+        return (self.__class__, (), list(self.iteritems()))
+
+    def __setstate__(self, state):
+        for slot, _ in self._kept_defaults:
+            delattr(self, slot)
+        for key, value in state:
+            self[key] = value
+
+    def get(self, key, default=None):
+        """Returns the value of ``key`` without creating a default value."""
+        slot = self._slots.get(key)
+        if slot is None:
+            return getattr(self, '_extra', {}).get(key, default)
+        return getattr(self, slot, default)
+
+    def iteritems(self):
+        """Iterates over the (key, value) pairs of self."""
+        for key, slot in self._slots.items():
+            value = getattr(self, slot, _MISSING)
+            if value is not _MISSING:
+                yield key, value
+        extra = getattr(self, '_extra', None)
+        if extra:
+            for item in extra.items():
+                yield item
+
+    def copy(self):
+        other = self.__class__()
+        other.__setstate__(self.iteritems())
+        return other
 
     def clean(self):
         """Removes "empty" items from self.
@@ -80,9 +217,9 @@ class DefinitionSpecification(collections.OrderedDict):
 
         All arrays are assumed to be arrays of DefinitionSpecification.
         """
-        items = list(self.items())
+        items = list(self.iteritems())
         for k, v in items:
-            if v not in [False, 0, 0.0, None]:
+            if v not in NOT_EMPTY:
                 if bool(v):
                     if isinstance(v, DefinitionSpecification):
                         v.clean()
@@ -97,7 +234,7 @@ class DefinitionSpecification(collections.OrderedDict):
     def as_dict(self):
         out = dict()
 
-        for key, value in self.items():
+        for key, value in self.iteritems():
             if isinstance(value, DefinitionSpecification):
                 out[key] = value.as_dict()
             elif isinstance(value, (list, tuple)):
@@ -112,6 +249,53 @@ class DefinitionSpecification(collections.OrderedDict):
 
         return out
 
+    def to_plain(self, clean=True, memo=None):
+        """Returns self as plain dicts and lists.
+
+        If ``clean`` is True, "empty" items are dropped as clean() would
+        drop them, so the result equals ``self.clean().as_dict()``, but it is
+        computed in one traversal and self is left unmodified.
+
+        If ``memo`` is a dict, an object reachable more than once (see
+        StructurePool) is converted once, and every occurrence in the result
+        shares that conversion. The same memo may be passed to several calls.
+        """
+        if memo is not None:
+            memo_key = (id(self), clean)
+            try:
+                return memo[memo_key][1]
+            except KeyError:
+                pass
+        out = dict()
+        for key, value in self.iteritems():
+            if not clean:
+                out[key] = _to_plain(value, memo=memo)
+            elif isinstance(value, DefinitionSpecification):
+                value = value.to_plain(memo=memo)
+                if value:
+                    out[key] = value
+            elif isinstance(value, list):
+                items = [_to_plain(x, True, memo) for x in value]
+                if any(items):
+                    out[key] = items
+            elif value in NOT_EMPTY or value:
+                out[key] = _to_plain(value, memo=memo)
+        if memo is not None:
+            # Keep self alive, so its id isn't reused while the memo is
+            memo[memo_key] = (self, out)
+        return out
+
+
+def _to_plain(value, clean=False, memo=None):
+    if isinstance(value, DefinitionSpecification):
+        return value.to_plain(clean, memo)
+    elif isinstance(value, (list, tuple)):
+        return [_to_plain(x, clean, memo) for x in value]
+    elif isinstance(value, dict):
+        return dict((k, _to_plain(v, memo=memo)) for k, v in value.items())
+    else:
+        return value
+
 
 class AudioSourceObject(DefinitionSpecification):
     pass
@@ -3,14 +3,17 @@
 #
 
 
+import collections
+import json
+
 from rios.core import ValidationError
 from rios.conversion.exception import (
     ConversionValidationError,
 )
 from rios.conversion.base import structures
+from rios.conversion.base.pool import StructurePool
 from rios.conversion.base import (
     ConversionBase,
-    localized_string_object,
     DEFAULT_VERSION,
     DEFAULT_LOCALIZATION,
     SUCCESS_MESSAGE,
@@ -27,14 +30,22 @@ __all__ = (
 )
 
 
+# Type bases whose definitions contain the types of sub-fields
+COMPLEX_TYPES = ('matrix', 'recordList')
+
+
 class ToRios(ConversionBase):
     """ Converts a foreign instrument into a valid RIOS specification """
 
     def __init__(self, id, title, description, stream, localization=None,
-                                    instrument_version=None, *args, **kwargs):
+                                    instrument_version=None,
+                                    extract_types=False, *args, **kwargs):
         """
         Expects `stream` to be a file-like object. Implementations must process
         the data dictionary first before passing to this class.
+
+        If `extract_types` is True, field types used by more than one field
+        are moved into the instrument ``types`` (see extract_shared_types).
         """
 
         # Set attributes
@@ -44,13 +55,17 @@ class ToRios(ConversionBase):
         self.localization = localization or DEFAULT_LOCALIZATION
         self.description = description
         self.stream = stream
+        self.extract_types = extract_types
 
         # Inserted into self._form
-        self.page_container = dict()
+        self.page_container = collections.OrderedDict()
         # Inserted into self._instrument
         self.field_container = list()
         # Inserted into self._calculationset
-        self.calc_container = dict()
+        self.calc_container = list()
+
+        # Shared sub-structures for the processors (see StructurePool)
+        self.pool = StructurePool(self.localization)
 
         # Generate yet-to-be-configured RIOS definitions
         self._instrument = structures.Instrument(
@@ -65,26 +80,126 @@ class ToRios(ConversionBase):
         self._form = structures.WebForm(
             instrument=structures.InstrumentReferenceObject(self._instrument),
             defaultLocalization=self.localization,
-            title=localized_string_object(self.localization, self.title),
+            title=self.pool.localized_string(self.title),
         )
 
+        # Memoized output definitions (see the ``output`` property)
+        self._output = None
+
+    def invalidate(self):
+        """
+        Discards the memoized output definitions. Must be called whenever
+        the instrument, form, or calculationset builders are modified after
+        the output has been read.
+        """
+
+        self._output = None
+
+    def add_field(self, field):
+        self._instrument.add_field(field)
+        self.invalidate()
+
+    def add_page(self, page):
+        self._form.add_page(page)
+        self.invalidate()
+
+    def add_calculation(self, calculation):
+        self._calculationset.add(calculation)
+        self.invalidate()
+
+    def extract_shared_types(self):
+        """
+        Post-processing stage that moves field types defined identically by
+        more than one field (or matrix column) into the instrument ``types``,
+        and makes those fields refer to the type by name.
+
+        Implementations call this after all fields are added, and before
+        validation, if ``self.extract_types`` is set.
+        """
+
+        # Sub-field types are extracted first, because the definitions of
+        # complex types include the (possibly renamed) types of sub-fields
+        simple = list()
+        compound = list()
+        for field in self._instrument.get('record', None) or []:
+            type_object = field.get('type', None)
+            if not isinstance(type_object, structures.TypeObject):
+                continue
+            if type_object.get('base', None) in COMPLEX_TYPES:
+                for key in ('columns', 'record'):
+                    simple.extend(type_object.get(key, None) or [])
+                compound.append(field)
+            else:
+                simple.append(field)
+        self._extract_types(simple)
+        self._extract_types(compound)
+        self.invalidate()
+
+    def _extract_types(self, holders):
+        # Group by the canonical JSON of each type, in order of appearance
+        memo = dict()
+        groups = collections.OrderedDict()
+        for holder in holders:
+            type_object = holder.get('type', None)
+            if isinstance(type_object, structures.TypeObject):
+                key = json.dumps(
+                    type_object.to_plain(memo=memo),
+                    sort_keys=True,
+                )
+                groups.setdefault(key, []).append(holder)
+
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+            type_object = group[0]['type']
+            name = self._type_name(type_object['base'])
+            self._instrument.add_type(name, type_object)
+            for holder in group:
+                holder['type'] = name
+
+    def _type_name(self, base):
+        types = self._instrument['types']
+        index = 1
+        while '%s_%d' % (base.lower(), index) in types:
+            index += 1
+        return str('%s_%d' % (base.lower(), index))
+
+    @property
+    def output(self):
+        """
+        Returns a dictionary with the cleaned ``instrument``, ``form``, and
+        ``calculationset`` definitions.
+
+        The definitions are built once and shared by every reader until the
+        builders are modified, so callers must not modify them. Structures
+        shared by the builders (see StructurePool) are converted wherever
+        they appear, so no two parts of the definitions are the same object,
+        and they may be dumped, e.g. as YAML, without aliases.
+        """
+
+        if self._output is None:
+            if self._calculationset.get('calculations', False):
+                calculationset = self._calculationset.to_plain()
+            else:
+                calculationset = dict()
+            self._output = {
+                'instrument': self._instrument.to_plain(),
+                'form': self._form.to_plain(),
+                'calculationset': calculationset,
+            }
+        return self._output
+
     @property
     def instrument(self):
-        self._instrument.clean()
-        return self._instrument.as_dict()
+        return self.output['instrument']
 
     @property
     def form(self):
-        self._form.clean()
-        return self._form.as_dict()
+        return self.output['form']
 
     @property
     def calculationset(self):
-        if self._calculationset.get('calculations', False):
-            self._calculationset.clean()
-            return self._calculationset.as_dict()
-        else:
-            return dict()
+        return self.output['calculationset']
 
     def validate(self):
         """
@@ -92,19 +207,20 @@ class ToRios(ConversionBase):
         implementations of the __call__ method.
         """
 
+        output = self.output
         try:
             val_type = "Instrument"
-            validate_instrument(self.instrument)
+            validate_instrument(output['instrument'])
             val_type = "Form"
             validate_form(
-                self.form,
-                instrument=self.instrument,
+                output['form'],
+                instrument=output['instrument'],
             )
-            if self.calculationset.get('calculations', False):
+            if output['calculationset'].get('calculations', False):
                 val_type = "Calculationset"
                 validate_calculationset(
-                    self.calculationset,
-                    instrument=self.instrument
+                    output['calculationset'],
+                    instrument=output['instrument']
                 )
         except ValidationError as exc:
             error = ConversionValidationError(
@@ -125,13 +241,14 @@ class ToRios(ConversionBase):
         definitions. May also add a ``logger`` key if logs exist.
         """
 
+        output = self.output
         payload = {
-            'instrument': self.instrument,
-            'form': self.form,
+            'instrument': output['instrument'],
+            'form': output['form'],
         }
-        if self._calculationset.get('calculations', False):
+        if output['calculationset']:
             payload.update(
-                {'calculationset': self.calculations}
+                {'calculationset': output['calculationset']}
             )
         if self.logger.check:
             payload.update(
@@ -0,0 +1,157 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+
+
+import errno
+import hashlib
+import io
+import os
+import tempfile
+
+import simplejson
+import six
+from six.moves import cPickle as pickle
+
+from rios.conversion.utils import LRUCache
+
+
+__all__ = (
+    'ConversionCache',
+)
+
+
+DEFAULT_MEMORY_SIZE = 64 * 1024 * 1024
+
+
+def _package_version():
+    try:
+        return __import__('pkg_resources') \
+            .get_distribution('rios.conversion').version
+    except Exception:  # pylint: disable=broad-except
+        return ''
+
+
+class ConversionCache(object):
+    """
+    Caches conversion payloads keyed by a hash of the conversion input.
+
+    Usage:
+
+        cache = ConversionCache(directory='/var/cache/rios')
+        payload = redcap_to_rios(..., cache=cache)
+
+    Payloads are stored pickled, in an in-memory LRU tier bounded by
+    `memory_size` bytes and, if `directory` is supplied, in an on-disk tier
+    that is shared by every cache (and process) using that directory. Only
+    successful conversions are cached, and every hit returns a fresh copy of
+    the payload, so callers may modify it freely.
+
+    Keys include the ``rios.conversion`` version, so upgrading the package
+    does not return payloads produced by an older converter.
+    """
+
+    def __init__(self, memory_size=DEFAULT_MEMORY_SIZE, directory=None):
+        self.memory_size = memory_size
+        self.directory = directory
+        self.memory = LRUCache(memory_size, sizeof=len)
+        self.version = _package_version()
+
+    def __getstate__(self):
+        # Locks can't be pickled, so processes get their own memory tier
+        return (self.memory_size, self.directory)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def key(self, api, *parts):
+        """
+        Returns the hex digest identifying a call to `api` with `parts`.
+
+        `parts` are hashed as canonical JSON, except for byte strings which
+        are hashed as is.
+        """
+
+        digest = hashlib.sha256()
+        digest.update(simplejson.dumps(
+            [api, self.version],
+        ).encode('utf-8'))
+        for part in parts:
+            if isinstance(part, six.binary_type):
+                data = part
+            else:
+                data = simplejson.dumps(
+                    part,
+                    sort_keys=True,
+                    default=repr,
+                ).encode('utf-8')
+            digest.update(str(len(data)).encode('ascii') + b':')
+            digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def read_stream(stream):
+        """
+        Reads the contents of `stream`, a file name or file-like object.
+
+        Returns a tuple of the contents as bytes and a stream that may be
+        passed to a converter in place of `stream`.
+        """
+
+        if isinstance(stream, six.string_types):
+            with open(stream, 'rb') as fi:
+                return fi.read(), stream
+        content = stream.read()
+        if isinstance(content, six.text_type):
+            return content.encode('utf-8'), io.StringIO(content)
+        return content, io.BytesIO(content)
+
+    def get(self, key):
+        """ Returns the payload cached for `key`, or None """
+
+        data = self.memory.get(key)
+        if data is None and self.directory:
+            try:
+                with open(self._path(key), 'rb') as fi:
+                    data = fi.read()
+            except (IOError, OSError):
+                return None
+            self.memory.set(key, data)
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def set(self, key, payload):
+        """ Caches `payload` for `key` """
+
+        data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        self.memory.set(key, data)
+        if self.directory:
+            self._write(key, data)
+
+    def clear(self):
+        """ Empties the in-memory tier. The on-disk tier is left untouched """
+
+        self.memory.clear()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _write(self, key, data):
+        path = self._path(key)
+        dirname = os.path.dirname(path)
+        try:
+            os.makedirs(dirname)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        # Write to a temporary file first, so concurrent readers never see
+        # a partially written payload
+        fd, tmp = tempfile.mkstemp(dir=dirname)
+        try:
+            with os.fdopen(fd, 'wb') as fo:
+                fo.write(data)
+            os.rename(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
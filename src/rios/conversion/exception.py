@@ -79,6 +79,11 @@ class Error(Exception):
         self.paragraphs.append(paragraph)
         return self
 
+    def __reduce__(self):
+        # Pickled with the whole context trace, so errors survive being
+        # passed back from worker processes
+        return (_rebuild_error, (self.__class__, self.paragraphs))
+
     def __call__(self, environ, start_response):
         output = self.text_template % self
         return [output]
@@ -102,6 +107,12 @@ class Error(Exception):
         return output
 
 
+def _rebuild_error(cls, paragraphs):
+    error = cls.__new__(cls)
+    error.paragraphs = paragraphs
+    return error
+
+
 class guard(object):  # noqa:F401
     """
     Adds a paragraph to exceptions leaving the wrapped ``with`` block.
@@ -5,3 +5,4 @@
 
 from .to_rios import QualtricsToRios  # noqa: F401
 from .from_rios import QualtricsFromRios  # noqa: F401
+from .qsf import read_qsf  # noqa: F401
@@ -3,7 +3,6 @@
 #
 
 
-from rios.core.validation.instrument import get_full_type_definition
 from rios.conversion.base import FromRios
 from rios.conversion.exception import (
     ConversionValueError,
@@ -121,11 +120,7 @@ class QualtricsFromRios(FromRios):
 
     def question_processor(self, question_options):
         field_id = question_options['fieldId']
-        field = self.fields[field_id]
-        type_object = get_full_type_definition(
-            self._instrument,
-            field['type']
-        )
+        type_object = self.get_full_type(field_id)
         base = type_object['base']
         if base not in ('enumeration', 'enumerationSet',):
             error = ConversionValueError(
@@ -137,7 +132,10 @@ class QualtricsFromRios(FromRios):
         self.lines.append(
             '%d. %s' % (
                 self.question_number.next(),
-                self.get_local_text(question_options['text']),
+                self.get_local_text(
+                    self.localization,
+                    question_options['text'],
+                ),
             )
         )
         if base == 'enumerationSet':
@@ -146,7 +144,7 @@ class QualtricsFromRios(FromRios):
         self.lines.append('')
         for enumeration in question_options['enumerations']:
             self.lines.append(
-                self.get_local_text(enumeration['text'])
+                self.get_local_text(self.localization, enumeration['text'])
             )
         # Two blank lines between questions
         self.lines.append('')
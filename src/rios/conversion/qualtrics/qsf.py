@@ -0,0 +1,77 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Qualtrics *.qsf Reading
+#
+
+
+import simplejson
+
+from rios.conversion.utils import JsonScanner
+
+
+__all__ = (
+    'QSF_ELEMENTS',
+    'read_qsf',
+)
+
+
+# The SurveyElements converted by QualtricsToRios: blocks and questions
+QSF_ELEMENTS = ('BL', 'SQ')
+
+
+def read_qsf(fname, elements=QSF_ELEMENTS):
+    """
+    Reads the Qualtrics *.qsf file `fname` incrementally, and returns a dict
+    of its "SurveyEntry" and of the "SurveyElements" whose "Element" is in
+    `elements`.
+
+    The other survey elements (e.g. graphics, translations, and survey
+    flow), and any other keys of the file, are skipped without being
+    decoded, so the time and memory needed depend on the size of the
+    questions rather than that of the file. Survey elements which are not
+    objects, or have no "Element", are kept.
+
+    `fname` is either a filename, or an open file object.
+    """
+
+    scanner = JsonScanner(fname)
+    if scanner.next_char() != '{':
+        return scanner.decode()
+    data = {}
+    for key in scanner.iter_object():
+        if key == 'SurveyEntry':
+            data[key] = scanner.decode()
+        elif key == 'SurveyElements' and scanner.next_char() == '[':
+            data[key] = list(_iter_survey_elements(scanner, elements))
+        elif key == 'SurveyElements':
+            data[key] = scanner.decode()
+        else:
+            scanner.skip()
+    return data
+
+
+def _iter_survey_elements(scanner, elements):
+    for _ in scanner.iter_array():
+        if scanner.next_char() != '{':
+            yield scanner.decode()
+            continue
+        survey_element = {}
+        # The text of a Payload which comes before the Element
+        payload = None
+        for key in scanner.iter_object():
+            element = survey_element.get('Element')
+            if key != 'Payload':
+                survey_element[key] = scanner.decode()
+            elif element is None:
+                payload = scanner.capture()
+            elif element in elements:
+                survey_element[key] = scanner.decode()
+            else:
+                scanner.skip()
+        element = survey_element.get('Element')
+        if element is not None and element not in elements:
+            continue
+        if payload is not None:
+            survey_element['Payload'] = simplejson.loads(payload)
+        yield survey_element
@@ -7,8 +7,9 @@ import collections
 import six
 
 
-from rios.conversion.base import ToRios, localized_string_object, structures
+from rios.conversion.base import ToRios, StructurePool, structures
 from rios.conversion.utils import JsonReader
+from rios.conversion.qualtrics.qsf import read_qsf
 from rios.conversion.exception import (
     Error,
     ConversionValueError,
@@ -35,6 +36,11 @@ class PageName(object):
 class JsonReaderMainProcessor(JsonReader):
     """ Process Qualtrics JSON data """
 
+    @staticmethod
+    def get_reader(fname):
+        """ Reads only the survey entry, blocks, and questions """
+        return read_qsf(fname)
+
     def processor(self, data):
         """ Extract instrument data into a dict. """
         try:
@@ -96,7 +102,11 @@ class JsonReaderMainProcessor(JsonReader):
 
 
 class QualtricsToRios(ToRios):
-    """ Converts a Qualtrics *.qsf file to the RIOS specification format """
+    """
+    Converts a Qualtrics *.qsf file to the RIOS specification format
+
+    `stream` may also be the file already decoded, e.g. by ``read_qsf``.
+    """
 
     def __init__(self, filemetadata=False, *args, **kwargs):
         super(QualtricsToRios, self).__init__(*args, **kwargs)
@@ -122,7 +132,7 @@ class QualtricsToRios(ToRios):
             raise error
 
         # Initialize processor
-        process = Processor(self.reader, self.localization)
+        process = Processor(self.reader, self.localization, pool=self.pool)
 
         # MAIN PROCESSING
         # Occures in two steps:
@@ -221,22 +231,27 @@ class QualtricsToRios(ToRios):
 
         # Construct insrument objects
         for field in self.field_container:
-            self._instrument.add_field(field)
+            self.add_field(field)
         # Page container is a dict instead of a list, so iterate over vals
         for page in six.itervalues(self.page_container):
-            self._form.add_page(page)
+            self.add_page(page)
 
         # Post-processing/validation
+        if self.extract_types:
+            self.extract_shared_types()
         self.validate()
 
 
 class Processor(object):
     """ Processor class for Qualtrics data dictionaries """
 
-    def __init__(self, reader, localization):
+    def __init__(self, reader, localization, pool=None):
         self.reader = reader
         self.localization = localization
 
+        # Shared labels, descriptors, and enumeration types
+        self.pool = pool or StructurePool(localization)
+
         # For storing fields
         self._field_storage = []
 
@@ -281,8 +296,7 @@ class Processor(object):
     def question_field_processor(self, question_data, question):
         """ Processe questions and fields """
         question_type = question_data['QuestionType']
-        question_text = localized_string_object(
-            self.localization,
+        question_text = self.pool.localized_string(
             self.clean_question(question_data['QuestionText'])
         )
         if question_type == 'DB':
@@ -294,12 +308,7 @@ class Processor(object):
             question['type'] = 'question'
             question['options'] = structures.QuestionObject(
                 fieldId=question_data['DataExportTag'].lower(),
-                text=localized_string_object(
-                    self.localization,
-                    self.clean_question(
-                        question_data['QuestionText']
-                    )
-                ),
+                text=question_text,
             )
 
             # Choices are generated, where "choices" is an array of
@@ -329,18 +338,14 @@ class Processor(object):
                 ]
                 # Process question object and field type object
                 question_obj = question['options']
-                field_type = structures.TypeObject(base='enumeration', )
                 for _id, choice in self._choices:
                     question_obj.add_enumeration(
-                        structures.DescriptorObject(
-                            id=_id,
-                            text=localized_string_object(
-                                self.localization,
-                                choice
-                            ),
-                        )
+                        self.pool.descriptor(_id, choice)
                     )
-                    field_type.add_enumeration(str(_id))
+                field_type = self.pool.enumeration_type(
+                    'enumeration',
+                    [(str(_id), '') for _id, _ in self._choices],
+                )
             else:
                 field_type = 'text'
 
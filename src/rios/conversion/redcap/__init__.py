@@ -5,3 +5,16 @@
 
 from .to_rios import RedcapToRios  # noqa: F401
 from .from_rios import RedcapFromRios  # noqa: F401
+from .field_types import (  # noqa: F401
+    FieldTypeHandler,
+    register_field_type,
+)
+from .evaluation import (  # noqa: F401
+    CalculationEvaluator,
+    evaluate_batch,
+    get_evaluator,
+)
+from .records import (  # noqa: F401
+    RedcapRecordToRios,
+    iter_redcap_records,
+)
@@ -0,0 +1,138 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# REDCap Function Routines over NumPy arrays
+#
+# Each function has the name, arguments, and results of its namesake in
+# rios.conversion.redcap.functions, but takes arrays with one element per
+# assessment (or scalars, which apply to every assessment) and returns an
+# array. Missing and undefined values are NaN.
+#
+# A function raises an exception when its arguments can't be handled as
+# arrays, e.g. text, so the caller can fall back to the scalar functions.
+#
+# Requires NumPy.
+#
+
+from __future__ import division
+
+
+import datetime
+import functools
+
+import numpy
+import six
+
+
+__all__ = (
+    'datediff',
+    'mean',
+    'median',
+    'round_',
+    'rounddown',
+    'roundup',
+    'stdev',
+    'sum_',
+    'min_',
+    'max_',
+)
+
+
+# datediff() units: seconds per unit, or days per unit if a whole number of
+# days is counted
+DAY_UNITS = {'y': 365, 'M': 30, 'd': 1}
+SECOND_UNITS = {'h': 3600, 'm': 60, 's': 1}
+
+ONE_DAY = numpy.timedelta64(1, 'D')
+ONE_SECOND = numpy.timedelta64(1, 's')
+
+
+def _stack(data):
+    # Returns `data` as a 2-D float array with one row per argument
+    arrays = [numpy.asarray(item, dtype=float) for item in data]
+    return numpy.vstack(numpy.broadcast_arrays(*arrays))
+
+
+def datediff(date1, date2, units, date_fmt="ymd"):
+    if date_fmt != "ymd":
+        raise ValueError(date_fmt)
+    now = numpy.datetime64(datetime.datetime.today(), 'us')
+
+    def _datetime(date):
+        if isinstance(date, six.string_types) and date == "today":
+            return now
+        date = numpy.asarray(date)
+        if date.dtype.kind in 'OSU' and (date == "today").any():
+            # NumPy would read "today" as midnight, instead of now
+            raise ValueError(date)
+        return date.astype('datetime64[D]').astype('datetime64[us]')
+
+    difference = _datetime(date1) - _datetime(date2)
+    if units in DAY_UNITS:
+        days = numpy.floor(difference / ONE_DAY)
+        return days / DAY_UNITS[units]
+    elif units in SECOND_UNITS:
+        seconds = numpy.floor(difference / ONE_SECOND)
+        return seconds / SECOND_UNITS[units]
+    else:
+        raise ValueError(units)
+
+
+def mean(*data):
+    return _stack(data).mean(axis=0) if data else 0.0
+
+
+def median(*data):
+    return numpy.median(_stack(data), axis=0) if data else numpy.nan
+
+
+def round_(number, decimal_places):
+    x = 10.0 ** decimal_places
+    return numpy.round(x * numpy.asarray(number, dtype=float)) / x
+
+
+def rounddown(number, decimal_places):
+    number = numpy.asarray(number, dtype=float)
+    rounded = round_(number, decimal_places)
+    x = 0.5 * 10.0 ** -decimal_places
+    return numpy.where(
+        rounded <= number,
+        rounded,
+        round_(number - x, decimal_places),
+    )
+
+
+def roundup(number, decimal_places):
+    number = numpy.asarray(number, dtype=float)
+    rounded = round_(number, decimal_places)
+    x = 0.5 * 10.0 ** -decimal_places
+    return numpy.where(
+        rounded >= number,
+        rounded,
+        round_(number + x, decimal_places),
+    )
+
+
+def stdev(*data):
+    """Calculates the population standard deviation."""
+    if len(data) < 2:
+        return 0.0
+    return _stack(data).std(axis=0)
+
+
+def sum_(*data):
+    return _stack(data).sum(axis=0) if data else 0
+
+
+def min_(*data):
+    """ The min() builtin, for two or more arguments """
+    if len(data) < 2:
+        raise TypeError('min() of an array')
+    return functools.reduce(numpy.minimum, (_stack([x])[0] for x in data))
+
+
+def max_(*data):
+    """ The max() builtin, for two or more arguments """
+    if len(data) < 2:
+        raise TypeError('max() of an array')
+    return functools.reduce(numpy.maximum, (_stack([x])[0] for x in data))
@@ -0,0 +1,113 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# REDCap Calculation Dependencies
+#
+
+
+import collections
+
+
+from rios.conversion.exception import RedcapFormatError
+from rios.conversion.redcap.expression import parse
+
+
+__all__ = (
+    'calculation_dependencies',
+    'order_calculations',
+    'sort_dependencies',
+)
+
+
+def calculation_dependencies(calculations):
+    """
+    Returns an OrderedDict mapping the ID of each calculation to the list of
+    the IDs of the calculations its expression refers to, in the order of
+    `calculations`.
+
+    `calculations` is a list of CalculationObjects whose expressions are
+    REDCap expressions (i.e., not yet translated). A calculation [x] may
+    refer to a calculation defined anywhere in the list, and [a][b]
+    references are never calculations.
+    """
+
+    position = dict()
+    for index, calculation in enumerate(calculations):
+        name = calculation['id']
+        if name in position:
+            raise RedcapFormatError(
+                'Duplicate calculation field name:',
+                name,
+            )
+        position[name] = index
+
+    dependencies = collections.OrderedDict()
+    for calculation in calculations:
+        variables = parse(calculation['options']['expression']).variables
+        dependencies[calculation['id']] = sorted(
+            (name for name in variables if name in position),
+            key=position.get,
+        )
+    return dependencies
+
+
+def order_calculations(calculations):
+    """
+    Returns `calculations` in an order where every calculation comes after
+    the calculations it refers to, so each can be evaluated once. Otherwise
+    the data dictionary order is kept.
+
+    Raises RedcapFormatError if calculations refer to each other in a cycle.
+    """
+
+    by_name = dict(
+        (calculation['id'], calculation)
+        for calculation in calculations
+    )
+    return [
+        by_name[name]
+        for name in sort_dependencies(calculation_dependencies(calculations))
+    ]
+
+
+def sort_dependencies(dependencies):
+    """
+    Returns the names of `dependencies`, an OrderedDict mapping each name to
+    the list of the names it depends on, in an order where every name comes
+    after its dependencies. Otherwise the order of `dependencies` is kept.
+
+    Raises RedcapFormatError if names depend on each other in a cycle.
+    """
+
+    # Depth first search, in the order of `dependencies`, appending names
+    # after their dependencies. Iterative, so long chains of calculations
+    # don't exhaust the stack
+    ordered = []
+    done = set()
+    for root in dependencies:
+        if root in done:
+            continue
+        path = [root]
+        on_path = set(path)
+        pending = [iter(dependencies[root])]
+        while pending:
+            for name in pending[-1]:
+                if name in done:
+                    continue
+                if name in on_path:
+                    cycle = path[path.index(name):] + [name]
+                    raise RedcapFormatError(
+                        'Calculations refer to each other in a cycle:',
+                        ' -> '.join(cycle),
+                    )
+                path.append(name)
+                on_path.add(name)
+                pending.append(iter(dependencies[name]))
+                break
+            else:
+                name = path.pop()
+                on_path.discard(name)
+                pending.pop()
+                done.add(name)
+                ordered.append(name)
+    return ordered
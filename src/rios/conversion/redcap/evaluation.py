@@ -0,0 +1,494 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# Evaluation of Converted Calculations
+#
+
+from __future__ import division
+
+
+import __future__
+import collections
+import math
+import numbers
+import re
+import timeit
+
+from rios.conversion.exception import ConversionValueError, RedcapFormatError
+from rios.conversion.redcap import functions
+from rios.conversion.redcap.calculations import sort_dependencies
+from rios.conversion.utils import LRUCache
+
+try:
+    import numpy
+    from rios.conversion.redcap import array_functions
+except ImportError:  # pragma: no cover
+    numpy = None
+    array_functions = None
+
+
+__all__ = (
+    'CalculationEvaluator',
+    'CalculationTiming',
+    'compile_calculation',
+    'evaluate_batch',
+    'get_evaluator',
+)
+
+
+# Errors of a calculation for one assessment, e.g. because of a missing
+# (None) value, whose value is then None. Any other error is a problem with
+# the calculation itself
+VALUE_ERRORS = (ArithmeticError, AttributeError, TypeError, ValueError)
+
+# References to calculations in expressions: calculations["name"]
+RE_calculation_reference = re.compile(
+    r'''\bcalculations\[\s*(?:"([^"]*)"|'([^']*)')\s*\]'''
+)
+
+# Maximum number of compiled calculationsets kept by get_evaluator
+CACHE_SIZE = 256
+
+
+class _Namespace(object):
+    """ Resolves the dotted names of calculation expressions """
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def _expression_globals(functions, math, **builtins):
+    # The names calculation expressions refer to, see
+    # rios.conversion.redcap.expression.FUNCTION_TO_PYTHON
+    rios = _Namespace(conversion=_Namespace(redcap=_Namespace(
+        functions=functions,
+    )))
+    return dict(rios=rios, math=math, **builtins)
+
+
+SCALAR_GLOBALS = _expression_globals(functions, math)
+
+if numpy is not None:
+    ARRAY_GLOBALS = _expression_globals(
+        array_functions,
+        _Namespace(pow=numpy.power, sqrt=numpy.sqrt),
+        min=array_functions.min_,
+        max=array_functions.max_,
+    )
+
+
+def compile_calculation(calculation):
+    """
+    Returns the code object of the expression of `calculation`, a RIOS
+    calculation whose method is "python", like those converted from REDCap
+    calculated fields.
+
+    Expressions are evaluated with true division, as they are in Python 3,
+    whatever the version of Python.
+    """
+
+    if calculation.get('method') != 'python':
+        raise ConversionValueError(
+            'Unable to evaluate calculation "%s" of method:'
+            % calculation['id'],
+            calculation.get('method')
+        )
+    expression = calculation['options']['expression']
+    try:
+        return compile(
+            expression,
+            '<calculation %s>' % calculation['id'],
+            'eval',
+            __future__.division.compiler_flag,
+            True,
+        )
+    except SyntaxError as exc:
+        raise ConversionValueError(
+            'Unable to compile the expression of calculation "%s":'
+            % calculation['id'],
+            '%s\n%s' % (expression, exc)
+        )
+
+
+class _Row(object):
+    """ One assessment's values in columns; None for NaN """
+
+    __slots__ = ('columns', 'index')
+
+    def __init__(self, columns, index):
+        self.columns = columns
+        self.index = index
+
+    def __getitem__(self, name):
+        value = self.columns[name][self.index]
+        return None if value != value else value
+
+
+class _Batch(object):
+    """
+    The values of the calculations of a batch of assessments. A calculation
+    is evaluated when its values are first looked up, so calculations are
+    evaluated after those they refer to, whatever their order.
+    """
+
+    def __init__(self, codes, columns, size):
+        self.codes = codes
+        self.columns = columns
+        self.size = size
+        self.results = dict()
+        self.pending = []
+
+    def __getitem__(self, name):
+        try:
+            return self.results[name]
+        except KeyError:
+            pass
+        if name not in self.codes:
+            raise ConversionValueError(
+                'Calculation "%s" refers to an unknown calculation:'
+                % self.pending[-1],
+                name
+            )
+        if name in self.pending:
+            raise ConversionValueError(
+                'Calculations refer to each other in a cycle:',
+                ' -> '.join(self.pending[self.pending.index(name):] + [name])
+            )
+        self.pending.append(name)
+        try:
+            result = self.evaluate(name, self.codes[name])
+        finally:
+            self.pending.pop()
+        self.results[name] = result
+        return result
+
+    def evaluate(self, name, code):
+        raise NotImplementedError('{}.evaluate'.format(
+            self.__class__.__name__
+        ))
+
+    def evaluate_rows(self, code):
+        """ Returns the list of the values of `code` for each assessment """
+
+        values = []
+        append = values.append
+        for index in range(self.size):
+            try:
+                append(eval(code, SCALAR_GLOBALS, {
+                    'assessment': _Row(self.columns, index),
+                    'calculations': _Row(self, index),
+                }))
+            except VALUE_ERRORS:
+                append(None)
+        return values
+
+
+class _ScalarColumns(dict):
+    """ Assessment columns; missing columns have no values """
+
+    def __init__(self, columns, size):
+        super(_ScalarColumns, self).__init__(columns)
+        self.size = size
+
+    def __missing__(self, name):
+        return [None] * self.size
+
+
+class _ScalarBatch(_Batch):
+    """ Evaluates calculations for one assessment at a time """
+
+    def evaluate(self, name, code):
+        return self.evaluate_rows(code)
+
+
+class _ArrayColumns(dict):
+    """
+    Assessment columns, converted to float arrays when their values are
+    numbers or missing, or to object arrays. Text values are never converted
+    to numbers, as they aren't when evaluating one assessment at a time.
+    """
+
+    def __init__(self, columns, size):
+        super(_ArrayColumns, self).__init__()
+        self.source = columns
+        self.size = size
+
+    def __missing__(self, name):
+        values = self.source.get(name)
+        if values is None:
+            array = numpy.full(self.size, numpy.nan)
+        elif isinstance(values, numpy.ndarray):
+            array = values
+        elif all(value is None or isinstance(value, numbers.Number)
+                 for value in values):
+            array = numpy.asarray(values, dtype=float)
+        else:
+            array = numpy.asarray(values, dtype=object)
+        self[name] = array
+        return array
+
+
+class _ArrayBatch(_Batch):
+    """
+    Evaluates calculations for all assessments at once, on NumPy arrays.
+    Calculations which can't be evaluated on arrays, e.g. because they use
+    text values, are evaluated for one assessment at a time.
+    """
+
+    def evaluate(self, name, code):
+        try:
+            with numpy.errstate(all='ignore'):
+                result = eval(code, ARRAY_GLOBALS, {
+                    'assessment': self.columns,
+                    'calculations': self,
+                })
+            return self.as_array(result)
+        except ConversionValueError:
+            raise
+        except Exception:
+            pass
+        values = self.evaluate_rows(code)
+        if all(value is None or isinstance(value, numbers.Number)
+                for value in values):
+            return self.as_array([
+                numpy.nan if value is None else value
+                for value in values
+            ])
+        return numpy.asarray(values, dtype=object)
+
+    def as_array(self, result):
+        array = numpy.asarray(result)
+        if array.ndim > 1 or (array.ndim == 1 and len(array) != self.size):
+            raise ValueError('Not a value per assessment')
+        array = numpy.broadcast_to(array, (self.size,))
+        if array.dtype.kind in 'fiu':
+            array = array.astype(float)
+            # e.g. division by zero, for which Python raises an error
+            array[~numpy.isfinite(array)] = numpy.nan
+        else:
+            array = array.copy()
+        return array
+
+
+def evaluate_batch(calculationset, columns, use_numpy=None):
+    """
+    Evaluates the calculations of `calculationset`, a RIOS calculationset
+    whose calculations have the "python" method (e.g. one converted from a
+    REDCap data dictionary), for a batch of assessments at once.
+
+    `columns` is a dict of field ID: the values of the field, a sequence
+    with one value per assessment, in the same order for every field.
+    Missing values are None (or NaN). Fields without a column have no
+    values.
+
+    Returns an OrderedDict of calculation ID: the values of the calculation
+    for each assessment, in the order of the calculationset. A value is None
+    (or NaN) where the calculation fails for an assessment, e.g. because a
+    value it refers to is missing.
+
+    If `use_numpy` is True, or None and NumPy is installed, calculations
+    are evaluated on NumPy arrays, all assessments at once, and their
+    values are NumPy arrays: float arrays, with NaN for missing values,
+    for numeric calculations. Otherwise calculations are evaluated one
+    assessment at a time with the functions of
+    rios.conversion.redcap.functions, and their values are lists.
+
+    Raises ConversionValueError if a calculation can't be compiled, or
+    refers to unknown or circular calculations.
+    """
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ValueError(
+            'NumPy is required to evaluate calculations on arrays'
+        )
+
+    sizes = set(len(values) for values in columns.values())
+    if len(sizes) > 1:
+        raise ValueError(
+            'Columns must have the same length. Got: '
+            + repr(sorted(sizes))
+        )
+    size = sizes.pop() if sizes else 0
+
+    codes = collections.OrderedDict(
+        (calculation['id'], compile_calculation(calculation))
+        for calculation in calculationset['calculations']
+    )
+    if use_numpy:
+        batch = _ArrayBatch(codes, _ArrayColumns(columns, size), size)
+    else:
+        batch = _ScalarBatch(codes, _ScalarColumns(columns, size), size)
+    return collections.OrderedDict((name, batch[name]) for name in codes)
+
+
+class CalculationTiming(object):
+    """
+    Counters of the evaluations of a calculation by a CalculationEvaluator:
+    the number of evaluations, how many failed, and their total duration in
+    seconds.
+    """
+
+    __slots__ = ('count', 'errors', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    @property
+    def mean(self):
+        """ The mean duration of an evaluation in seconds """
+        return self.seconds / self.count if self.count else 0.0
+
+    def __repr__(self):
+        return '%s(count=%d, errors=%d, seconds=%f)' % (
+            self.__class__.__name__,
+            self.count,
+            self.errors,
+            self.seconds,
+        )
+
+
+class CalculationEvaluator(object):
+    """
+    Evaluates the calculations of `calculationset`, a RIOS calculationset
+    whose calculations have the "python" method (e.g. one converted from a
+    REDCap data dictionary), for one assessment at a time.
+
+    Usage:
+
+        evaluator = get_evaluator(calculationset)
+        results = evaluator.evaluate({'weight': 70, 'height': 170})
+        results = evaluator.evaluate_assessment(assessment)
+
+    Expressions are compiled once, and evaluated with the functions of
+    rios.conversion.redcap.functions and the math module, in an order where
+    every calculation comes after the calculations it refers to.
+
+    If `timing` is True, `timings` is an OrderedDict of calculation ID:
+    CalculationTiming, counting the evaluations of each calculation.
+
+    Raises ConversionValueError if a calculation can't be compiled, or
+    refers to unknown or circular calculations.
+    """
+
+    def __init__(self, calculationset, timing=True):
+        calculations = calculationset['calculations']
+        codes = collections.OrderedDict(
+            (calculation['id'], compile_calculation(calculation))
+            for calculation in calculations
+        )
+        position = dict((name, index) for index, name in enumerate(codes))
+
+        dependencies = collections.OrderedDict()
+        for calculation in calculations:
+            names = set(
+                double or single
+                for double, single in RE_calculation_reference.findall(
+                    calculation['options']['expression']
+                )
+            )
+            unknown = names.difference(codes)
+            if unknown:
+                raise ConversionValueError(
+                    'Calculation "%s" refers to an unknown calculation:'
+                    % calculation['id'],
+                    ', '.join(sorted(unknown))
+                )
+            dependencies[calculation['id']] = sorted(names, key=position.get)
+        try:
+            order = sort_dependencies(dependencies)
+        except RedcapFormatError as exc:
+            raise ConversionValueError(
+                'Calculations refer to each other in a cycle:',
+                exc.paragraphs[0].payload
+            )
+
+        self.names = list(codes)
+        self.timing = timing
+        self.timings = collections.OrderedDict(
+            (name, CalculationTiming())
+            for name in codes
+        )
+        self.calculations = [
+            (name, codes[name], self.timings[name])
+            for name in order
+        ]
+
+    def evaluate(self, values):
+        """
+        Returns an OrderedDict of calculation ID: value, in the order of
+        the calculationset, for the assessment whose field values are
+        `values`, a mapping of field ID: value. The value of a calculation
+        is None if it fails, e.g. because a value it refers to is missing.
+        """
+
+        calculations = dict()
+        namespace = {'assessment': values, 'calculations': calculations}
+        errors = VALUE_ERRORS + (KeyError,)
+        if self.timing:
+            clock = timeit.default_timer
+            for name, code, timing in self.calculations:
+                start = clock()
+                try:
+                    calculations[name] = eval(code, SCALAR_GLOBALS, namespace)
+                except errors:
+                    calculations[name] = None
+                    timing.errors += 1
+                timing.seconds += clock() - start
+                timing.count += 1
+        else:
+            for name, code, timing in self.calculations:
+                try:
+                    calculations[name] = eval(code, SCALAR_GLOBALS, namespace)
+                except errors:
+                    calculations[name] = None
+        return collections.OrderedDict(
+            (name, calculations[name])
+            for name in self.names
+        )
+
+    def evaluate_assessment(self, assessment):
+        """
+        Returns the calculation values (see evaluate) for `assessment`, a
+        RIOS assessment.
+        """
+
+        return self.evaluate(dict(
+            (name, value.get('value'))
+            for name, value in assessment['values'].items()
+        ))
+
+    def reset_timings(self):
+        """ Resets the counters of `timings` """
+
+        for timing in self.timings.values():
+            timing.__init__()
+
+
+_evaluators = LRUCache(CACHE_SIZE)
+
+
+def get_evaluator(calculationset):
+    """
+    Returns the CalculationEvaluator of `calculationset`. Evaluators are
+    cached, keyed by the IDs, methods, and expressions of the calculations,
+    so each calculationset is compiled once, and the timings of an
+    evaluator count the evaluations of every caller.
+    """
+
+    key = tuple(
+        (
+            calculation['id'],
+            calculation.get('method'),
+            calculation['options']['expression'],
+        )
+        for calculation in calculationset['calculations']
+    )
+    evaluator = _evaluators.get(key)
+    if evaluator is None:
+        evaluator = CalculationEvaluator(calculationset)
+        _evaluators.set(key, evaluator)
+    return evaluator
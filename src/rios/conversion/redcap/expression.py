@@ -0,0 +1,427 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# REDCap Expression Translation
+#
+
+
+import collections
+import re
+
+
+from rios.conversion.utils import LRUCache
+
+
+__all__ = (
+    'FUNCTION_TO_PYTHON',
+    'OPERATOR_TO_REXL',
+    'Expression',
+    'parse',
+    'tokenize',
+    'redcap_to_python',
+    'rexl_to_redcap',
+    'rexl_variables_to_redcap',
+)
+
+
+# dict: each item => REDCap name: rios.conversion name
+FUNCTION_TO_PYTHON = {
+    'min': 'min',
+    'max': 'max',
+    'mean': 'rios.conversion.redcap.functions.mean',
+    'median': 'rios.conversion.redcap.functions.median',
+    'sum': 'rios.conversion.redcap.functions.sum_',
+    'stdev': 'rios.conversion.redcap.functions.stdev',
+    'round': 'rios.conversion.redcap.functions.round_',
+    'roundup': 'rios.conversion.redcap.functions.roundup',
+    'rounddown': 'rios.conversion.redcap.functions.rounddown',
+    'sqrt': 'math.sqrt',
+    'abs': 'abs',
+    'datediff': 'rios.conversion.redcap.functions.datediff',
+}
+
+# Array of tuples: (REDCap operator, rios.conversion operator)
+OPERATOR_TO_REXL = [
+    (r'<>', r'!='),
+]
+
+# dict: each item => rios.conversion name: REDCap name
+FUNCTION_TO_REDCAP = dict(
+    (python, redcap)
+    for redcap, python in FUNCTION_TO_PYTHON.items()
+)
+
+# Maximum number of parsed expressions and translations kept in memory
+CACHE_SIZE = 4096
+
+
+# Token kinds, in order of precedence
+TOKENS = [
+    ('space', r'\s+'),
+    ('string', r'"[^"]*"|\'[^\']*\''),
+    ('reference', r'\[[^\[\]]*\]'),
+    ('number', r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'),
+    ('name', r'[A-Za-z_]\w*'),
+    ('operator', '|'.join(
+        re.escape(redcap) for redcap, _ in OPERATOR_TO_REXL
+    )),
+    ('lparen', r'\('),
+    ('rparen', r'\)'),
+    ('caret', r'\^'),
+    ('other', r'.'),
+]
+
+RE_token = re.compile(
+    '|'.join('(?P<%s>%s)' % token for token in TOKENS),
+    re.DOTALL,
+)
+
+# Variable names usable in a translated reference: [name]
+RE_variable = re.compile(r'^\[([\w_]+)\]$')
+
+OPERATORS = dict(OPERATOR_TO_REXL)
+
+# Names which are followed by parentheses without being function calls
+KEYWORDS = ('and', 'or', 'not')
+
+
+# Token kinds of rios.conversion expressions, in order of precedence
+REXL_TOKENS = [
+    ('space', r'\s+'),
+    ('variable', r'[A-Za-z]\w*\[\s*(?:"[^"\]]*"|\'[^\'\]]*\')\s*\]'),
+    ('string', r'"[^"]*"|\'[^\']*\''),
+    ('number', r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'),
+    ('name', r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*'),
+    ('operator', '|'.join(
+        re.escape(rexl) for _, rexl in OPERATOR_TO_REXL
+    )),
+    ('lparen', r'\('),
+    ('rparen', r'\)'),
+    ('comma', r','),
+    ('other', r'.'),
+]
+
+RE_rexl_token = re.compile(
+    '|'.join('(?P<%s>%s)' % token for token in REXL_TOKENS),
+    re.DOTALL,
+)
+
+# Variable reference: table["field"] or table['field']
+RE_rexl_variable = re.compile(r'''^([A-Za-z]\w*)\[\s*["'](.*)["']\s*\]$''')
+
+REXL_OPERATORS = dict((rexl, redcap) for redcap, rexl in OPERATOR_TO_REXL)
+
+# Tables whose fields are REDCap variables: table["a"] => [a]
+VARIABLE_TABLES = ('assessment', 'calculations')
+
+
+Token = collections.namedtuple('Token', 'kind text')
+
+# AST nodes. Anything else in an expression is a Token, emitted as is
+Group = collections.namedtuple('Group', 'nodes closed')
+Call = collections.namedtuple('Call', 'name group')
+Reference = collections.namedtuple('Reference', 'table field')
+Power = collections.namedtuple('Power', 'base exponent')
+
+
+def tokenize(expression):
+    """ Generates the Tokens of a REDCap `expression` in a single scan """
+
+    for match in RE_token.finditer(expression):
+        yield Token(match.lastgroup, match.group())
+
+
+class Expression(object):
+    """
+    A parsed REDCap expression.
+
+    `nodes` is the expression's AST, a list of Tokens, Groups, Calls,
+    References and Powers, and `variables` is the set of variable names it
+    references as [name].
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.variables = set()
+        self._tokens = list(tokenize(text))
+        self._position = 0
+        self.nodes = self._parse_nodes(top=True)
+        del self._tokens
+
+    def to_python(self, calculation_variables=()):
+        """
+        Returns the Python expression for a rios.conversion calculation.
+
+        - database reference: [a][b] => a["b"]
+        - assessment variable reference: [a] => assessment["a"]
+        - calculation variable reference: [c] => calculations["c"], where
+          c is in `calculation_variables`
+        - REDCap function names => Python function names
+        - caret: (a)^(b) => math.pow(a, b)
+        - operators: <> => !=
+        """
+
+        output = []
+        self._emit(self.nodes, calculation_variables, output)
+        return ''.join(output)
+
+    def _parse_nodes(self, top=False):
+        # Parses tokens up to the closing parenthesis of the current group
+        nodes = []
+        tokens = self._tokens
+        while self._position < len(tokens):
+            token = tokens[self._position]
+            self._position += 1
+            kind = token.kind
+            if kind == 'rparen':
+                if not top:
+                    return self._parse_powers(nodes), True
+                nodes.append(token)
+            elif kind == 'lparen':
+                group = Group(*self._parse_nodes())
+                if nodes and nodes[-1].__class__ is Token \
+                        and nodes[-1].kind == 'name' \
+                        and nodes[-1].text not in KEYWORDS:
+                    nodes[-1] = Call(nodes[-1].text, group)
+                else:
+                    nodes.append(group)
+            elif kind == 'reference':
+                nodes.append(self._parse_reference(token))
+            else:
+                nodes.append(token)
+        if top:
+            return self._parse_powers(nodes)
+        return self._parse_powers(nodes), False
+
+    def _parse_reference(self, token):
+        variable = RE_variable.match(token.text)
+        if not variable:
+            return token
+        tokens = self._tokens
+        if self._position < len(tokens):
+            following = tokens[self._position]
+            field = (
+                RE_variable.match(following.text)
+                if following.kind == 'reference'
+                else None
+            )
+            if field:
+                self._position += 1
+                return Reference(variable.group(1), field.group(1))
+        self.variables.add(variable.group(1))
+        return Reference(None, variable.group(1))
+
+    @staticmethod
+    def _parse_powers(nodes):
+        # Binds each caret to the operands on either side of it. Scanning
+        # from the right makes a^b^c parse as a^(b^c), and each node is
+        # visited once
+        if not any(
+                node.__class__ is Token and node.kind == 'caret'
+                for node in nodes):
+            return nodes
+
+        def is_operand(node):
+            return node.__class__ is not Token \
+                or node.kind in ('name', 'number', 'string')
+
+        reverse = []
+        index = len(nodes) - 1
+        while index >= 0:
+            node = nodes[index]
+            index -= 1
+            if node.__class__ is not Token or node.kind != 'caret':
+                reverse.append(node)
+                continue
+            exponent = len(reverse) - 1
+            while exponent >= 0 and reverse[exponent].__class__ is Token \
+                    and reverse[exponent].kind == 'space':
+                exponent -= 1
+            base = index
+            while base >= 0 and nodes[base].__class__ is Token \
+                    and nodes[base].kind == 'space':
+                base -= 1
+            if exponent < 0 or base < 0 \
+                    or not is_operand(reverse[exponent]) \
+                    or not is_operand(nodes[base]):
+                # Not a binary caret, so it is left as is
+                reverse.append(node)
+                continue
+            power = Power(nodes[base], reverse[exponent])
+            del reverse[exponent:]
+            reverse.append(power)
+            index = base - 1
+        reverse.reverse()
+        return reverse
+
+    def _emit(self, nodes, calculation_variables, output):
+        for node in nodes:
+            cls = node.__class__
+            if cls is Token:
+                if node.kind == 'operator':
+                    output.append(OPERATORS[node.text])
+                else:
+                    output.append(node.text)
+            elif cls is Reference:
+                if node.table is not None:
+                    output.append('%s["%s"]' % (node.table, node.field))
+                elif node.field in calculation_variables:
+                    output.append('calculations["%s"]' % node.field)
+                else:
+                    output.append('assessment["%s"]' % node.field)
+            elif cls is Group:
+                output.append('(')
+                self._emit(node.nodes, calculation_variables, output)
+                if node.closed:
+                    output.append(')')
+            elif cls is Call:
+                output.append(FUNCTION_TO_PYTHON.get(node.name, node.name))
+                self._emit([node.group], calculation_variables, output)
+            else:
+                output.append('math.pow(')
+                self._emit_operand(node.base, calculation_variables, output)
+                output.append(', ')
+                self._emit_operand(
+                    node.exponent,
+                    calculation_variables,
+                    output,
+                )
+                output.append(')')
+
+    def _emit_operand(self, node, calculation_variables, output):
+        # The parentheses of a parenthesized operand are redundant inside
+        # math.pow(), so they are dropped
+        if node.__class__ is Group and node.closed:
+            self._emit(node.nodes, calculation_variables, output)
+        else:
+            self._emit([node], calculation_variables, output)
+
+
+_parsed = LRUCache(CACHE_SIZE)
+_translated = LRUCache(CACHE_SIZE)
+
+
+def parse(expression):
+    """ Returns the Expression for `expression`, a REDCap expression """
+
+    parsed = _parsed.get(expression)
+    if parsed is None:
+        parsed = Expression(expression)
+        _parsed.set(expression, parsed)
+    return parsed
+
+
+def redcap_to_python(expression, calculation_variables=()):
+    """
+    Returns the Python form of `expression`, a REDCap calculation or
+    branching logic expression. See Expression.to_python.
+
+    Translations are memoized, keyed by the expression text and by which of
+    its variables are calculation variables, since many fields share the
+    same branching logic.
+    """
+
+    parsed = parse(expression)
+    key = (expression, frozenset(
+        parsed.variables.intersection(calculation_variables)
+    ))
+    translated = _translated.get(key)
+    if translated is None:
+        translated = parsed.to_python(calculation_variables)
+        _translated.set(key, translated)
+    return translated
+
+
+def _variable_to_redcap(text):
+    # table["field"] => [table][field], or [field] for VARIABLE_TABLES
+    table, field = RE_rexl_variable.match(text).groups()
+    if table in VARIABLE_TABLES:
+        return '[%s]' % field
+    return '[%s][%s]' % (table, field)
+
+
+def _rexl_to_redcap(expression):
+    tokens = [
+        (match.lastgroup, match.group())
+        for match in RE_rexl_token.finditer(expression)
+    ]
+    output = []
+    # The open parentheses: lists of [is math.pow, output index, commas]
+    groups = []
+    power = False
+    for index, (kind, text) in enumerate(tokens):
+        if kind == 'name':
+            if index + 1 < len(tokens) and tokens[index + 1][0] == 'lparen':
+                if text == 'math.pow':
+                    power = True
+                else:
+                    output.append(FUNCTION_TO_REDCAP.get(text, text))
+            else:
+                output.append(text)
+        elif kind == 'variable':
+            output.append(_variable_to_redcap(text))
+        elif kind == 'operator':
+            output.append(REXL_OPERATORS[text])
+        elif kind == 'lparen':
+            groups.append([power, len(output), []])
+            output.append('math.pow(' if power else text)
+            power = False
+        elif kind == 'comma':
+            if groups:
+                groups[-1][2].append(len(output))
+            output.append(text)
+        elif kind == 'rparen':
+            output.append(text)
+            if groups:
+                is_power, start, commas = groups.pop()
+                if is_power and len(commas) == 1:
+                    # math.pow(base, exponent) => (base)^(exponent)
+                    comma = commas[0]
+                    output[start:] = ['(%s)^(%s)' % (
+                        ''.join(output[start + 1:comma]).strip(),
+                        ''.join(output[comma + 1:-1]).strip(),
+                    )]
+        else:
+            output.append(text)
+    return ''.join(output)
+
+
+_rexl_translated = LRUCache(CACHE_SIZE)
+
+
+def rexl_to_redcap(expression):
+    """
+    Returns the REDCap form of `expression`, a rios.conversion calculation
+    or trigger expression, translated in a single scan:
+
+    - database reference: a["b"] => [a][b]
+    - assessment variable reference: assessment["a"] => [a]
+    - calculation variable reference: calculations["c"] => [c]
+    - Python function names => REDCap function names
+    - math.pow(a, b) => (a)^(b)
+    - operators: != => <>
+
+    Quoted text is left as is. Translations are memoized, keyed by the
+    expression text.
+    """
+
+    translated = _rexl_translated.get(expression)
+    if translated is None:
+        translated = _rexl_to_redcap(expression)
+        _rexl_translated.set(expression, translated)
+    return translated
+
+
+def rexl_variables_to_redcap(expression):
+    """
+    Returns `expression`, a rios.conversion calculation or trigger
+    expression, with only its variable references translated, as
+    rexl_to_redcap translates them.
+    """
+
+    return ''.join(
+        _variable_to_redcap(match.group())
+        if match.lastgroup == 'variable'
+        else match.group()
+        for match in RE_rexl_token.finditer(expression)
+    )
@@ -0,0 +1,234 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# REDCap Field Type Handlers
+#
+
+
+import ast
+
+
+from rios.conversion.base import structures
+from rios.conversion.exception import ConversionValueError
+
+
+__all__ = (
+    'FieldTypeHandler',
+    'FIELD_TYPE_HANDLERS',
+    'register_field_type',
+)
+
+
+# Choices of the yesno and truefalse field types: (id, label)
+YESNO_CHOICES = (('yes', 'Yes'), ('no', 'No'))
+TRUEFALSE_CHOICES = (('true', 'True'), ('false', 'False'))
+
+
+def isint(s):
+    """ Checks if a numerical string value is an integer """
+    val = ast.literal_eval(s)
+    chk = isinstance(val, int) or (isinstance(val, float) and val.is_integer())
+    return chk
+
+
+def get_widget(type):
+    return structures.WidgetConfigurationObject(type=type)
+
+
+def get_widget_type(text_type):
+    if text_type == 'text':
+        return 'inputText'
+    elif text_type in ['integer', 'float']:
+        return 'inputNumber'
+    elif text_type == 'dateTime':
+        return 'dateTimePicker'
+    else:
+        raise ConversionValueError(
+            'Unexpected text type. Got:', str(text_type)
+        )
+
+
+class FieldTypeHandler(object):
+    """
+    Abstract base class for the handlers of REDCap field types.
+
+    Handlers are created once, when registered (see register_field_type),
+    and are called for every row of their field type by Processor.get_type.
+    """
+
+    def __call__(self, processor, question, row, side_effects=True):
+        """
+        Returns the instrument field type of `row`: a type name, a
+        TypeObject, or None if the row is not an instrument field.
+
+        Also has side effects when side_effects is True.
+        - can store a calculation (see ProcessorBase.store_calculation).
+        - updates `question`, the row's QuestionObject:
+            enumerations, questions, rows, widget, events
+
+        Implementations must override this method.
+        """
+
+        raise NotImplementedError(
+            '{}.__call__'.format(self.__class__.__name__)
+        )
+
+
+class CalculationHandler(FieldTypeHandler):
+    """ Stores the calculation of calc rows, which are not fields """
+
+    def __call__(self, processor, question, row, side_effects=True):
+        # The REDCap expression is translated by RedcapToRios once all
+        # the calculations are known
+        if side_effects:
+            processor.store_calculation(structures.CalculationObject(
+                id=processor.reader.get_name(row['variable_field_name']),
+                description=row['field_label'],
+                type='float',
+                method='python',
+                options={'expression': row['choices_or_calculations']},
+            ))
+        return None     # not an instrument field
+
+
+class ChoicesHandler(FieldTypeHandler):
+    """
+    Handles field types whose choices are listed in choices_or_calculations
+    (see ProcessorBase.parse_choices).
+    """
+
+    def __init__(self, widget, base):
+        self.widget = widget
+        self.base = base
+
+    def __call__(self, processor, question, row, side_effects=True):
+        if side_effects:
+            question.set_widget(get_widget(type=self.widget))
+            question['enumerations'] = processor.get_choices_form(row)
+        return processor.get_choices_type(self.base, row)
+
+
+class FixedChoicesHandler(FieldTypeHandler):
+    """ Handles field types with fixed choices, e.g. yesno """
+
+    def __init__(self, choices):
+        self.choices = choices
+
+    def __call__(self, processor, question, row, side_effects=True):
+        if side_effects:
+            question.set_widget(get_widget(type='radioGroup'))
+            for name, label in self.choices:
+                question.add_enumeration(
+                    processor.pool.descriptor(name, label)
+                )
+        return processor.pool.enumeration_type('enumeration', self.choices)
+
+
+class NotesHandler(FieldTypeHandler):
+
+    def __call__(self, processor, question, row, side_effects=True):
+        if side_effects:
+            question.set_widget(get_widget(type='textArea'))
+        return 'text'
+
+
+class SliderHandler(FieldTypeHandler):
+
+    def __call__(self, processor, question, row, side_effects=True):
+        if side_effects:
+            question.set_widget(get_widget(type='inputNumber'))
+        return structures.TypeObject(
+                base='float',
+                range=structures.BoundConstraintObject(
+                        min=0.0,
+                        max=100.0), )
+
+
+class TextHandler(FieldTypeHandler):
+    """ Handles text rows, whose type depends on their validation """
+
+    def __call__(self, processor, question, row, side_effects=True):
+        val_min = row['text_validation_min']
+        val_max = row['text_validation_max']
+
+        # Determine text type
+        val_min_is_int = False if not val_min else isint(val_min)
+        val_max_is_int = False if not val_max else isint(val_max)
+        if val_min and val_max:
+            if val_min_is_int and val_max_is_int:
+                text_type = 'integer'
+            else:
+                # One of the values may be a float, so cast to float
+                text_type = 'float'
+                if val_min_is_int:
+                    val_min = val_min + '.0'
+                if val_max_is_int:
+                    val_max = val_max + '.0'
+        elif val_min and not val_max:
+            if val_min_is_int:
+                text_type = 'integer'
+            else:
+                text_type = 'float'
+        elif not val_min and val_max:
+            if val_max_is_int:
+                text_type = 'integer'
+            else:
+                text_type = 'float'
+        else:
+            # val_min and val_max are empty
+            text_type = processor.convert_text_type(row['text_validation'])
+
+        # Get widget for text_type
+        if side_effects:
+            question.set_widget(get_widget(
+                    type=get_widget_type(text_type)))
+
+        # Created bounded constraint object
+        if val_min or val_max:
+            bound_constraint = structures.BoundConstraintObject()
+            if val_min:
+                bound_constraint['min'] = processor.convert_value(
+                        val_min,
+                        text_type)
+            if val_max:
+                bound_constraint['max'] = processor.convert_value(
+                        val_max,
+                        text_type)
+            return structures.TypeObject(
+                    base=text_type,
+                    range=bound_constraint)
+        else:
+            return text_type
+
+
+# dict: each item => REDCap field type: FieldTypeHandler
+FIELD_TYPE_HANDLERS = {
+    'calc': CalculationHandler(),
+    'checkbox': ChoicesHandler('checkGroup', 'enumerationSet'),
+    'dropdown': ChoicesHandler('dropDown', 'enumeration'),
+    'notes': NotesHandler(),
+    'radio': ChoicesHandler('radioGroup', 'enumeration'),
+    'slider': SliderHandler(),
+    'text': TextHandler(),
+    'truefalse': FixedChoicesHandler(TRUEFALSE_CHOICES),
+    'yesno': FixedChoicesHandler(YESNO_CHOICES),
+}
+
+
+def register_field_type(field_type, handler):
+    """
+    Registers `handler` to convert the REDCap rows of `field_type`, e.g.
+    "file" or "descriptive", replacing any handler already registered for
+    it. `handler` is a FieldTypeHandler, or any callable with the same
+    signature.
+
+    Parallel conversions (see RedcapToRios) only see handlers registered
+    before their worker processes start, or, on platforms which don't fork
+    workers, handlers registered when a module is imported.
+    """
+
+    if not callable(handler):
+        raise ValueError(
+            'Field type handlers must be callable. Got: ' + repr(handler)
+        )
+    FIELD_TYPE_HANDLERS[field_type] = handler
@@ -0,0 +1,115 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# REDCap Data Dictionary Splitting
+#
+
+
+import collections
+import csv
+
+import six
+
+from rios.conversion.exception import RedcapFormatError
+from rios.conversion.redcap.expression import parse
+from rios.conversion.redcap.to_rios import CsvReaderWithGetName
+
+
+__all__ = (
+    'FormReference',
+    'split_forms',
+)
+
+
+# A reference from a row of one form to a field of another:
+# - form, field: the form, and the field or calculation, of the row
+# - source: where the reference is, "calculation" or "branching logic"
+# - reference, reference_form: the field referred to, and its form
+FormReference = collections.namedtuple(
+    'FormReference',
+    'form field source reference reference_form',
+)
+
+
+def _write_rows(header, rows):
+    output = six.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def split_forms(stream):
+    """
+    Splits the REDCap data dictionary in `stream` by form (the "Form Name"
+    column, or the "page" column of legacy data dictionaries).
+
+    Returns a tuple of:
+    - an OrderedDict of canonical form name: the text of the data
+      dictionary of the form's rows, in the order in which the forms first
+      appear.
+    - the list of the FormReferences of calculations and branching logic
+      to fields of other forms, which are not defined in the data
+      dictionary of their form.
+
+    The header of the form data dictionaries has the canonical column
+    names, which convert like the original ones.
+    """
+
+    reader = CsvReaderWithGetName(stream, fast=True)
+    reader.load_attributes()
+    get_name = reader.get_name
+    attributes = reader.attributes
+    if 'form_name' in attributes:
+        form_column = 'form_name'
+        field_column = 'variable_field_name'
+    elif 'page' in attributes:
+        form_column = 'page'
+        field_column = 'fieldid'
+    else:
+        raise RedcapFormatError(
+            'REDCap data dictionaries must contain the "Form Name" column'
+        )
+
+    rows = collections.OrderedDict()
+    field_forms = dict()
+    expressions = []
+    for row in reader:
+        form = get_name(row[form_column]) if row[form_column] else 'page_0'
+        rows.setdefault(form, []).append(row)
+        field = get_name(row.get(field_column, ''))
+        field_forms[field] = form
+        if row.get('field_type') == 'calc':
+            expressions.append((
+                form,
+                field,
+                'calculation',
+                row['choices_or_calculations'],
+            ))
+        if row.get('branching_logic'):
+            expressions.append((
+                form,
+                field,
+                'branching logic',
+                row['branching_logic'],
+            ))
+
+    references = []
+    for form, field, source, expression in expressions:
+        for variable in sorted(parse(expression).variables):
+            reference = get_name(variable)
+            reference_form = field_forms.get(reference)
+            if reference_form is not None and reference_form != form:
+                references.append(FormReference(
+                    form,
+                    field,
+                    source,
+                    reference,
+                    reference_form,
+                ))
+
+    forms = collections.OrderedDict(
+        (form, _write_rows(attributes, form_rows))
+        for form, form_rows in rows.items()
+    )
+    return forms, references
@@ -3,20 +3,21 @@
 #
 
 
-import re
+import csv
 import collections
 
+import six
+
 
-from rios.core.validation.instrument import get_full_type_definition
 from rios.conversion.base import FromRios
 from rios.conversion.exception import (
     ConversionValueError,
     RiosFormatError,
     Error,
 )
-from rios.conversion.redcap.to_rios import (
-    FUNCTION_TO_PYTHON,
-    OPERATOR_TO_REXL,
+from rios.conversion.redcap.expression import (
+    rexl_to_redcap,
+    rexl_variables_to_redcap,
 )
 
 
@@ -46,37 +47,18 @@ COLUMNS = [
         "Field Annotation",
         ]
 
-# dict: each item => rios.conversion name: REDCap name
-FUNCTION_TO_REDCAP = {rios: red for red, rios in FUNCTION_TO_PYTHON.items()}
-
-# dict of function name: pattern which finds "name("
-RE_funcs = {
-        k: re.compile(r'\b%s\(' % k)
-        for k in FUNCTION_TO_REDCAP.keys()}
-
-# array of (regex pattern, replacement)
-RE_ops = [(re.compile(rexl), redcap) for redcap, rexl in OPERATOR_TO_REXL]
-
-# Find math.pow function: math.pow(base, exponent)
-# \1 => base, \2 => exponent
-RE_pow_function = re.compile(r'\bmath.pow\(\s*(.+)\s*,\s*(.+)\s*\)')
-
-# Find variable reference: table["field"] or table['field']
-# \1 => table, \2 => quote \3 => field
-RE_variable_reference = re.compile(
-        r'''\b([a-zA-Z][\w_]*)'''
-        r'''\[\s*(["'])'''
-        r'''([^\2\]]*)'''
-        r'''\2\s*\]''')
-
 
 class RedcapFromRios(FromRios):
     """ Converts a RIOS configuration into a REDCap configuration """
 
     def __call__(self):
-        self._rows = collections.deque()
-        self._rows.append(COLUMNS)
-        self.section_header = ''
+        self._definition.append(collections.deque(self.iter_rows()))
+
+    def iter_rows(self):
+        """
+        Generates the rows of the REDCap data dictionary, the header row
+        first, as each page and calculation is converted.
+        """
 
         if 'pages' not in self._form or not self._form['pages']:
             raise RiosFormatError(
@@ -84,6 +66,11 @@ class RedcapFromRios(FromRios):
                 "RIOS form configuration does not contain page data"
             )
 
+        # Rows converted, but not yet generated
+        self._rows = collections.deque()
+        self.section_header = ''
+        yield COLUMNS
+
         # Process form and instrument configurations
         for page in self._form['pages']:
             try:
@@ -116,6 +103,8 @@ class RedcapFromRios(FromRios):
                     )
                     self.logger.error(repr(error))
                     raise exc
+            while self._rows:
+                yield self._rows.popleft()
 
         # Process calculations
         if self._calculationset:
@@ -143,8 +132,32 @@ class RedcapFromRios(FromRios):
                         self.logger.warning(str(exc))
                     else:
                         raise exc
+                while self._rows:
+                    yield self._rows.popleft()
+
+    def write_csv(self, fileobj):
+        """
+        Writes the REDCap data dictionary to `fileobj` as CSV, each row as
+        soon as it is converted. Returns the number of rows written.
 
-        self._definition.append(self._rows)
+        On Python 3, `fileobj` should be a text file opened with
+        ``newline=''``; on Python 2, a binary file, to which text is
+        written UTF-8 encoded.
+        """
+
+        writer = csv.writer(fileobj)
+        count = 0
+        for row in self.iter_rows():
+            if six.PY2:
+                row = [
+                    cell.encode('utf-8')
+                    if isinstance(cell, six.text_type)
+                    else cell
+                    for cell in row
+                ]
+            writer.writerow(row)
+            count += 1
+        return count
 
     def page_processor(self, page):
         self.form_name = page.get('id', None)
@@ -190,41 +203,24 @@ class RedcapFromRios(FromRios):
         Convert REXL expression into REDCap expressions
 
         - convert operators
-        - convert caret to pow
-        - convert redcap function names to python
+        - convert pow to caret
+        - convert python function names to redcap
         - convert database reference:  a["b"] => [a][b]
         - convert assessment variable reference: assessment["a"] => [a]
         - convert calculation variable reference: calculations["c"] => [c]
-        """
 
-        s = rexl
-        for pattern, replacement in RE_ops:
-            s = pattern.sub(replacement, s)
-        s = RE_pow_function.sub(r'(\1)^(\2)', s)
-        for name, pattern in RE_funcs.items():
-            # the matched pattern includes the '('
-            s = pattern.sub('%s(' % FUNCTION_TO_REDCAP[name], s)
-        s = self.convert_variables(s)
-        return s
+        See rios.conversion.redcap.expression.
+        """
+        return rexl_to_redcap(rexl)
 
     @staticmethod
     def convert_variables(s):
-        start = 0
-        answer = ''
-        while 1:
-            match = RE_variable_reference.search(s[start:])
-            if match:
-                table, quote, field = match.groups()
-                if table in ['assessment', 'calculations']:
-                    replacement = '[%s]' % field
-                else:
-                    replacement = '[%s][%s]' % (table, field)
-                answer += s[start: start + match.start()] + replacement
-                start += match.end()
-            else:
-                break
-        answer += s[start:]
-        return answer
+        """
+        Converts only the variable references of REXL expression `s`.
+
+        See rios.conversion.redcap.expression.rexl_variables_to_redcap.
+        """
+        return rexl_variables_to_redcap(s)
 
     def get_choices(self, array):
         return ' | '.join(['%s, %s' % (
@@ -316,10 +312,7 @@ class RedcapFromRios(FromRios):
         section_header = self.section_header
         matrix_group_name = question['fieldId']
         field = self.fields[matrix_group_name]
-        type_object = get_full_type_definition(
-            self._instrument,
-            field['type']
-        )
+        type_object = self.get_full_type(matrix_group_name)
         base = type_object['base']
         field_type, valid_type = self.get_type_tuple(base, question)
         for row in question['rows']:
@@ -375,9 +368,7 @@ class RedcapFromRios(FromRios):
         else:
             field_id = question['fieldId']
             field = self.fields[field_id]
-            type_object = get_full_type_definition(
-                    self._instrument,
-                    field['type'])
+            type_object = self.get_full_type(field_id)
             base = type_object['base']
             field_type, valid_type = self.get_type_tuple(base, question)
             min_value, max_value = get_range(type_object)
@@ -0,0 +1,421 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+# REDCap Record Conversion
+#
+
+
+import re
+import zlib
+
+import six
+
+from rios.core import ValidationError, get_full_type_definition
+from rios.core.validation.assessment import Assessment
+from rios.conversion.exception import (
+    ConversionValidationError,
+    ConversionValueError,
+)
+from rios.conversion.redcap.to_rios import CsvReaderWithGetName
+from rios.conversion.utils import CsvReader, iter_json_array
+
+
+__all__ = (
+    'RedcapRecordToRios',
+    'iter_redcap_records',
+)
+
+
+# Export columns which hold record metadata: column: assessment meta key
+META_COLUMNS = {
+    'redcap_event_name': 'redcapEventName',
+    'redcap_repeat_instrument': 'redcapRepeatInstrument',
+    'redcap_repeat_instance': 'redcapRepeatInstance',
+}
+
+# Separates a checkbox field's name from a choice code: field___code
+CHECKBOX_SEPARATOR = '___'
+
+# Values of checked checkbox columns, in raw and label exports
+CHECKED = ('1', 'Checked')
+
+# Export values of the yesno and truefalse field types
+BOOLEAN_CHOICES = {
+    frozenset(['yes', 'no']): {'1': 'yes', '0': 'no'},
+    frozenset(['true', 'false']): {'1': 'true', '0': 'false'},
+}
+
+RE_date = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+RE_date_time = re.compile(
+    r'^(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2})(:\d{2})?$'
+)
+RE_time = re.compile(r'^(\d{2}:\d{2})(:\d{2})?$')
+
+
+def iter_redcap_records(stream, format=None):
+    """
+    Generates the records of a REDCap record export one at a time, so the
+    export is never held in memory.
+
+    `stream` is a filename or file object of a flat CSV export, or of a JSON
+    export (an array of flat objects). `format` is "csv" or "json", and is
+    detected from the first character of the export if None, which requires
+    `stream` to be a filename or a seekable file object.
+
+    Records are mappings of export column names to text values.
+    """
+
+    if format is None:
+        if isinstance(stream, six.string_types):
+            with open(stream, 'r') as fi:
+                head = fi.read(1024)
+        elif hasattr(stream, 'seek'):
+            stream.seek(0)
+            head = stream.read(1024)
+            stream.seek(0)
+        else:
+            raise ValueError(
+                'The format of unseekable REDCap record streams must be'
+                ' specified'
+            )
+        format = 'json' if head.lstrip()[:1] in ('[', '{') else 'csv'
+
+    if format == 'csv':
+        return iter(CsvReader(stream, fast=True))
+    elif format == 'json':
+        return iter_json_array(stream)
+    else:
+        raise ValueError(
+            'Invalid REDCap record format. Expected "csv" or "json". Got: '
+            + repr(format)
+        )
+
+
+class RedcapRecordToRios(object):
+    """
+    Converts REDCap records into RIOS assessments of `instrument`, an
+    instrument definition converted from the REDCap data dictionary (see
+    rios.conversion.redcap_to_rios).
+
+    Usage:
+
+        convert = RedcapRecordToRios(instrument)
+        for record in iter_redcap_records(stream):
+            assessment = convert(record)
+
+    Export columns are matched to instrument fields by their canonical
+    names (see CsvReaderWithGetName.get_name), as the data dictionary names
+    were:
+    - checkbox columns, field___code, are the choices of an enumerationSet.
+    - the columns of the rows of a matrix are the cells of the matrix.
+    - a field whose ID was suffixed with its section header name is matched
+      to the longest column name it starts with.
+    Fields without a column have no value.
+
+    The column of `record_id_field`, by default the first instrument field,
+    identifies the record. The record ID, and the REDCap event and repeat
+    instance, are stored in the assessment's ``meta``.
+
+    If `validate` is True, assessments are validated against the instrument.
+    """
+
+    def __init__(self, instrument, record_id_field=None, validate=False):
+        self.instrument = instrument
+        self.record_id_field = record_id_field \
+            or instrument['record'][0]['id']
+        self.validator = Assessment(instrument=instrument) \
+            if validate else None
+        self.reader = CsvReaderWithGetName(None)
+        self._plans = dict()
+
+    def __call__(self, record):
+        """ Returns the assessment of `record`, a REDCap export record """
+
+        plan = self.get_plan(record)
+        meta = dict()
+        if plan.record_id is not None:
+            meta['redcapRecordId'] = record.get(plan.record_id, '')
+        for column, key in plan.meta:
+            value = record.get(column, '')
+            if value:
+                meta[key] = value
+
+        values = dict()
+        try:
+            for field_id, get_value in plan.fields:
+                values[field_id] = {'value': get_value(record)}
+        except ConversionValueError as exc:
+            exc.wrap(
+                'Unable to convert REDCap record:',
+                meta.get('redcapRecordId')
+            )
+            raise exc
+
+        assessment = {
+            'instrument': {
+                'id': self.instrument['id'],
+                'version': self.instrument['version'],
+            },
+            'values': values,
+        }
+        if meta:
+            assessment['meta'] = meta
+        if self.validator is not None:
+            try:
+                self.validator.deserialize(assessment)
+            except ValidationError as exc:
+                error = ConversionValidationError(
+                    'Assessment validation error:',
+                    str(exc)
+                )
+                error.wrap(
+                    'Unable to convert REDCap record:',
+                    meta.get('redcapRecordId')
+                )
+                raise error
+        return assessment
+
+    def get_record_id(self, record):
+        """
+        Returns the record ID of `record`, a REDCap export record.
+
+        Raises ConversionValueError if the export has no record ID column.
+        """
+
+        column = self.get_plan(record).record_id
+        if column is None:
+            raise ConversionValueError(
+                'Missing the record ID column of the REDCap export:',
+                self.record_id_field
+            )
+        return record.get(column, '')
+
+    def get_plan(self, record):
+        """
+        Returns the RecordPlan for the columns of `record`. Plans are built
+        once per distinct list of columns, i.e. once per export.
+        """
+
+        columns = tuple(record.keys())
+        plan = self._plans.get(columns)
+        if plan is None:
+            plan = RecordPlan(self, columns)
+            self._plans[columns] = plan
+        return plan
+
+
+class RecordPlan(object):
+    """
+    How to build the values of an assessment from the columns of a REDCap
+    export.
+
+    `fields` is a list of (field ID, function of a record returning the
+    field's value), `record_id` is the record ID column, and `meta` is a
+    list of (column, assessment meta key).
+    """
+
+    def __init__(self, converter, columns):
+        get_name = converter.reader.get_name
+        self.converter = converter
+        self.instrument = converter.instrument
+
+        # Canonical name: column, and canonical name: [(column, code), ...]
+        self.columns = dict()
+        self.checkboxes = dict()
+        self.meta = []
+        for column in columns:
+            if column in META_COLUMNS:
+                self.meta.append((column, META_COLUMNS[column]))
+            elif CHECKBOX_SEPARATOR in column:
+                name, code = column.rsplit(CHECKBOX_SEPARATOR, 1)
+                self.checkboxes.setdefault(get_name(name), []).append(
+                    (column, get_name(code))
+                )
+            else:
+                self.columns.setdefault(get_name(column), column)
+        self.record_id = self.columns.get(converter.record_id_field)
+
+        self.fields = [
+            (field['id'], self.get_field_value(field))
+            for field in self.instrument['record']
+        ]
+
+    def resolve(self, name):
+        """
+        Returns the canonical column name of field or matrix row `name`, or
+        None.
+        """
+
+        if name in self.columns or name in self.checkboxes:
+            return name
+        # Field IDs may be suffixed with a section header: name_header
+        candidates = [
+            column
+            for column in list(self.columns) + list(self.checkboxes)
+            if name.startswith(column + '_')
+        ]
+        return max(candidates, key=len) if candidates else None
+
+    def get_field_value(self, field):
+        type_def = get_full_type_definition(self.instrument, field['type'])
+        if type_def['base'] == 'matrix':
+            return self.get_matrix_value(field['id'], type_def)
+        source = self.resolve(field['id'])
+        return self.get_value(field['id'], source, type_def)
+
+    def get_matrix_value(self, field_id, type_def):
+        # REDCap matrix rows are fields of their own, and the matrix's only
+        # column is their field type
+        columns = type_def['columns']
+        cells = []
+        for row in type_def['rows']:
+            for column in columns:
+                name = row['id'] if len(columns) == 1 \
+                    else '%s_%s' % (row['id'], column['id'])
+                column_type = get_full_type_definition(
+                    self.instrument,
+                    column['type'],
+                )
+                cells.append((
+                    row['id'],
+                    column['id'],
+                    self.get_value(field_id, self.resolve(name), column_type),
+                ))
+
+        def get_matrix(record):
+            value = dict()
+            empty = True
+            for row_id, column_id, get_cell in cells:
+                cell = get_cell(record)
+                if cell is not None:
+                    empty = False
+                value.setdefault(row_id, {})[column_id] = {'value': cell}
+            return None if empty else value
+        return get_matrix
+
+    def get_value(self, field_id, source, type_def):
+        base = type_def['base']
+        if source is None or base == 'recordList':
+            return lambda record: None
+
+        if base == 'enumerationSet':
+            choices = type_def.get('enumerations') or {}
+            checkboxes = [
+                (column, code)
+                for column, code in self.checkboxes.get(source, [])
+                if code in choices
+            ]
+
+            def get_choices(record):
+                checked = [
+                    code
+                    for column, code in checkboxes
+                    if record.get(column, '') in CHECKED
+                ]
+                return checked or None
+            return get_choices
+
+        column = self.columns.get(source)
+        if column is None:
+            return lambda record: None
+        convert = self.get_converter(field_id, type_def)
+
+        def get_scalar(record):
+            value = record.get(column, '')
+            if value is None:
+                return None
+            value = value.strip()
+            return convert(value) if value else None
+        return get_scalar
+
+    def get_converter(self, field_id, type_def):
+        """ Returns a function converting export text to a RIOS value """
+
+        base = type_def['base']
+
+        def fail(value):
+            raise ConversionValueError(
+                'Invalid %s value for field "%s". Got:' % (base, field_id),
+                value
+            )
+
+        def checked(convert):
+            def wrapper(value):
+                try:
+                    return convert(value)
+                except (TypeError, ValueError):
+                    fail(value)
+            return wrapper
+
+        if base == 'integer':
+            return checked(int)
+        elif base == 'float':
+            return checked(float)
+        elif base == 'boolean':
+            return lambda value: value.lower() in ('1', 'true', 'yes')
+        elif base == 'enumeration':
+            return self.get_choice_converter(type_def, fail)
+        elif base == 'date':
+            return lambda value: value if RE_date.match(value) \
+                else fail(value)
+        elif base == 'dateTime':
+            def date_time(value):
+                if RE_date.match(value):
+                    return value + 'T00:00:00'
+                match = RE_date_time.match(value)
+                if not match:
+                    fail(value)
+                return '%sT%s%s' % (
+                    match.group(1),
+                    match.group(2),
+                    match.group(3) or ':00',
+                )
+            return date_time
+        elif base == 'time':
+            def time(value):
+                match = RE_time.match(value)
+                if not match:
+                    fail(value)
+                return match.group(1) + (match.group(2) or ':00')
+            return time
+        else:
+            return lambda value: value
+
+    def get_choice_converter(self, type_def, fail):
+        choices = type_def.get('enumerations') or {}
+        known = dict((choice, choice) for choice in choices)
+        known.update(BOOLEAN_CHOICES.get(frozenset(choices), {}))
+        get_name = self.converter.reader.get_name
+
+        def choice(value):
+            try:
+                return known[value]
+            except KeyError:
+                name = get_name(value)
+                if name not in choices:
+                    fail(value)
+                known[value] = name
+                return name
+        return choice
+
+
+def shard_records(records, get_record_id, shard):
+    """
+    Generates the `records` of `shard`, an (index, count) pair: those whose
+    record IDs hash to `index` modulo `count`. All the events and instances
+    of a record belong to the same shard, and the hash is the same in every
+    process.
+    """
+
+    index, count = shard
+    if not 0 <= index < count:
+        raise ValueError(
+            'Invalid shard. Expected (index, count) with 0 <= index < count.'
+            ' Got: ' + repr(shard)
+        )
+    for record in records:
+        record_id = get_record_id(record)
+        if not isinstance(record_id, bytes):
+            record_id = six.text_type(record_id).encode('utf-8')
+        if (zlib.crc32(record_id) & 0xffffffff) % count == index:
+            yield record
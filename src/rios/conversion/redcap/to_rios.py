@@ -5,18 +5,20 @@
 
 import re
 import json
+import multiprocessing
 import six
-import collections
-import ast
 
 
 from rios.conversion.base import structures
 from rios.conversion.utils import (
     InstrumentCalcStorage,
     CsvReader,
-    balanced_match,
+    LRUCache,
 )
-from rios.conversion.base import ToRios, localized_string_object
+from rios.conversion.redcap.calculations import order_calculations
+from rios.conversion.redcap.expression import redcap_to_python
+from rios.conversion.redcap.field_types import FIELD_TYPE_HANDLERS
+from rios.conversion.base import ToRios, StructurePool
 from rios.conversion.exception import (
     RedcapFormatError,
     ConversionValueError,
@@ -36,50 +38,13 @@ RE_non_alphanumeric = re.compile(r'\W+')
 # result available as: \1
 RE_strip_outer_underbars = re.compile(r'^_*(.*[^_])_*$')
 
-# Find database reference:  [table_name][field_name]
-# \1 => table_name, \2 => field_name
-RE_database_ref = re.compile(r'\[([\w_]+)\]\[([\w_]+)\]')
-
-# Find variable reference
-# \1 => variable name
-RE_variable_ref = re.compile(r'''\[([\w_]+)\]''')
-
-# dict: each item => REDCap name: rios.conversion name
-FUNCTION_TO_PYTHON = {
-    'min': 'min',
-    'max': 'max',
-    'mean': 'rios.conversion.redcap.functions.mean',
-    'median': 'rios.conversion.redcap.function.median',
-    'sum': 'rios.conversion.redcap.functions.sum_',
-    'stdev': 'rios.conversion.redcap.functions.stdev',
-    'round': 'rios.conversion.redcap.functions.round_',
-    'roundup': 'rios.conversion.redcap.functions.roundup',
-    'rounddown': 'rios.conversion.redcap.functions.rounddown',
-    'sqrt': 'math.sqrt',
-    'abs': 'abs',
-    'datediff': 'rios.conversion.redcap.functions.datediff',
-}
-
-# dict of function name: pattern which finds "name("
-RE_funcs = {
-    k: re.compile(r'\b%s\(' % k)
-    for k in FUNCTION_TO_PYTHON.keys()
-}
-
-# Array of tuples: (REDCap operator, rios.conversion operator)
-OPERATOR_TO_REXL = [
-    (r'<>', r'!='),
-]
-
-# array of (regex pattern, replacement)
-RE_ops = [(re.compile(redcap), rexl) for redcap, rexl in OPERATOR_TO_REXL]
-
-
-def isint(s):
-    """ Checks if a numerical string value is an integer """
-    val = ast.literal_eval(s)
-    chk = isinstance(val, int) or (isinstance(val, float) and val.is_integer())
-    return chk
+# Maximum number of canonical names kept by CsvReaderWithGetName
+NAME_CACHE_SIZE = 16384
+
+# Parallel conversion: minimum number of rows in a segment, and the number
+# of segments per worker (for load balancing)
+MIN_SEGMENT_SIZE = 1000
+SEGMENTS_PER_WORKER = 4
 
 
 class CsvReaderWithGetName(CsvReader):
@@ -87,8 +52,14 @@ class CsvReaderWithGetName(CsvReader):
     RIOS imposes restrictions on the range of strings which can be used for
     IDs. This program quietly converts input IDs using
     Csv2OrderedDict.get_name() in the hopes of obtaining a valid RIOS ID.
+
+    Canonical names are memoized in `names`, an LRUCache shared by every
+    reader, since the same names and choice IDs recur on many rows. Its
+    `hits` and `misses` attributes count the lookups.
     """
 
+    names = LRUCache(NAME_CACHE_SIZE)
+
     def get_name(self, name):
         """
         Return canonical name, a valid RIOS Identifier.
@@ -103,6 +74,15 @@ class CsvReaderWithGetName(CsvReader):
         """
         if name is None:
             raise ValueError("Name cannot be None")
+        x = self.names.get(name)
+        if x is None:
+            x = self.canonical_name(name)
+            self.names.set(name, x)
+        return x
+
+    @staticmethod
+    def canonical_name(name):
+        """ Computes get_name(`name`) without the cache """
         x = RE_strip_outer_underbars.sub(
                 r'\1',
                 RE_non_alphanumeric.sub('_', name.strip().lower()))
@@ -119,21 +99,70 @@ class CsvReaderWithGetName(CsvReader):
 
 
 class RedcapToRios(ToRios):
-    """ Converts a REDCap CSV file to the RIOS specification format """
+    """
+    Converts a REDCap CSV file to the RIOS specification format
+
+    If `workers` is greater than one, the rows are converted in segments on
+    a pool of that many processes (see process_parallel). `segment_size`
+    is the minimum number of rows in a segment.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.workers = kwargs.pop('workers', None)
+        self.segment_size = kwargs.pop('segment_size', None) \
+            or MIN_SEGMENT_SIZE
+        super(RedcapToRios, self).__init__(*args, **kwargs)
 
     def __call__(self):
         # Pre-processing
-        self.reader = CsvReaderWithGetName(self.stream)  # noqa: F821
+        self.reader = CsvReaderWithGetName(  # noqa: F821
+            self.stream,
+            fast=True,
+        )
         self.reader.load_attributes()
 
-        # Determine and initializeprocessor
+        # Determine and initialize processor
+        processor_class = self.get_processor_class()
+        process = processor_class(
+            self.reader,
+            self.localization,
+            pool=self.pool,
+        )
+
+        # MAIN PROCESSING
+        # NOTE:
+        #   1) Each CSV row is a CsvRow, a tuple which can be read by column
+        #       name like a dict (see CsvReader in utils/)
+        #   2) Start=2, because spread sheet programs set header row to 1
+        #       and first data row to 2 (for user friendly errors)
+        if self.workers and self.workers > 1:
+            self.process_parallel(process)
+        else:
+            self.process_rows(process, enumerate(self.reader, start=2))
+
+        # Construct insrument and calculationset objects
+        for field in self.field_container:
+            self.add_field(field)
+        self.process_calculations(process)
+        # Page container is an ordered dict of pages, so iterate over vals
+        for page in six.itervalues(self.page_container):
+            self.add_page(page)
+
+        # Post-processing/validation
+        if self.extract_types:
+            self.extract_shared_types()
+        self.validate()
+
+    def get_processor_class(self):
+        """ Returns the processor class for the data dictionary format """
+
         first_field = self.reader.attributes[0]
         if first_field == 'variable_field_name':
             # Process new CSV format
-            process = Processor(self.reader, self.localization)
+            return Processor
         elif first_field == 'fieldid':
             # Process legacy CSV format
-            process = LegacyProcessor(self.reader, self.localization)
+            return LegacyProcessor
         else:
             error = RedcapFormatError(
                 "Unknown input CSV header format. Got value:",
@@ -146,55 +175,49 @@ class RedcapToRios(ToRios):
             self.logger.error(str(error))
             raise error
 
-        # MAIN PROCESSING
-        # Occures in two steps:
-        #   1) Process data and page names into containers
-        #   2) Iterate over containers to construct RIOS definitions
-        # NOTE:
-        #   1) Each CSV row is an ordered dict (see CsvReader in utils/)
-        #   2) Start=2, because spread sheet programs set header row to 1
-        #       and first data row to 2 (for user friendly errors)
-        data = collections.OrderedDict()
-        page_names = set()
-        for line, row in enumerate(self.reader, start=2):
-            if 'page' in row:
-                # Page name for legacy REDCap data dictionary format
-                if row['page']:
-                    page_name = self.reader.get_name(row['page'])
-                else:
-                    page_name = 'page_0'
-            elif 'form_name' in row:
-                # Page name for current REDCap data dictionary format
-                page_name = self.reader.get_name(row['form_name'])
+    def get_page(self, row):
+        """ Returns the page of the row, created when first seen """
+
+        if 'page' in row:
+            # Page name for legacy REDCap data dictionary format
+            if row['page']:
+                page_name = self.reader.get_name(row['page'])
             else:
-                error = RedcapFormatError(
-                    'REDCap data dictionaries must contain'
-                    ' the \"Form Name\" column'
-                )
-                error.wrap(
-                    "REDCap data dictionary conversion failure:",
-                    "Unable to parse REDCap data dictionary CSV"
-                )
-                self.logger.error(str(error))
-                raise error
+                page_name = 'page_0'
+        elif 'form_name' in row:
+            # Page name for current REDCap data dictionary format
+            page_name = self.reader.get_name(row['form_name'])
+        else:
+            error = RedcapFormatError(
+                'REDCap data dictionaries must contain'
+                ' the \"Form Name\" column'
+            )
+            error.wrap(
+                "REDCap data dictionary conversion failure:",
+                "Unable to parse REDCap data dictionary CSV"
+            )
+            self.logger.error(str(error))
+            raise error
+
+        # One page instance per page name, so pages follow the order of
+        # their first row
+        page = self.page_container.get(page_name)
+        if page is None:
+            page = structures.PageObject(id=page_name)
+            self.page_container[page_name] = page
+        return page
 
-            # Need unique list of page names to create one page instance
-            # per page name
-            page_names.add(page_name)
+    def process_rows(self, process, lines):
+        """
+        Converts `lines`, an iterable of (line number, row), with `process`.
 
-            # Insert into data container
-            data[line] = {'page_name': page_name, 'row': row}
+        Rows are processed as they are read, so only the RIOS definitions
+        are held in memory, not the data dictionary.
+        """
 
-        # Created pages for the data dictionary instrument
-        for page_name in page_names:
-            self.page_container.update(
-                {page_name: structures.PageObject(id=page_name), }
-            )
+        for line, row in lines:
+            page = self.get_page(row)
 
-        # Process the row
-        for line, row_pkg in six.iteritems(data):
-            page = self.page_container[row_pkg['page_name']]
-            row = row_pkg['row']
             try:
                 # WHERE THE MAGIC HAPPENS
                 fields, calcs = process(page, row)
@@ -205,7 +228,7 @@ class RedcapToRios(ToRios):
                 for field in fields:
                     self.field_container.append(field)
                 for calc in calcs:
-                    self.calc_container.update(calc)
+                    self.calc_container.append(calc)
 
             except Exception as exc:
                 if isinstance(exc, ConversionValueError):
@@ -237,29 +260,196 @@ class RedcapToRios(ToRios):
                     self.logger.error(str(error))
                     raise error
 
-        # Construct insrument and calculationset objects
-        for field in self.field_container:
-            self._instrument.add_field(field)
-        for calc in self.calc_container:
-            self._calculationset.add(calc)
-        # Page container is a dict instead of a list, so iterate over vals
-        for page in six.itervalues(self.page_container):
-            self._form.add_page(page)
+    def process_calculations(self, process):
+        """
+        Translates the calculations and branching logic collected by
+        `process`, and adds the calculations to the calculationset in
+        dependency order (see order_calculations).
 
-        # Post-processing/validation
-        self.validate()
+        This is done once all the rows are read, so expressions may refer to
+        calculations defined on any row.
+        """
+
+        try:
+            calculations = order_calculations(self.calc_container)
+        except RedcapFormatError as exc:
+            error = Error(
+                "Unable to order the calculations. Error:",
+                str(exc)
+            )
+            error.wrap(
+                "REDCap data dictionary conversion failure:",
+                "Unable to parse the data dictionary"
+            )
+            self.logger.error(str(error))
+            raise error
+
+        process.calculation_variables = set(
+            calculation['id']
+            for calculation in calculations
+        )
+        for event, branching_logic in process.events:
+            event['trigger'] = process.convert_trigger(branching_logic)
+        for calculation in calculations:
+            options = calculation['options']
+            options['expression'] = process.convert_calc(
+                options['expression']
+            )
+            self.add_calculation(calculation)
+
+    def process_parallel(self, process):
+        """
+        Converts the rows in segments on a pool of `workers` processes, and
+        merges the results, and the events of the segments' processors into
+        `process`, in line order.
+
+        The only state a processor carries from one row to the next is the
+        matrix group being built, so segments start only at rows which
+        reset it: rows of other field types than calc, outside of a matrix
+        group. Data dictionaries with fewer than two segments of rows are
+        converted serially, as are all data dictionaries in daemonic
+        processes (e.g. the workers of convert_many), which can't start
+        processes of their own.
+        """
+
+        segments = self.partition(process.__class__)
+        if len(segments) < 2 or multiprocessing.current_process().daemon:
+            self.process_rows(
+                process,
+                (
+                    (line, self.reader.row_class(cells))
+                    for lines in segments
+                    for line, cells in lines
+                ),
+            )
+            return
+
+        jobs = [
+            (
+                isinstance(process, LegacyProcessor),
+                self.reader.attributes,
+                self.localization,
+                lines,
+            )
+            for lines in segments
+        ]
+        pool = multiprocessing.Pool(min(self.workers, len(jobs)))
+        try:
+            results = pool.map(_process_segment, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+        for pages, fields, calcs, events, logs, error in results:
+            for page_name, elements in pages:
+                page = self.page_container.get(page_name)
+                if page is None:
+                    page = structures.PageObject(id=page_name)
+                    self.page_container[page_name] = page
+                page.add_element(elements)
+            self.field_container.extend(fields)
+            self.calc_container.extend(calcs)
+            process.events.extend(events)
+            self.logger.logs.extend(logs)
+            if error is not None:
+                raise error
+
+    def partition(self, processor_class):
+        """
+        Reads the rows, and returns the segments to convert in parallel, as
+        lists of (line number, cells).
+        """
+
+        lines = [
+            (line, tuple(row))
+            for line, row in enumerate(self.reader, start=2)
+        ]
+        size = max(
+            self.segment_size,
+            len(lines) // (self.workers * SEGMENTS_PER_WORKER) + 1,
+        )
+        legacy = processor_class is LegacyProcessor
+        get_name = self.reader.get_name
+        make_row = self.reader.row_class
+
+        segments = []
+        start = 0
+        for index in range(size, len(lines)):
+            if index - start < size:
+                continue
+            row = make_row(lines[index][1])
+            if legacy or (
+                    row.get('field_type') != 'calc'
+                    and not get_name(row.get('matrix_group_name', ''))):
+                segments.append(lines[start:index])
+                start = index
+        segments.append(lines[start:])
+        return segments
+
+
+def _process_segment(job):
+    """
+    Converts a segment of rows in a worker process. Returns its pages, as
+    (page name, elements) pairs, fields, calcs, events, logs, and the error
+    which stopped the conversion, if any.
+    """
+
+    legacy, attributes, localization, lines = job
+    converter = RedcapToRios(
+        id='segment',
+        title='',
+        description='',
+        stream=None,
+        localization=localization,
+    )
+    converter.reader = CsvReaderWithGetName(None, fast=True)
+    converter.reader.set_attributes(attributes)
+    process = (LegacyProcessor if legacy else Processor)(
+        converter.reader,
+        localization,
+        pool=converter.pool,
+    )
+    make_row = converter.reader.row_class
+
+    error = None
+    try:
+        converter.process_rows(
+            process,
+            ((line, make_row(cells)) for line, cells in lines),
+        )
+    except Error as exc:
+        error = exc
+
+    return (
+        [
+            (page_name, page['elements'])
+            for page_name, page in six.iteritems(converter.page_container)
+        ],
+        converter.field_container,
+        converter.calc_container,
+        process.events,
+        converter.logs,
+        error,
+    )
 
 
 class ProcessorBase(object):
     """ Abstract base class for processor objects """
 
-    def __init__(self, reader, localization):
+    def __init__(self, reader, localization, pool=None):
         self.reader = reader
         self.localization = localization
 
+        # Shared labels, descriptors, and enumeration types
+        self.pool = pool or StructurePool(localization)
+
         # Set to hold unique calc variables
         self.calculation_variables = set()
 
+        # Pairs of (EventObject, branching logic), whose triggers are set
+        # once all the calculation variables are known
+        self.events = list()
+
         # Objects to construct instruments, forms, and calcsets
         self._storage = InstrumentCalcStorage()
 
@@ -274,6 +464,9 @@ class ProcessorBase(object):
         # Object to store pointers to question choices
         self._choices = None
 
+        # ParsedChoices by choices_or_calculations, or legacy data_type, value
+        self._parsed_choices = dict()
+
     def __call__(self, page, row):
         """
         Processes REDCap data dictionary rows into corresponding RIOS
@@ -293,6 +486,10 @@ class ProcessorBase(object):
     def clear_storage(self):
         self._storage.clear()
 
+    def store_calculation(self, calculation):
+        """ Stores a CalculationObject to return with the row's fields """
+        self._storage['c'] = calculation
+
     def convert_calc(self, calc):
         """
         Convert RedCap expression into Python
@@ -303,37 +500,10 @@ class ProcessorBase(object):
         - convert redcap function names to python
         - convert caret to pow
         - convert operators
+
+        See rios.conversion.redcap.expression.
         """
-        s = RE_database_ref.sub(r'\1["\2"]', calc)
-        variables = RE_variable_ref.findall(s)
-        s = RE_variable_ref.sub(r'calculations["\1"]', s)
-        for var in variables:
-            if var not in self.calculation_variables:
-                s = s.replace(
-                        'calculations["%s"]' % var,
-                        'assessment["%s"]' % var)
-        for name, pattern in RE_funcs.items():
-            # The matched pattern includes the '('
-            s = pattern.sub('%s(' % FUNCTION_TO_PYTHON[name], s)
-        s = self.convert_carat_function(s)
-        for pattern, replacement in RE_ops:
-            s = pattern.sub(replacement, s)
-        return s
-
-    def convert_carat_function(self, string):
-        answer = ''
-        position = 0
-        carat_pos = string.find(')^(', position)
-        while carat_pos != -1:
-            begin, end = balanced_match(string, carat_pos)
-            answer += string[position: begin]
-            answer += 'math.pow(' + string[begin + 1: end - 1]
-            begin, end = balanced_match(string, carat_pos + 2)
-            answer += ', ' + string[begin + 1: end - 1] + ')'
-            position = end
-            carat_pos = string.find(')^(', position)
-        answer += string[position:]
-        return answer
+        return redcap_to_python(calc, self.calculation_variables)
 
     def convert_text_type(self, text_type):
         if text_type.startswith('date'):
@@ -357,35 +527,109 @@ class ProcessorBase(object):
         else:
             return value    # pragma: no cover
 
-    def get_choices_form(self, row):
+    def parse_choices(self, row):
         """
-        Returns array of DescriptorObject
+        Returns the ParsedChoices of the row's choices_or_calculations.
 
-        Expecting: choices_or_calculations to be pipe separated list
-        of (comma delimited) tuples: internal, external
+        Each distinct choices string is parsed once per conversion, so rows
+        sharing a scale share the parsed choices.
         """
-        return [
-                structures.DescriptorObject(
-                    id=self.reader.get_name(x.strip().split(',')[0]),
-                    text=localized_string_object(
-                            self.localization,
-                            ','.join(x.strip().split(',')[1:]).strip()
-                    ),
-                )
-                for x in row['choices_or_calculations'].split('|') ]
+        raw = row['choices_or_calculations']
+        try:
+            return self._parsed_choices[raw]
+        except KeyError:
+            parsed = ParsedChoices.from_choices(self.reader, self.pool, raw)
+            self._parsed_choices[raw] = parsed
+            return parsed
+
+    def get_choices(self, row):
+        """ Returns array of tuples: (id, label) """
+        return list(self.parse_choices(row).choices)
+
+    def get_choices_form(self, row):
+        """ Returns array of DescriptorObject """
+        return list(self.parse_choices(row).descriptors)
 
     def get_choices_instrument(self, row):
-        """
-        Returns EnumerationCollectionObject
+        """ Returns EnumerationCollectionObject """
+        return self.parse_choices(row).enumerations
+
+    def get_choices_type(self, base, row):
+        """ Returns TypeObject of the enumeration or enumerationSet base """
+        return self.parse_choices(row).get_type(base)
 
+
+class ParsedChoices(object):
+    """
+    The choices of a choices_or_calculations value, or of the data_type of
+    a legacy data dictionary row, with the structures built from them.
+    """
+
+    __slots__ = ('pool', 'choices', 'descriptors', 'enumerations', '_types')
+
+    def __init__(self, pool, choices):
+        self.pool = pool
+        # Tuples of (id, label) and DescriptorObject
+        self.choices = tuple(choices)
+        self.descriptors = tuple(
+            pool.descriptor(name, label)
+            for name, label in self.choices
+        )
+        # Instrument enumerations have no descriptions
+        self.enumerations = pool.enumerations(
+            (name, '') for name, _ in self.choices
+        )
+        self._types = dict()
+
+    @classmethod
+    def from_choices(cls, reader, pool, raw):
+        """
         Expecting: choices_or_calculations to be pipe separated list
         of (comma delimited) tuples: internal, external
         """
-        choices_instrument = structures.EnumerationCollectionObject()
-        for x in row['choices_or_calculations'].split('|'):
-            choices_instrument.add(
-                    self.reader.get_name(x.strip().split(',')[0]))
-        return choices_instrument
+        choices = []
+        for x in raw.split('|'):
+            parts = x.strip().split(',', 1)
+            choices.append((
+                reader.get_name(parts[0]),
+                parts[1].strip() if len(parts) > 1 else '',
+            ))
+        return cls(pool, choices)
+
+    @classmethod
+    def from_data_type(cls, reader, pool, data_type):
+        """
+        Expecting: data_type to be a dict decoded from JSON, which contains
+        'Choices' or 'choices', an array of single key dicts: {internal:
+        external}.
+
+        The choices are sorted on key order not array order. Returns None
+        if there are no choices.
+        """
+        choices = (
+            data_type.get('Choices', False)
+            or data_type.get('choices', False)
+            or None
+        )
+        if not choices:
+            return None
+        return cls(pool, sorted(
+            (reader.get_name(k), v)
+            for c in choices
+            for k, v in c.items()
+        ))
+
+    def get_type(self, base):
+        """ Returns the TypeObject of the `base` type with these choices """
+        try:
+            return self._types[base]
+        except KeyError:
+            type_object = self.pool.enumeration_type(
+                base,
+                [(name, '') for name, _ in self.choices],
+            )
+            self._types[base] = type_object
+            return type_object
 
 
 class Processor(ProcessorBase):
@@ -413,10 +657,7 @@ class Processor(ProcessorBase):
             header = structures.ElementObject()
             header['type'] = 'header'
             header['options'] = {
-                'text': localized_string_object(
-                    self.localization,
-                    section_header
-                )
+                'text': self.pool.localized_string(section_header)
             }
         else:
             header = None
@@ -424,6 +665,7 @@ class Processor(ProcessorBase):
         # Check if a calc, and if so, remove, b/c not a form field/question
         if row['field_type'] == 'calc':
             question = None
+            self.get_type(None, row)
         else:
             question = structures.ElementObject(type='question')
             field_name = self.reader.get_name(row['variable_field_name'])
@@ -434,14 +676,8 @@ class Processor(ProcessorBase):
                 )
             question['options'] = structures.QuestionObject(
                 fieldId=field_name,
-                text=localized_string_object(
-                    self.localization,
-                    row['field_label']
-                ),
-                help=localized_string_object(
-                    self.localization,
-                    row['field_note']
-                ),
+                text=self.pool.localized_string(row['field_label']),
+                help=self.pool.localized_string(row['field_note']),
             )
 
         # Now that we have a header only OR question and maybe a header, we
@@ -492,14 +728,9 @@ class Processor(ProcessorBase):
 
         # If row involves branching logic, add to question
         if row['branching_logic']:
-            question_obj.add_event(
-                structures.EventObject(
-                    trigger=self.convert_trigger(
-                            row['branching_logic']
-                    ),
-                    action='disable',
-                )
-            )
+            event = structures.EventObject(action='disable')
+            self.events.append((event, row['branching_logic']))
+            question_obj.add_event(event)
 
         # Check for a matrix question
         matrix_group_name = self.reader.get_name(
@@ -555,10 +786,7 @@ class Processor(ProcessorBase):
                 matrix.add_question(
                     structures.QuestionObject(
                         fieldId=self.reader.get_name(row['field_type']),
-                        text=localized_string_object(
-                            self.localization,
-                            row['field_label']
-                        ),
+                        text=self.pool.localized_string(row['field_label']),
                         enumerations=self.get_choices_form(row),
                     )
                 )
@@ -578,10 +806,7 @@ class Processor(ProcessorBase):
                         id=self.reader.get_name(
                             row['variable_field_name']
                         ),
-                        text=localized_string_object(
-                            self.localization,
-                            row['field_label']
-                        ),
+                        text=self.pool.localized_string(row['field_label']),
                     )
                 )
 
@@ -615,10 +840,7 @@ class Processor(ProcessorBase):
                         id=self.reader.get_name(
                             row['variable_field_name']
                         ),
-                        text=localized_string_object(
-                            self.localization,
-                            row['field_label']
-                        ),
+                        text=self.pool.localized_string(row['field_label']),
                     )
                 )
                 self._field = None
@@ -653,215 +875,20 @@ class Processor(ProcessorBase):
         """
         Returns the computed instrument field type.
 
-        Also has side effects when side_effects is True.
-        - can initialize calculations.
-        - can append a calculation.
-        - updates question_obj (renamed to "question" for code clarity):
-            enumerations, questions, rows, widget, events
+        Dispatches to the handler registered for the row's field type (see
+        rios.conversion.redcap.field_types), which may also have side
+        effects when side_effects is True.
         """
 
-        # Rename for code clarity
-        question = question_obj
-
-        def get_widget(type):
-            return structures.WidgetConfigurationObject(type=type)
-
-        def get_widget_type(text_type):
-            if text_type == 'text':
-                return 'inputText'
-            elif text_type in ['integer', 'float']:
-                return 'inputNumber'
-            elif text_type == 'dateTime':
-                return 'dateTimePicker'
-            else:
-                raise ConversionValueError(
-                    'Unexpected text type. Got:', str(text_type)
-                )
-
-        def process_calculation():
-            if side_effects:
-                field_name = self.reader.get_name(row['variable_field_name'])
-                calc = self.convert_calc(row['choices_or_calculations'])
-                calculation = structures.CalculationObject(
-                    id=field_name,
-                    description=row['field_label'],
-                    type='float',
-                    method='python',
-                    options={'expression': calc},
-                )
-                self._storage['c'] = calculation
-                assert field_name not in self.calculation_variables
-                self.calculation_variables.add(field_name)
-            return None     # not an instrument field
-
-        def process_checkbox():
-            if side_effects:
-                question.set_widget(get_widget(type='checkGroup'))
-                question['enumerations'] = self.get_choices_form(row)
-            return structures.TypeObject(
-                    base='enumerationSet',
-                    enumerations=self.get_choices_instrument(row), )
-
-        def process_dropdown():
-            if side_effects:
-                question.set_widget(get_widget(type='dropDown'))
-                question['enumerations'] = self.get_choices_form(row)
-            return structures.TypeObject(
-                    base='enumeration',
-                    enumerations=self.get_choices_instrument(row), )
-
-        def process_notes():
-            if side_effects:
-                question.set_widget(get_widget(type='textArea'))
-            return 'text'
-
-        def process_radio():
-            if side_effects:
-                question.set_widget(get_widget(type='radioGroup'))
-                question['enumerations'] = self.get_choices_form(row)
-            return structures.TypeObject(
-                    base='enumeration',
-                    enumerations=self.get_choices_instrument(row), )
-
-        def process_slider():
-            if side_effects:
-                question.set_widget(get_widget(type='inputNumber'))
-            return structures.TypeObject(
-                    base='float',
-                    range=structures.BoundConstraintObject(
-                            min=0.0,
-                            max=100.0), )
-
-        def process_text():
-            val_min = row['text_validation_min']
-            val_max = row['text_validation_max']
-
-            # Determine text type
-            val_min_is_int = False if not val_min else isint(val_min)
-            val_max_is_int = False if not val_max else isint(val_max)
-            if val_min and val_max:
-                if val_min_is_int and val_max_is_int:
-                    text_type = 'integer'
-                else:
-                    # One of the values may be a float, so cast to float
-                    text_type = 'float'
-                    if val_min_is_int:
-                        val_min = val_min + '.0'
-                    if val_max_is_int:
-                        val_max = val_max + '.0'
-            elif val_min and not val_max:
-                if val_min_is_int:
-                    text_type = 'integer'
-                else:
-                    text_type = 'float'
-            elif not val_min and val_max:
-                if val_max_is_int:
-                    text_type = 'integer'
-                else:
-                    text_type = 'float'
-            else:
-                # val_min and val_max are empty
-                text_type = self.convert_text_type(row['text_validation'])
-
-            # Get widget for text_type
-            if side_effects:
-                question.set_widget(get_widget(
-                        type=get_widget_type(text_type)))
-
-            # Created bounded constraint object
-            if val_min or val_max:
-                bound_constraint = structures.BoundConstraintObject()
-                if val_min:
-                    bound_constraint['min'] = self.convert_value(
-                            val_min,
-                            text_type)
-                if val_max:
-                    bound_constraint['max'] = self.convert_value(
-                            val_max,
-                            text_type)
-                return structures.TypeObject(
-                        base=text_type,
-                        range=bound_constraint)
-            else:
-                return text_type
-
-        def process_truefalse():
-            if side_effects:
-                question.set_widget(get_widget(type='radioGroup'))
-                question.add_enumeration(
-                    structures.DescriptorObject(
-                        id="true",
-                        text=localized_string_object(
-                            self.localization,
-                            "True"
-                        ),
-                    )
-                )
-                question.add_enumeration(
-                    structures.DescriptorObject(
-                        id="false",
-                        text=localized_string_object(
-                            self.localization,
-                            "False"
-                        ),
-                    )
-                )
-            type_object = structures.TypeObject(base='enumeration', )
-            type_object.add_enumeration('true', description='True')
-            type_object.add_enumeration('false', description='False')
-            return type_object
-
-        def process_yesno():
-            if side_effects:
-                question.set_widget(get_widget(type='radioGroup'))
-                question.add_enumeration(
-                    structures.DescriptorObject(
-                        id="yes",
-                        text=localized_string_object(
-                            self.localization,
-                            "Yes"
-                        ),
-                    )
-                )
-                question.add_enumeration(
-                    structures.DescriptorObject(
-                        id="no",
-                        text=localized_string_object(
-                            self.localization,
-                            "No"
-                        ),
-                    )
-                )
-            type_object = structures.TypeObject(base='enumeration', )
-            type_object.add_enumeration('yes', description='Yes')
-            type_object.add_enumeration('no', description='No')
-            return type_object
-
-        # Process question according to its field type
         field_type = row['field_type']
-        if field_type == 'text':
-            return process_text()
-        elif field_type == 'notes':
-            return process_notes()
-        elif field_type == 'dropdown':
-            return process_dropdown()
-        elif field_type == 'radio':
-            return process_radio()
-        elif field_type == 'checkbox':
-            return process_checkbox()
-        elif field_type == 'calc':
-            return process_calculation()
-        elif field_type == 'slider':
-            return process_slider()
-        elif field_type == 'truefalse':
-            return process_truefalse()
-        elif field_type == 'yesno':
-            return process_yesno()
-        else:
+        try:
+            handler = FIELD_TYPE_HANDLERS[field_type]
+        except KeyError:
             error = ConversionValueError(
                 'Unknown Field Type value. Got:', str(field_type)
             )
             raise error
+        return handler(self, question_obj, row, side_effects)
 
 
 class LegacyProcessor(ProcessorBase):
@@ -895,23 +922,14 @@ class LegacyProcessor(ProcessorBase):
         if row['data_type'] == 'instruction':
             question['type'] = 'text'
             question['options'] = {
-                'text': localized_string_object(
-                    self.localization,
-                    row['text']
-                ),
+                'text': self.pool.localized_string(row['text']),
             }
         else:
             question['type'] = 'question'
             question['options'] = structures.QuestionObject(
                 fieldId=self.reader.get_name(row['fieldid']),
-                text=localized_string_object(
-                    self.localization,
-                    row['text']
-                ),
-                help=localized_string_object(
-                    self.localization,
-                    row['help']
-                ),
+                text=self.pool.localized_string(row['text']),
+                help=self.pool.localized_string(row['help']),
             )
             # Build field object
             field = structures.FieldObject(
@@ -929,6 +947,36 @@ class LegacyProcessor(ProcessorBase):
         # Add the new question to form page
         page.add_element(question)
 
+    def parse_data_type(self, row):
+        """
+        Returns the ParsedChoices of the row's data_type, or None if it has
+        no choices.
+
+        data_type might be a JSON string of a dict which contains 'Choices'
+        or 'choices'. Each distinct data_type is decoded once per conversion,
+        as legacy data dictionaries repeat the same choices on many rows.
+        """
+        raw = row['data_type']
+        try:
+            return self._parsed_choices[raw]
+        except KeyError:
+            pass
+        try:
+            data_type = json.loads(raw)
+            parsed = ParsedChoices.from_data_type(
+                self.reader,
+                self.pool,
+                data_type,
+            )
+        except Exception:
+            error = RedcapFormatError(
+                "Unable to parse \"data_type\" field:",
+                "Expected valid JSON formatted text"
+            )
+            raise error
+        self._parsed_choices[raw] = parsed
+        return parsed
+
     def question_and_field_processor(self, page, row, question, field):
         """
         Processes questions and field types.
@@ -943,46 +991,11 @@ class LegacyProcessor(ProcessorBase):
         # Process choices before questions, so choices are available to
         # question processing
         if row['enumeration_type'] in ('enumeration', 'enumerationSet',):
-            # data_type might be a JSON string of a dict which contains
-            # 'Choices' or 'choices', an array of single key dicts.
-            try:
-                data_type = json.loads(row['data_type'])
-                choices = (
-                        data_type.get('Choices', False)
-                        or data_type.get('choices', False)
-                        or None )
-            except:
-                error = RedcapFormatError(
-                    "Unable to parse \"data_type\" field:",
-                    "Expected valid JSON formatted text"
-                )
-                raise error
-
-            # Sort the array on key order not array order
-            if choices:
-                field['type'] = structures.TypeObject(
-                    base=row['enumeration_type'],
-                )
-
-                choices = [
-                        {self.reader.get_name(k): v}
-                        for c in choices
-                        for k, v in c.items() ]
-
-                choices.sort()
-
-                for choice in choices:
-                    field['type'].add_enumeration(choice.keys()[0])
-                    name, description = choice.items()[0]
-                    question_obj.add_enumeration(
-                        structures.DescriptorObject(
-                            id=self.reader.get_name(name),
-                            text=localized_string_object(
-                                self.localization,
-                                description
-                            ),
-                        )
-                    )
+            parsed = self.parse_data_type(row)
+            if parsed:
+                field['type'] = parsed.get_type(row['enumeration_type'])
+                for descriptor in parsed.descriptors:
+                    question_obj.add_enumeration(descriptor)
 
                 question_obj.set_widget(
                     structures.WidgetConfigurationObject(
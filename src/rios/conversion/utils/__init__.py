@@ -4,7 +4,8 @@
 
 
 from .balanced_match import balanced_match  # noqa:F401
-from .csv_reader import CsvReader  # noqa:F401
-from .json_reader import JsonReader  # noqa:F401
+from .csv_reader import CsvReader, CsvRow  # noqa:F401
+from .json_reader import JsonReader, JsonScanner, iter_json_array  # noqa:F401
 from .instrument_calc_storage import InstrumentCalcStorage  # noqa:F401
 from .log import InMemoryLogger  # noqa:F401
+from .lru_cache import LRUCache  # noqa:F401
@@ -5,14 +5,76 @@
 
 import collections
 import csv
+import io
+import locale
+import mmap as _mmap
 import re
 
+import six
+
 
 __all__ = (
     "CsvReader",
+    "CsvRow",
 )
 
 
+class CsvRow(tuple):
+    """
+    A row yielded by CsvReader in fast mode.
+
+    The row is a tuple of the (stripped) cells, which may also be read by
+    column name like an OrderedDict:
+
+        row['field_type'], row.get('matrix_group_name', ''),
+        'page' in row, row.keys(), row.items(), row.as_dict()
+
+    As with the OrderedDict rows, a column is missing from rows with fewer
+    cells than there are columns. Iteration and len() are those of the
+    tuple, i.e. over the cells.
+
+    CsvReader creates a subclass per reader, whose `_index` maps the column
+    names to their positions, and whose `_keys` are the column names in
+    order.
+    """
+
+    __slots__ = ()
+
+    _index = {}
+    _keys = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, six.string_types):
+            try:
+                return tuple.__getitem__(self, self._index[key])
+            except IndexError:
+                raise KeyError(key)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return self._index.get(key, len(self)) < len(self)
+
+    def get(self, key, default=None):
+        position = self._index.get(key, len(self))
+        if position < len(self):
+            return tuple.__getitem__(self, position)
+        return default
+
+    def keys(self):
+        index = self._index
+        return [key for key in self._keys if index[key] < len(self)]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def as_dict(self):
+        """ Returns the row as get_row() returns it in the default mode """
+        return collections.OrderedDict(self.items())
+
+
 class CsvReader(object):
     """
     This object reads `fname`, a csv file, and can iterate over the rows.
@@ -33,20 +95,33 @@ class CsvReader(object):
     Subsequent rows are converted by get_row()
     into OrderedDicts based on the keys in self.attributes.
 
+    If `fast` is True, rows are CsvRow tuples instead, and files are read
+    with universal newlines instead of filtering every line through a
+    regular expression. If `mmap` is also True, a file named by `fname` is
+    memory-mapped instead of read through a file object.
+
     - get_name(name): returns the "canonical" name (if overriden)
       The default returns name unchanged.
     """
 
-    def __init__(self, fname):
+    def __init__(self, fname, fast=False, mmap=False):
         self.fname = fname
+        self.fast = fast
+        self.mmap = mmap
         self.attributes = []
         self.reader = None
+        self.row_class = None
 
     def __iter__(self):
         if not self.attributes:
             self.load_attributes()
-        for row in self.reader:
-            yield self.get_row(row)
+        if self.fast:
+            row_class = self.row_class
+            for row in self.reader:
+                yield row_class([x.strip() for x in row])
+        else:
+            for row in self.reader:
+                yield self.get_row(row)
 
     def get_name(self, name):
         return name
@@ -59,6 +134,40 @@ class CsvReader(object):
             fname.seek(0)
         return csv.reader(filtered)
 
+    @staticmethod
+    def get_fast_reader(fname, mmap=False):
+        if isinstance(fname, six.string_types):
+            if mmap:
+                return csv.reader(CsvReader.map_lines(fname))
+            if six.PY2:
+                return csv.reader(open(fname, 'rU'))
+            return csv.reader(io.open(fname, 'r', newline=None))
+        if hasattr(fname, 'seek'):
+            fname.seek(0)
+        return csv.reader(fname)
+
+    @staticmethod
+    def map_lines(fname):
+        """
+        Generates the lines of the file named `fname` from a memory map,
+        with their line endings translated to "\\n".
+        """
+
+        with open(fname, 'rb') as fi:
+            try:
+                data = _mmap.mmap(fi.fileno(), 0, access=_mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped
+                return
+        encoding = locale.getpreferredencoding(False)
+        try:
+            for line in iter(data.readline, b''):
+                if line.endswith(b'\r\n'):
+                    line = line[:-2] + b'\n'
+                yield line if six.PY2 else line.decode(encoding)
+        finally:
+            data.close()
+
     def get_row(self, row):
         return collections.OrderedDict(zip(
                 self.attributes,
@@ -67,7 +176,26 @@ class CsvReader(object):
     def load_attributes(self):
         if not self.reader:
             self.load_reader()
-        self.attributes = [self.get_name(c) for c in next(self.reader)]
+        self.set_attributes([self.get_name(c) for c in next(self.reader)])
+
+    def set_attributes(self, attributes):
+        """
+        Sets the column names, and `row_class`, the CsvRow subclass of the
+        rows in fast mode.
+        """
+        self.attributes = attributes
+        index = collections.OrderedDict()
+        for position, name in enumerate(self.attributes):
+            # Duplicate columns resolve to the last one, as in get_row()
+            index[name] = position
+        self.row_class = type('CsvRow', (CsvRow,), {
+            '__slots__': (),
+            '_index': dict(index),
+            '_keys': tuple(index),
+        })
 
     def load_reader(self):
-        self.reader = self.get_reader(self.fname)
+        if self.fast:
+            self.reader = self.get_fast_reader(self.fname, self.mmap)
+        else:
+            self.reader = self.get_reader(self.fname)
@@ -3,11 +3,54 @@
 #
 
 
+import codecs
+import re
+
 import simplejson
 import six
 
 
-__all__ = ('JsonReader',)
+__all__ = (
+    'JsonReader',
+    'JsonScanner',
+    'iter_json_array',
+)
+
+
+# Number of characters read from a stream at a time by JsonScanner
+CHUNK_SIZE = 65536
+
+RE_non_space = re.compile(r'\S')
+
+# The text up to the next bracket, including any complete strings, which is
+# followed by a bracket, the quote of an incomplete string, or the end of the
+# text read so far
+RE_unbracketed = re.compile(
+    r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*',
+    re.DOTALL,
+)
+
+# The characters after a number, true, false, or null
+RE_scalar_end = re.compile(r'[\s,\]}]')
+
+# The body of a string, up to its closing quote, or to the end of the text
+# read so far, excluding an incomplete escape sequence
+RE_string_body = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+
+def _rewind(fi):
+    # Rewinds the file object `fi` to its start if it is seekable. Pipes
+    # have a seek method too, which fails
+    seekable = getattr(fi, 'seekable', None)
+    if seekable is not None:
+        if seekable():
+            fi.seek(0)
+    elif hasattr(fi, 'seek'):
+        # Python 2 files have no seekable method
+        try:
+            fi.seek(0)
+        except (IOError, OSError):
+            pass
 
 
 class JsonReader(object):
@@ -22,7 +65,8 @@ class JsonReader(object):
         ... data ready for processing
 
     `fname` is either a filename, an open file object, or any object suitable
-    for `json.load`.
+    for `json.load`, or the already decoded data (a dict or list), which is
+    processed as is.
     """
 
     def __init__(self, fname):
@@ -34,12 +78,14 @@ class JsonReader(object):
     def get_reader(fname):
         fi = open(fname, 'rU') \
                 if isinstance(fname, six.string_types) else fname
-        if hasattr(fi, 'seek'):
-            fi.seek(0)
+        _rewind(fi)
         return simplejson.load(fi)
 
     def load_reader(self):
-        self.reader = self.get_reader(self.fname)
+        if isinstance(self.fname, (dict, list)):
+            self.reader = self.fname
+        else:
+            self.reader = self.get_reader(self.fname)
 
     def process(self):
         if not self.reader:
@@ -49,3 +95,278 @@ class JsonReader(object):
     def processor(self, data):
         """ Implementations may override this method """
         return data
+
+
+class JsonScanner(object):
+    """
+    Reads the JSON formatted text of `fname` incrementally, one value at a
+    time, `chunk_size` characters at a time.
+
+    Values are decoded with ``decode``, or skipped without being decoded
+    with ``skip``, and the members of objects and items of arrays are
+    walked with ``iter_object`` and ``iter_array``. Only the text of the
+    value being read is held in memory.
+
+    `fname` is either a filename, or an open file object, in text or
+    binary mode. The text of binary files is decoded as UTF-8.
+    """
+
+    def __init__(self, fname, chunk_size=CHUNK_SIZE):
+        self.fi = open(fname, 'rU') \
+                if isinstance(fname, six.string_types) else fname
+        _rewind(self.fi)
+        self.chunk_size = chunk_size
+        self.decoder = simplejson.JSONDecoder()
+        # The unread text is self.buffer[self.position:], and the buffer
+        # starts at character self.offset of the stream
+        self.buffer = ''
+        self.position = 0
+        self.offset = 0
+        self.eof = False
+        # The start of the text of the value being captured, which must be
+        # kept in the buffer
+        self._mark = None
+        # The incremental decoder of binary streams
+        self._utf8 = None
+
+    def read(self, size=None):
+        """ Adds a chunk of the stream to the buffer """
+
+        if not size:
+            size = self.chunk_size
+            if self._mark is not None:
+                # Read larger chunks for large captured values, to keep
+                # copying the buffer linear
+                size = max(size, len(self.buffer))
+        chunk = self.read_text(size)
+        if chunk:
+            # Drop the text already read before adding the chunk
+            keep = self.position if self._mark is None else self._mark
+            self.buffer = self.buffer[keep:] + chunk
+            self.position -= keep
+            self.offset += keep
+            if self._mark is not None:
+                self._mark = 0
+        else:
+            self.eof = True
+
+    def read_text(self, size):
+        """
+        Returns up to `size` characters read from the stream, which are
+        decoded from UTF-8 for binary streams, or '' at the end of the stream
+        """
+
+        while True:
+            chunk = self.fi.read(size)
+            if isinstance(chunk, six.string_types):
+                return chunk
+            if self._utf8 is None:
+                self._utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+            text = self._utf8.decode(chunk, final=not chunk)
+            # A chunk may hold only part of a character
+            if text or not chunk:
+                return text
+
+    def error(self, message):
+        """ Returns a ValueError for `message` at the current position """
+
+        return ValueError('%s (char %d)' % (
+            message,
+            self.offset + self.position,
+        ))
+
+    def next_char(self):
+        """
+        Skips whitespace, and returns the next character, or None at the end
+        of the stream.
+        """
+
+        while True:
+            match = RE_non_space.search(self.buffer, self.position)
+            if match:
+                self.position = match.start()
+                return match.group()
+            if self.eof:
+                return None
+            self.position = len(self.buffer)
+            self.read()
+
+    def expect(self, char):
+        """ Reads `char`, the next non-whitespace character """
+
+        found = self.next_char()
+        if found != char:
+            raise self.error(
+                'Expected "%s" in JSON text. Got: %r' % (char, found)
+            )
+        self.position += 1
+
+    def decode(self):
+        """ Decodes and returns the next value """
+
+        size = self.chunk_size
+        self.next_char()
+        while True:
+            buffer = self.buffer
+            try:
+                item, end = self.decoder.raw_decode(buffer, self.position)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                # A value ending with the buffer may continue in the stream
+                if end < len(buffer) or self.eof:
+                    self.position = end
+                    return item
+            # Read larger chunks for large items, to keep retries linear
+            self.read(size)
+            size *= 2
+
+    def skip(self):
+        """
+        Skips the next value, which is only checked for balanced brackets
+        and strings.
+        """
+
+        char = self.next_char()
+        if char is None:
+            raise self.error('Expected a JSON value. Got: None')
+        if char not in '{["':
+            # A number, true, false, or null
+            while True:
+                match = RE_scalar_end.search(self.buffer, self.position)
+                if match:
+                    self.position = match.start()
+                    return
+                self.position = len(self.buffer)
+                if self.eof:
+                    return
+                self.read()
+        if char == '"':
+            self.position += 1
+            self._skip_string()
+            return
+        depth = 0
+        while True:
+            end = RE_unbracketed.match(self.buffer, self.position).end()
+            self.position = end
+            if end == len(self.buffer):
+                if self.eof:
+                    raise self.error('Unterminated JSON value')
+                self.read()
+                continue
+            char = self.buffer[end]
+            self.position += 1
+            if char == '"':
+                self._skip_string()
+            elif char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _skip_string(self):
+        # Skips the rest of a string, whose opening quote has been read
+        while True:
+            end = RE_string_body.match(self.buffer, self.position).end()
+            if end < len(self.buffer) and self.buffer[end] == '"':
+                self.position = end + 1
+                return
+            if self.eof:
+                raise self.error('Unterminated JSON string')
+            # The string, or an escape sequence, continues in the stream
+            self.position = end
+            self.read()
+
+    def capture(self):
+        """
+        Skips the next value, like ``skip``, and returns its text, which may
+        be decoded later.
+        """
+
+        self.next_char()
+        self._mark = self.position
+        try:
+            self.skip()
+            return self.buffer[self._mark:self.position]
+        finally:
+            self._mark = None
+
+    def iter_object(self):
+        """
+        Generates the keys of the members of the next value, an object. The
+        value of each member must be read, with ``decode``, ``skip``, or
+        ``capture``, before the next key is generated.
+        """
+
+        self.expect('{')
+        if self.next_char() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.decode()
+            if not isinstance(key, six.string_types):
+                raise self.error('Expected a JSON object key. Got: %r' % key)
+            self.expect(':')
+            yield key
+            char = self.next_char()
+            if char == ',':
+                self.position += 1
+                if self.next_char() == '}':
+                    raise self.error(
+                        'Illegal trailing comma before end of object'
+                    )
+            elif char == '}':
+                self.position += 1
+                return
+            else:
+                raise self.error(
+                    'Expected "," or "}" in JSON object. Got: %r' % char
+                )
+
+    def iter_array(self):
+        """
+        Generates the index of each item of the next value, an array. Each
+        item must be read before the index of the next one is generated.
+        """
+
+        self.expect('[')
+        if self.next_char() == ']':
+            self.position += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.next_char()
+            if char == ',':
+                self.position += 1
+                if self.next_char() == ']':
+                    raise self.error(
+                        'Illegal trailing comma before end of array'
+                    )
+            elif char == ']':
+                self.position += 1
+                return
+            else:
+                raise self.error(
+                    'Expected "," or "]" in JSON array. Got: %r' % char
+                )
+
+
+def iter_json_array(fname, chunk_size=CHUNK_SIZE):
+    """
+    Generates the items of the JSON array in `fname`, one at a time, so the
+    array is never held in memory. A JSON object (instead of an array) is
+    generated as the only item.
+
+    `fname` is either a filename, or an open file object.
+    """
+
+    scanner = JsonScanner(fname, chunk_size)
+    if scanner.next_char() != '[':
+        yield scanner.decode()
+        return
+    for _ in scanner.iter_array():
+        yield scanner.decode()
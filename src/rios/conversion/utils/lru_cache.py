@@ -0,0 +1,90 @@
+#
+# Copyright (c) 2016, Prometheus Research, LLC
+#
+
+
+import collections
+import threading
+
+
+__all__ = ('LRUCache',)
+
+
+class LRUCache(object):
+    """
+    A bounded, thread-safe mapping that evicts its least recently used items.
+
+    Usage:
+
+        cache = LRUCache(maxsize=1024)
+        value = cache.get(key)
+        if value is None:
+            value = compute(key)
+            cache.set(key, value)
+
+    `maxsize` limits the total weight of the stored values. The weight of a
+    value is ``sizeof(value)`` when `sizeof` is supplied, and 1 otherwise, so
+    by default `maxsize` is the maximum number of items. Values heavier than
+    `maxsize` are not stored at all.
+
+    The number of successful and failed lookups are available as the `hits`
+    and `misses` attributes.
+    """
+
+    def __init__(self, maxsize=128, sizeof=None):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for `key`, or `default` if there is none.
+        """
+
+        with self._lock:
+            try:
+                item = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # Re-insert to mark the item as the most recently used
+            self._data[key] = item
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value):
+        """
+        Stores `value` for `key`, evicting old items to stay within bounds.
+        """
+
+        weight = self.sizeof(value) if self.sizeof else 1
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if weight > self.maxsize:
+                return
+            self._data[key] = (value, weight)
+            self.size += weight
+            while self.size > self.maxsize:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        """ Removes all items and resets the hit and miss counters """
+
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
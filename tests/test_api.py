@@ -132,3 +132,224 @@ def test_rios_to_redcap_api():
 
 def test_rios_to_qualtrics_api():
     from_rios_api_tst(rios_to_qualtrics, rios_tsts)
+
+
+def test_extract_types():
+    kwargs = {
+        'id': 'urn:complex_1',
+        'title': 'complex_1',
+        'description': '',
+        'stream': './tests/redcap/complex_1.csv',
+    }
+    inline = redcap_to_rios(**kwargs)
+    package = redcap_to_rios(extract_types=True, **kwargs)
+    assert 'types' not in inline['instrument']
+    types = package['instrument']['types']
+    assert types
+    names = []
+    for field in package['instrument']['record']:
+        names.append(field['type'])
+        if isinstance(field['type'], dict):
+            names.extend(
+                column['type']
+                for column in field['type'].get('columns', [])
+            )
+    for name in types:
+        assert names.count(name) > 1
+    for field, original in zip(
+            package['instrument']['record'],
+            inline['instrument']['record']):
+        if not isinstance(field['type'], dict):
+            assert types.get(field['type'], field['type']) \
+                == original['type']
+    assert rios_to_redcap(package['instrument'], package['form']) \
+        == rios_to_redcap(inline['instrument'], inline['form'])
+
+
+def test_parallel_redcap_to_rios():
+    import pickle
+    from utils import csv_names
+    from rios.conversion.redcap.to_rios import RedcapToRios
+
+    def convert(name, **kwargs):
+        converter = RedcapToRios(
+            id='urn:%s' % name,
+            title=name,
+            description='',
+            stream=open('./tests/redcap/%s.csv' % name, 'r'),
+            **kwargs
+        )
+        try:
+            converter()
+        except Error as exc:
+            return repr(exc), converter.logs
+        return converter.package, converter.logs
+
+    for name in csv_names:
+        assert convert(name, workers=2, segment_size=1) == convert(name)
+    error = Error('Message', 'payload').wrap('Context')
+    assert repr(pickle.loads(pickle.dumps(error))) == repr(error)
+
+
+def test_split_forms():
+    import io
+    import six
+    from utils import REDCAP_HEADER
+    from rios.conversion.redcap.forms import split_forms
+
+    def convert(stream, **kwargs):
+        return redcap_to_rios(
+            id='urn:test',
+            title='Test',
+            description='',
+            stream=stream,
+            split_forms=True,
+            **kwargs
+        )
+
+    complete = redcap_to_rios(
+        id='urn:test',
+        title='Test',
+        description='',
+        stream=open('./tests/redcap/format_1.csv', 'r'),
+    )
+    for workers in (1, 2):
+        payload = convert(
+            open('./tests/redcap/format_1.csv', 'r'),
+            workers=workers,
+        )
+        assert list(payload['forms']) == ['demographics', 'info']
+        assert payload['cross_form_references'] == []
+        demographics = payload['forms']['demographics']
+        assert demographics['instrument']['id'] == 'urn:test:demographics'
+        assert demographics['instrument']['title'] == 'Test: demographics'
+        assert demographics['calculationset'] == dict(
+            complete['calculationset'],
+            instrument=demographics['calculationset']['instrument'],
+        )
+        info = payload['forms']['info']
+        assert 'calculationset' not in info
+        assert [page['id'] for page in info['form']['pages']] == ['info']
+        assert [f['id'] for f in demographics['instrument']['record']] \
+            + [f['id'] for f in info['instrument']['record']] \
+            == [f['id'] for f in complete['instrument']['record']]
+
+    text = six.text_type(
+        REDCAP_HEADER
+        + 'age,Form A,,text,Age,,,integer,,,,,,,,\n'
+        + 'score,Form B,,calc,Score,[age] * [visits],,,,,,,,,,\n'
+        + 'visits,Form B,,text,Visits,,,integer,,,,[age] > 1,,,,\n'
+    )
+    forms, references = split_forms(io.StringIO(text))
+    assert list(forms) == ['form_a', 'form_b']
+    assert forms['form_b'].count('\n') == 3
+    payload = convert(io.StringIO(text), workers=1)
+    assert payload['cross_form_references'] == [
+        {
+            'form': 'form_b',
+            'field': 'score',
+            'source': 'calculation',
+            'reference': 'age',
+            'reference_form': 'form_a',
+        },
+        {
+            'form': 'form_b',
+            'field': 'visits',
+            'source': 'branching logic',
+            'reference': 'age',
+            'reference_form': 'form_a',
+        },
+    ]
+
+    bad = six.text_type(REDCAP_HEADER + 'age,aa,,text,Age,,,,,,,,,,,\n'
+                        + 'visits,bb,,unknown,Visits,,,,,,,,,,,\n')
+    payload = convert(io.StringIO(bad), suppress=True, workers=1)
+    assert 'instrument' in payload['forms']['aa']
+    assert 'failure' in payload['forms']['bb']
+    try:
+        convert(io.StringIO(bad), workers=1)
+    except ConversionFailureError as exc:
+        assert 'form "bb"' in str(exc)
+    else:
+        assert False, 'ConversionFailureError expected'
+    payload = convert(io.StringIO(u'a,b\n1,2\n'), suppress=True)
+    assert list(payload) == ['failure']
+
+
+def test_rios_to_redcap_output():
+    import csv
+    import six
+    from rios.conversion.redcap.from_rios import RedcapFromRios
+    from utils import rios_tst
+
+    test = rios_tst('format_1')[0]
+    rows = rios_to_redcap(**test)['instrument'][0]
+    output = six.StringIO()
+    payload = rios_to_redcap(output=output, **test)
+    assert 'instrument' not in payload
+    assert [
+        [cell.decode('utf-8') if six.PY2 else cell for cell in row]
+        for row in csv.reader(six.StringIO(output.getvalue()))
+    ] == [list(row) for row in rows]
+
+    converter = RedcapFromRios(**test)
+    rows_iter = converter.iter_rows()
+    assert next(rows_iter)[0] == 'Variable / Field Name'
+    assert next(rows_iter) == list(rows)[1]
+    assert converter.instrument == []
+    assert converter.write_csv(six.StringIO()) == len(rows)
+
+    invalid = dict(test, form=dict(test['form'], pages=[]))
+    assert 'failure' in rios_to_redcap(
+        output=six.StringIO(),
+        suppress=True,
+        **invalid
+    )
+
+
+def test_qualtrics_to_rios_filemetadata():
+    import os
+    import six
+    import threading
+
+    with open('./tests/qualtrics/qualtrics_health.qsf', 'r') as stream:
+        text = stream.read()
+
+    # Pipes have a seek method, which fails
+    fd_in, fd_out = os.pipe()
+
+    def write():
+        with os.fdopen(fd_out, 'w') as stream:
+            stream.write(text)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        with os.fdopen(fd_in, 'r') as stream:
+            package = qualtrics_to_rios(stream=stream, filemetadata=True)
+    finally:
+        writer.join()
+    assert 'failure' not in package
+    assert package == qualtrics_to_rios(
+        stream=six.StringIO(text),
+        filemetadata=True,
+    )
+    assert package['instrument']['id'] == 'urn:SV_1MMcjvoGWqh8uUZ'
+    assert package['form']['pages']
+
+
+def test_qualtrics_to_rios_binary():
+    filename = './tests/qualtrics/qualtrics_health.qsf'
+    with open(filename, 'r') as stream:
+        expected = qualtrics_to_rios(stream=stream, filemetadata=True)
+    with open(filename, 'rb') as stream:
+        package = qualtrics_to_rios(stream=stream, filemetadata=True)
+    assert package == expected
+    with open(filename, 'rb') as stream:
+        package = qualtrics_to_rios(
+            stream=stream,
+            id='urn:binary',
+            title='binary',
+            description='',
+        )
+    assert package['form']['pages'] == expected['form']['pages']
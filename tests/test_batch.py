@@ -0,0 +1,79 @@
+from __future__ import print_function
+
+import yaml
+
+from rios.conversion import (
+    convert_many,
+    redcap_to_rios,
+    rios_to_redcap,
+)
+
+
+print("\n====== BATCH TESTS ======")
+
+
+def redcap_jobs():
+    return [
+        (
+            'redcap_to_rios',
+            {
+                'id': 'urn:%s' % name,
+                'title': name,
+                'description': '',
+                'stream': './tests/redcap/%s.csv' % name,
+                'suppress': True,
+            }
+        )
+        for name in ('format_1', 'bad_format', 'matrix_1')
+    ]
+
+
+def check_redcap_payloads(payloads):
+    assert len(payloads) == 3
+    assert 'instrument' in payloads[0]
+    assert list(payloads[1].keys()) == ['failure']
+    assert 'instrument' in payloads[2]
+    assert payloads[0]['instrument']['id'] == 'urn:format_1'
+    assert payloads[2]['instrument']['id'] == 'urn:matrix_1'
+
+
+def test_convert_many_serial():
+    payloads = convert_many(redcap_jobs())
+    check_redcap_payloads(payloads)
+    expected = redcap_to_rios(**redcap_jobs()[0][1])
+    assert payloads[0] == expected
+
+
+def test_convert_many_thread():
+    check_redcap_payloads(convert_many(redcap_jobs(), executor='thread'))
+
+
+def test_convert_many_process():
+    check_redcap_payloads(
+        convert_many(redcap_jobs(), executor='process', workers=2)
+    )
+
+
+def test_convert_many_functions():
+    kwargs = {
+        'instrument': yaml.safe_load(open('./tests/rios/format_1_i.yaml')),
+        'form': yaml.safe_load(open('./tests/rios/format_1_f.yaml')),
+        'calculationset': yaml.safe_load(
+            open('./tests/rios/format_1_c.yaml')
+        ),
+    }
+    payloads = convert_many([(rios_to_redcap, kwargs)], executor='thread')
+    assert payloads == [rios_to_redcap(**kwargs)]
+
+
+def test_convert_many_invalid():
+    for jobs, executor in (
+            ([('unknown_api', {})], None),
+            ([('redcap_to_rios',)], None),
+            ([], 'cluster')):
+        try:
+            convert_many(jobs, executor=executor)
+        except ValueError:
+            pass
+        else:
+            assert False, 'Expected a ValueError'
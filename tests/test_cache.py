@@ -0,0 +1,103 @@
+from __future__ import print_function
+
+import shutil
+import tempfile
+
+import yaml
+
+from rios.conversion import (
+    ConversionCache,
+    redcap_to_rios,
+    qualtrics_to_rios,
+    rios_to_redcap,
+)
+from rios.conversion.utils import LRUCache
+
+
+print("\n====== CACHE TESTS ======")
+
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_lru_cache_sizeof():
+    cache = LRUCache(maxsize=10, sizeof=len)
+    cache.set('a', 'x' * 6)
+    cache.set('b', 'x' * 6)
+    assert list(cache._data) == ['b']
+    cache.set('c', 'x' * 11)
+    assert 'c' not in cache
+    assert cache.size == 6
+
+
+def test_redcap_to_rios_cache():
+    cache = ConversionCache()
+    kwargs = {
+        'id': 'urn:format_1',
+        'title': 'format_1',
+        'description': '',
+        'localization': 'en',
+        'cache': cache,
+    }
+    first = redcap_to_rios(
+        stream=open('./tests/redcap/format_1.csv', 'r'),
+        **kwargs
+    )
+    second = redcap_to_rios(
+        stream=open('./tests/redcap/format_1.csv', 'r'),
+        **kwargs
+    )
+    assert first == second
+    assert first is not second
+    assert (cache.memory.hits, cache.memory.misses) == (1, 1)
+
+    other = redcap_to_rios(
+        stream='./tests/redcap/format_1.csv',
+        **dict(kwargs, title='other')
+    )
+    assert other['instrument']['title'] == 'other'
+    assert cache.memory.misses == 2
+
+
+def test_failures_not_cached():
+    cache = ConversionCache()
+    for _ in range(2):
+        payload = qualtrics_to_rios(
+            stream=open('./tests/qualtrics/bad_json.qsf', 'r'),
+            filemetadata=True,
+            suppress=True,
+            cache=cache,
+        )
+        assert 'failure' in payload
+    assert len(cache.memory) == 0
+
+
+def test_disk_cache():
+    directory = tempfile.mkdtemp()
+    try:
+        kwargs = {
+            'instrument': yaml.safe_load(
+                open('./tests/rios/format_1_i.yaml')
+            ),
+            'form': yaml.safe_load(open('./tests/rios/format_1_f.yaml')),
+        }
+        first = rios_to_redcap(
+            cache=ConversionCache(directory=directory),
+            **kwargs
+        )
+        cache = ConversionCache(directory=directory)
+        second = rios_to_redcap(cache=cache, **kwargs)
+        assert first == second
+        assert cache.memory.misses == 1
+        assert len(cache.memory) == 1
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,97 @@
+from __future__ import print_function
+
+import six
+
+from rios.conversion.base.structures import CalculationObject
+from rios.conversion.exception import Error, RedcapFormatError
+from rios.conversion.redcap.calculations import (
+    calculation_dependencies,
+    order_calculations,
+)
+from rios.conversion.redcap.to_rios import RedcapToRios
+from utils import REDCAP_HEADER
+
+
+print("\n====== CALCULATION TESTS ======")
+
+
+def calculations(**expressions):
+    return [
+        CalculationObject(id=name, options={'expression': expression})
+        for name, expression in sorted(expressions.items())
+    ]
+
+
+def test_dependencies():
+    dependencies = calculation_dependencies(calculations(
+        a='[c] + [b] + [x]',
+        b='[c][a] * 2',
+        c='1',
+    ))
+    assert dependencies == {'a': ['b', 'c'], 'b': [], 'c': []}
+
+
+def test_order():
+    ordered = order_calculations(calculations(
+        a='[d] + [b]',
+        b='[c]',
+        c='[x]',
+        d='[c] + [b]',
+        e='1',
+    ))
+    assert [c['id'] for c in ordered] == ['c', 'b', 'd', 'a', 'e']
+
+
+def test_errors():
+    for expressions, message in (
+            (dict(a='[b]', b='[c]', c='[a]'), 'a -> b -> c -> a'),
+            (dict(a='[a] + 1'), 'a -> a')):
+        try:
+            order_calculations(calculations(**expressions))
+        except RedcapFormatError as exc:
+            assert message in str(exc)
+        else:
+            assert False, 'Cycle not detected'
+    try:
+        order_calculations(calculations(a='1') + calculations(a='2'))
+    except RedcapFormatError as exc:
+        assert 'Duplicate' in str(exc)
+    else:
+        assert False, 'Duplicate not detected'
+
+
+def convert(rows):
+    converter = RedcapToRios(
+        id='urn:calcs',
+        title='calcs',
+        description='',
+        stream=six.StringIO(REDCAP_HEADER + rows),
+    )
+    converter()
+    return converter
+
+
+def test_redcap_calculations():
+    converter = convert(
+        'total,form,,calc,Total,[score] + [bonus],,,,,,,,,,\n'
+        'q1,form,,text,Question,,,,,,,[total] > 1,,,,\n'
+        'bonus,form,,calc,Bonus,[score] * 2,,,,,,,,,,\n'
+        'score,form,,text,Score,,,integer,,,,,,,,\n'
+    )
+    calculations = converter.calculationset['calculations']
+    assert [c['id'] for c in calculations] == ['bonus', 'total']
+    assert calculations[1]['options']['expression'] \
+        == 'assessment["score"] + calculations["bonus"]'
+    question = converter.form['pages'][0]['elements'][0]['options']
+    assert question['events'][0]['trigger'] \
+        == '!(calculations["total"] > 1)'
+
+    try:
+        convert(
+            'a,form,,calc,A,[b],,,,,,,,,,\n'
+            'b,form,,calc,B,[a],,,,,,,,,,\n'
+        )
+    except Error as exc:
+        assert 'a -> b -> a' in str(exc)
+    else:
+        assert False, 'Cycle not detected'
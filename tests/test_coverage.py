@@ -8,7 +8,9 @@ from rios.conversion.utils.csv_reader import *
 from rios.conversion.base.from_rios import FromRios
 from rios.conversion.redcap.from_rios import RedcapFromRios
 import collections
-import json, yaml, os
+import json, yaml, os, six, sys
+
+from utils import REDCAP_HEADER
 
 
 print("\n====== COVERAGE TESTS ======")
@@ -55,9 +57,434 @@ def test_convert_variables():
             'assessment["assessment_var"] '
             '+ calculations["calculations_var"] '
             '+ table["field"]')
+    # Only variable references are translated, and quoted text is left as is
+    assert rfr.convert_variables(
+            'math.pow(assessment["a"], 2) != "t[\'b\']"'
+    ) == 'math.pow([a], 2) != "t[\'b\']"'
 
 def test_csv_reader():
     csv_reader = CsvReader('tests/redcap/format_1.csv')
     csv_reader.load_reader()
     rows = [od for od in csv_reader]
     assert len(rows) == 24, len(rows)
+
+
+def test_csv_reader_fast():
+    fname = 'tests/redcap/format_1.csv'
+    rows = list(CsvReader(fname))
+    for options in (dict(fast=True), dict(fast=True, mmap=True)):
+        fast = list(CsvReader(fname, **options))
+        assert all(isinstance(row, CsvRow) for row in fast)
+        assert [row.as_dict() for row in fast] == rows
+    stream = six.StringIO('a,b,c\n 1 ,2,3\n4\n')
+    row, short = CsvReader(stream, fast=True)
+    assert row == ('1', '2', '3')
+    assert row['c'] == '3' and row[0] == '1' and row[-1] == '3'
+    assert 'b' in row and 'd' not in row and row.get('d', 'x') == 'x'
+    assert sorted(row.keys()) == ['a', 'b', 'c']
+    assert 'a' in short and 'b' not in short and short.get('b') is None
+    try:
+        short['b']
+    except KeyError:
+        pass
+    else:
+        assert False, 'Missing column did not raise KeyError'
+
+
+def test_to_rios_output():
+    from rios.conversion.base.to_rios import ToRios
+    converter = ToRios(
+        id='urn:test',
+        title='Test',
+        description='',
+        stream=None,
+    )
+    converter.add_field(FieldObject(id='alpha', type='float'))
+    page = PageObject(id='page1')
+    page.add_element(ElementObject(
+        type='question',
+        options=QuestionObject(
+            fieldId='alpha',
+            text=LocalizedStringObject(en='Alpha'),
+        ),
+    ))
+    converter.add_page(page)
+    output = converter.output
+    assert converter.instrument is output['instrument']
+    assert converter.output is output
+    assert 'calculationset' not in converter.package
+    converter.add_calculation(CalculationObject(
+        id='double_alpha',
+        type='float',
+        method='python',
+        options={'expression': 'assessment["alpha"] * 2'},
+    ))
+    assert converter.output is not output
+    converter.validate()
+    calculations = converter.package['calculationset']['calculations']
+    assert calculations[0]['id'] == 'double_alpha'
+
+
+def test_to_plain():
+    import copy
+    from rios.conversion.redcap.to_rios import RedcapToRios
+    from rios.conversion.qualtrics.to_rios import QualtricsToRios
+    converters = [
+        RedcapToRios(
+            id='urn:%s' % name,
+            title=name,
+            description='',
+            stream=open('tests/redcap/%s.csv' % name, 'r'),
+        )
+        for name in ('format_1', 'complex_1', 'complex_2', 'matrix_1')
+    ] + [
+        QualtricsToRios(
+            id='urn:qualtrics_health',
+            title='qualtrics_health',
+            description='',
+            stream=open('tests/qualtrics/qualtrics_health.qsf', 'r'),
+        )
+    ]
+    for converter in converters:
+        converter()
+        for definition in (converter._instrument, converter._form):
+            original = copy.deepcopy(definition)
+            plain = definition.to_plain()
+            assert definition == original
+            assert plain == definition.clean().as_dict()
+            assert definition.to_plain(clean=False) == definition.as_dict()
+
+
+def test_compact_structures():
+    import copy
+    import pickle
+    question = QuestionObject(fieldId='alpha', bogus='ignored')
+    if sys.version_info[0] > 2:
+        # Python 2's abstract base classes do not define __slots__
+        assert not hasattr(question, '__dict__')
+    assert list(question.keys()) == ['fieldId']
+    assert 'enumerations' not in question
+    assert question.get('enumerations') is None
+    question.add_enumeration(DescriptorObject(id='one'))
+    assert list(question.keys()) == ['fieldId', 'enumerations']
+    field = FieldObject(id='alpha')
+    assert dict(field) == {
+        'id': 'alpha',
+        'required': False,
+        'identifiable': False,
+    }
+    field['extra'] = 1
+    del field['required']
+    assert list(field.keys()) == ['id', 'identifiable', 'extra']
+    for other in (pickle.loads(pickle.dumps(field)), copy.deepcopy(field)):
+        assert other == field
+        assert type(other) is FieldObject
+    assert field == {'id': 'alpha', 'identifiable': False, 'extra': 1}
+    try:
+        del field['description']
+    except KeyError:
+        pass
+    else:
+        assert False, 'Expected a KeyError'
+
+
+def test_structure_pool():
+    from rios.conversion.base import StructurePool
+    from rios.conversion.redcap.to_rios import RedcapToRios
+    pool = StructurePool('en')
+    assert pool.localized_string('Yes') is pool.localized_string('Yes')
+    assert pool.localized_string('Yes') == {'en': 'Yes'}
+    assert pool.descriptor('yes', 'Yes') is pool.descriptor('yes', 'Yes')
+    yesno = pool.enumeration_type('enumeration', [('yes', ''), ('no', '')])
+    assert yesno is pool.enumeration_type(
+        'enumeration',
+        (('yes', ''), ('no', '')),
+    )
+    assert yesno is not pool.enumeration_type('enumerationSet', [('yes', '')])
+    assert yesno.to_plain() == {
+        'base': 'enumeration',
+        'enumerations': {'yes': None, 'no': None},
+    }
+
+    converter = RedcapToRios(
+        id='urn:pooled',
+        title='pooled',
+        description='',
+        stream=six.StringIO(
+            REDCAP_HEADER +
+            'q1,page,,yesno,First,,,,,,,,,,,\n'
+            'q2,page,,yesno,Second,,,,,,,,,,,\n'
+            'q3,page,,radio,Third,"1, Low | 2, High",,,,,,,,,,\n'
+            'q4,page,,radio,Fourth,"1, Low | 2, High",,,,,,,,,,\n'
+        ),
+    )
+    converter()
+    # Pooled structures are shared while converting
+    fields = converter._instrument['record']
+    assert fields[0]['type'] is fields[1]['type']
+    assert fields[2]['type'] is fields[3]['type']
+    questions = [
+        element['options']
+        for element in converter._form['pages'][0]['elements']
+    ]
+    assert questions[2]['enumerations'][0] is \
+        questions[3]['enumerations'][0]
+    # but not in the converted definitions
+    fields = converter.instrument['record']
+    assert fields[0]['type'] is not fields[1]['type']
+    assert fields[0]['type'] == fields[1]['type']
+    assert fields[0]['type'] == {
+        'base': 'enumeration',
+        'enumerations': {
+            'yes': {'description': 'Yes'},
+            'no': {'description': 'No'},
+        },
+    }
+    questions = [
+        element['options']
+        for element in converter.form['pages'][0]['elements']
+    ]
+    assert questions[2]['enumerations'][0] is not \
+        questions[3]['enumerations'][0]
+    assert questions[2]['enumerations'] == questions[3]['enumerations']
+    fields[0]['type']['enumerations']['yes']['description'] = 'Changed'
+    assert fields[1]['type']['enumerations']['yes'] == {'description': 'Yes'}
+    for definition in (converter.instrument, converter.form):
+        assert '&id' not in yaml.safe_dump(definition)
+
+
+def test_redcap_page_order():
+    from rios.conversion.redcap.to_rios import RedcapToRios
+    converter = RedcapToRios(
+        id='urn:pages',
+        title='pages',
+        description='',
+        stream=six.StringIO(
+            REDCAP_HEADER +
+            ''.join(
+                'q%d,%s,,notes,Question %d,,,,,,,,,,,\n' % (i, page, i)
+                for i, page in enumerate('zebra alpha zebra mid alpha'.split())
+            )
+        ),
+    )
+    converter()
+    pages = converter.form['pages']
+    assert [page['id'] for page in pages] == ['zebra', 'alpha', 'mid']
+    assert [
+        element['options']['fieldId']
+        for element in pages[0]['elements']
+    ] == ['q0', 'q2']
+
+
+def test_get_name_cache():
+    from rios.conversion.redcap.to_rios import CsvReaderWithGetName
+    names = CsvReaderWithGetName.names
+    reader = CsvReaderWithGetName(None)
+    misses = names.misses
+    assert reader.get_name(' 1st Name__ ') == 'id_1st_name'
+    assert names.misses == misses + 1
+    hits = names.hits
+    other = CsvReaderWithGetName(None)
+    assert other.get_name(' 1st Name__ ') == 'id_1st_name'
+    assert names.hits == hits + 1
+    assert reader.get_name('Choices, Calculations') \
+        == CsvReaderWithGetName.canonical_name('Choices, Calculations') \
+        == 'choices_or_calculations'
+    try:
+        reader.get_name(None)
+    except ValueError:
+        pass
+    else:
+        assert False, 'Expected a ValueError'
+
+
+def test_parsed_choices():
+    from rios.conversion.redcap.to_rios import (
+        CsvReaderWithGetName,
+        Processor,
+    )
+    processor = Processor(CsvReaderWithGetName(None), 'en')
+    row = {'choices_or_calculations': '1, Low, or none | 2 ,High| 3'}
+    parsed = processor.parse_choices(row)
+    assert parsed is processor.parse_choices(dict(row))
+    assert parsed.choices == (
+        ('id_1', 'Low, or none'),
+        ('id_2', 'High'),
+        ('id_3', ''),
+    )
+    form = processor.get_choices_form(row)
+    assert form == list(parsed.descriptors)
+    assert form is not processor.get_choices_form(row)
+    assert form[0] == {'id': 'id_1', 'text': {'en': 'Low, or none'}}
+    assert processor.get_choices_instrument(row) is parsed.enumerations
+    assert processor.get_choices_type('enumeration', row) \
+        is processor.get_choices_type('enumeration', row)
+    assert processor.get_choices_type('enumerationSet', row)['base'] \
+        == 'enumerationSet'
+
+
+def test_get_full_type():
+    from rios.core.validation.instrument import get_full_type_definition
+    instrument = {
+        'id': 'urn:types',
+        'version': '1.0',
+        'title': 'Types',
+        'types': {
+            'score': {'base': 'integer', 'range': {'min': 0}},
+            'small_score': {'base': 'score', 'range': {'max': 10}},
+            'choice': {
+                'base': 'enumeration',
+                'enumerations': {'a': {}, 'b': {}},
+            },
+        },
+        'record': [
+            {'id': 'a', 'type': 'small_score'},
+            {'id': 'b', 'type': {'base': 'small_score', 'required': True}},
+            {'id': 'c', 'type': 'choice'},
+            {'id': 'd', 'type': 'text'},
+            {'id': 'e', 'type': 'unknown'},
+            {'id': 'f', 'type': {'base': 'unknown'}},
+        ],
+    }
+    converter = FromRios(form={}, instrument=instrument)
+    for field in instrument['record'][:4]:
+        assert converter.get_full_type(field['id']) \
+            == get_full_type_definition(instrument, field['type'])
+    assert converter.get_full_type('a') is converter.get_full_type('a')
+    assert converter.get_full_type('b') == {
+        'base': 'integer',
+        'range': {'max': 10},
+        'required': True,
+    }
+    for field_id in ('e', 'f'):
+        try:
+            converter.get_full_type(field_id)
+        except ValueError:
+            pass
+        else:
+            assert False, 'Expected a ValueError'
+
+    from rios.conversion.qualtrics.from_rios import QualtricsFromRios
+    converter = QualtricsFromRios(
+        instrument=instrument,
+        form={'pages': [{'id': 'page1', 'elements': [{
+            'type': 'question',
+            'options': {
+                'fieldId': 'c',
+                'text': {'en': 'Choose'},
+                'enumerations': [
+                    {'id': 'a', 'text': {'en': 'A'}},
+                    {'id': 'b', 'text': {'en': 'B'}},
+                ],
+            },
+        }]}]},
+        localization='en',
+    )
+    converter()
+    assert converter.instrument == [
+        '[[PageBreak]]', '1. Choose', '', 'A', 'B', '', '',
+    ]
+
+
+def test_legacy_data_type():
+    from rios.conversion import redcap_to_rios
+    from rios.conversion.redcap.to_rios import (
+        CsvReaderWithGetName,
+        LegacyProcessor,
+    )
+    processor = LegacyProcessor(CsvReaderWithGetName(None), 'en')
+    row = {'data_type': '{"Choices": [{"No": "no"}, {"1": "one"}]}'}
+    parsed = processor.parse_data_type(row)
+    assert parsed is processor.parse_data_type(dict(row))
+    assert parsed.choices == (('id_1', 'one'), ('no', 'no'))
+    assert processor.parse_data_type({'data_type': '{"choices": []}'}) \
+        is None
+
+    with open('./tests/redcap/format_2.csv') as stream:
+        package = redcap_to_rios(
+            id='urn:format_2',
+            title='format_2',
+            description='',
+            stream=stream,
+        )
+    for name, suffix in (('instrument', 'i'), ('form', 'f')):
+        with open('./tests/rios/format_2_%s.yaml' % suffix) as stream:
+            expected = yaml.safe_load(stream)
+        assert json.loads(json.dumps(package[name])) == expected, name
+
+
+def test_register_field_type():
+    from rios.conversion.redcap import FieldTypeHandler, register_field_type
+    from rios.conversion.redcap.field_types import FIELD_TYPE_HANDLERS
+    from rios.conversion.redcap.to_rios import RedcapToRios
+
+    class FileHandler(FieldTypeHandler):
+        def __call__(self, processor, question, row, side_effects=True):
+            if side_effects:
+                question.set_widget(WidgetConfigurationObject(type='file'))
+            return 'text'
+
+    def convert():
+        converter = RedcapToRios(
+            id='urn:handlers',
+            title='handlers',
+            description='',
+            stream=six.StringIO(
+                REDCAP_HEADER +
+                'upload,page,,file,Upload,,,,,,,,,,,\n'
+                'name,page,,text,Name,,,,,,,,,,,\n'
+            ),
+        )
+        converter()
+        return converter
+
+    assert len(convert().instrument['record']) == 1
+    try:
+        register_field_type('file', FileHandler())
+        converter = convert()
+    finally:
+        del FIELD_TYPE_HANDLERS['file']
+    assert converter.instrument['record'][0] == {
+        'id': 'upload',
+        'description': 'Upload',
+        'type': 'text',
+        'required': False,
+        'identifiable': False,
+    }
+    widget = converter.form['pages'][0]['elements'][0]['options']['widget']
+    assert widget == {'type': 'file'}
+    try:
+        register_field_type('file', None)
+    except ValueError:
+        pass
+    else:
+        assert False, 'Expected a ValueError'
+
+
+def test_read_qsf():
+    import simplejson
+    from rios.conversion.qualtrics import read_qsf
+    with open('tests/qualtrics/qualtrics_health.qsf', 'r') as stream:
+        document = simplejson.load(stream)
+    with open('tests/qualtrics/qualtrics_health.qsf', 'r') as stream:
+        data = read_qsf(stream)
+    assert sorted(data) == ['SurveyElements', 'SurveyEntry']
+    assert data['SurveyEntry'] == document['SurveyEntry']
+    assert data['SurveyElements'] == [
+        element
+        for element in document['SurveyElements']
+        if element['Element'] in ('BL', 'SQ')
+    ]
+    # A Payload before the Element is only decoded for the kept elements
+    data = read_qsf(six.StringIO(
+        '{"SurveyElements": ['
+        '{"Payload": {"a": "}"}, "Element": "SQ"}, '
+        '{"Payload": [{"b": "\\"["}], "Element": "GR"}, '
+        '{"Payload": {"c": 1}}, 7], '
+        '"Other": [1, {"d": [2]}]}'
+    ), elements=('SQ',))
+    assert data == {'SurveyElements': [
+        {'Payload': {'a': '}'}, 'Element': 'SQ'},
+        {'Payload': {'c': 1}},
+        7,
+    ]}
@@ -0,0 +1,328 @@
+from __future__ import print_function
+
+import math
+
+from rios.conversion.exception import ConversionValueError
+from rios.conversion.redcap import (
+    CalculationEvaluator,
+    evaluate_batch,
+    functions,
+    get_evaluator,
+)
+
+try:
+    import numpy
+    from rios.conversion.redcap import array_functions
+except ImportError:
+    numpy = None
+
+
+print("\n====== EVALUATION TESTS ======")
+
+
+PREFIX = 'rios.conversion.redcap.functions.'
+
+CALCULATIONSET = {
+    'instrument': {'id': 'urn:test', 'version': '1.0'},
+    'calculations': [
+        {
+            'id': 'double',
+            'method': 'python',
+            'options': {'expression': 'calculations["bmi"] * 2'},
+        },
+        {
+            'id': 'bmi',
+            'method': 'python',
+            'options': {'expression': (
+                PREFIX + 'round_((assessment["weight"]*10000)'
+                '/(math.pow(assessment["height"], 2)),1)'
+            )},
+        },
+        {
+            'id': 'age',
+            'method': 'python',
+            'options': {'expression': (
+                PREFIX + "datediff(assessment[\"dob\"],'2020-01-01','y')"
+            )},
+        },
+        {
+            'id': 'spread',
+            'method': 'python',
+            'options': {'expression': (
+                PREFIX + 'stdev(assessment["a"], assessment["b"])'
+                ' + max(assessment["a"], 2) + ' + PREFIX
+                + 'median(assessment["a"], assessment["b"], 1)'
+            )},
+        },
+        {
+            'id': 'ratio',
+            'method': 'python',
+            'options': {'expression': 'assessment["a"] / assessment["b"]'},
+        },
+        {
+            'id': 'label',
+            'method': 'python',
+            'options': {'expression': 'assessment["name"] + "!"'},
+        },
+    ],
+}
+
+COLUMNS = {
+    'weight': [70, None, 80, 60],
+    'height': [170, 180, 0, 150],
+    'dob': ['1980-05-01', None, '2019-12-31', 'bad'],
+    'a': [1.25, 2, None, 4.55],
+    'b': [0, 3.5, 5, 6.1],
+    'name': ['x', None, 'y', 'z'],
+}
+
+EXPECTED = {
+    'bmi': [24.2, None, None, 26.7],
+    'double': [48.4, None, None, 53.4],
+    'age': [-39.6958904109589, None, -1 / 365.0, None],
+    'spread': [0.625 + 2 + 1, 0.75 + 2 + 2, None, 0.775 + 4.55 + 4.55],
+    'ratio': [None, 2 / 3.5, None, 4.55 / 6.1],
+    'label': ['x!', None, 'y!', 'z!'],
+}
+
+
+def as_list(values):
+    return [
+        None if value is None or value != value else value
+        for value in values
+    ]
+
+
+def assert_close(values, expected):
+    assert len(values) == len(expected)
+    for value, other in zip(values, expected):
+        if isinstance(other, float):
+            assert abs(value - other) < 1e-9, (values, expected)
+        else:
+            assert value == other, (values, expected)
+
+
+def test_evaluate_batch():
+    results = evaluate_batch(CALCULATIONSET, COLUMNS, use_numpy=False)
+    assert list(results) == [
+        calculation['id']
+        for calculation in CALCULATIONSET['calculations']
+    ]
+    for name, expected in EXPECTED.items():
+        assert isinstance(results[name], list)
+        assert_close(results[name], expected)
+
+    # Fields without a column have no values
+    results = evaluate_batch(
+        CALCULATIONSET,
+        {'a': [1, 2], 'b': [2, 2]},
+        use_numpy=False,
+    )
+    assert results['ratio'] == [0.5, 1.0]
+    assert results['bmi'] == [None, None]
+
+
+def test_evaluate_batch_numpy():
+    if numpy is None:
+        return
+    results = evaluate_batch(CALCULATIONSET, COLUMNS)
+    for name, expected in EXPECTED.items():
+        assert isinstance(results[name], numpy.ndarray)
+        assert_close(as_list(results[name]), expected)
+    assert results['bmi'].dtype == float
+    assert results['label'].dtype == object
+
+    arrays = dict(
+        (name, numpy.asarray(values, dtype=float))
+        for name, values in COLUMNS.items()
+        if name in ('a', 'b')
+    )
+    results = evaluate_batch(CALCULATIONSET, arrays)
+    assert_close(as_list(results['ratio']), EXPECTED['ratio'])
+
+
+def test_evaluate_batch_text():
+    calculationset = {
+        'instrument': {'id': 'urn:test', 'version': '1.0'},
+        'calculations': [
+            {
+                'id': 'local',
+                'method': 'python',
+                'options': {'expression': (
+                    '1 if assessment["zip"] == "12345" else 0'
+                )},
+            },
+            {
+                'id': 'same',
+                'method': 'python',
+                'options': {'expression': 'assessment["zip"] == "12345"'},
+            },
+        ],
+    }
+    columns = {'zip': ['12345', '54321', None]}
+    expected = evaluate_batch(calculationset, columns, use_numpy=False)
+    assert expected['local'] == [1, 0, 0]
+    assert expected['same'] == [True, False, False]
+    if numpy is None:
+        return
+    results = evaluate_batch(calculationset, columns, use_numpy=True)
+    for name, values in expected.items():
+        assert as_list(results[name]) == values, name
+
+
+def test_array_functions():
+    if numpy is None:
+        return
+    a = [1.25, 2.5, -3.75, 4.45, 0.0]
+    b = [2.0, -1.5, 6.25, 4.45, 1e-3]
+    for name in ('mean', 'median', 'stdev', 'sum_'):
+        values = getattr(array_functions, name)(
+            numpy.asarray(a), numpy.asarray(b), 3
+        )
+        expected = [getattr(functions, name)(x, y, 3) for x, y in zip(a, b)]
+        assert_close(list(values), expected)
+    for name in ('round_', 'rounddown', 'roundup'):
+        for places in (0, 1, 2):
+            values = getattr(array_functions, name)(numpy.asarray(a), places)
+            expected = [getattr(functions, name)(x, places) for x in a]
+            assert_close(list(values), expected)
+    for builtin, name in ((min, 'min_'), (max, 'max_')):
+        values = getattr(array_functions, name)(numpy.asarray(a), b, 1)
+        assert_close(list(values), [builtin(x, y, 1) for x, y in zip(a, b)])
+
+    dates = ['2016-02-29', '2000-01-01', '1999-12-31']
+    for units in ('y', 'M', 'd', 'h', 'm', 's'):
+        values = array_functions.datediff(
+            numpy.asarray(dates, dtype=object),
+            '2016-03-01',
+            units,
+        )
+        expected = [
+            functions.datediff(date, '2016-03-01', units)
+            for date in dates
+        ]
+        assert_close(list(values), expected)
+    assert math.isnan(array_functions.datediff(
+        numpy.asarray([None], dtype=object), '2016-03-01', 'd')[0])
+    for arguments in (
+            (['today'], '2016-03-01', 'd'),
+            (dates, '2016-03-01', 'x')):
+        try:
+            array_functions.datediff(*arguments)
+        except ValueError:
+            pass
+        else:
+            assert False, 'ValueError expected'
+
+
+def calculationset(**expressions):
+    return {
+        'instrument': {'id': 'urn:test', 'version': '1.0'},
+        'calculations': [
+            {'id': name, 'method': 'python',
+                'options': {'expression': expression}}
+            for name, expression in sorted(expressions.items())
+        ],
+    }
+
+
+def test_evaluate_batch_errors():
+    for use_numpy in (False, None):
+        for expressions, message in (
+                ({'a': 'calculations["b"]', 'b': 'calculations["a"] + 1'},
+                    'a -> b -> a'),
+                ({'a': 'calculations["x"]'}, 'unknown calculation'),
+                ({'a': 'if(1, 2, 3)'}, 'Unable to compile')):
+            try:
+                evaluate_batch(
+                    calculationset(**expressions),
+                    {'x': [1]},
+                    use_numpy=use_numpy,
+                )
+            except ConversionValueError as exc:
+                assert message in str(exc), str(exc)
+            else:
+                assert False, 'ConversionValueError expected'
+
+    try:
+        evaluate_batch(calculationset(a='1'), {'x': [1], 'y': [1, 2]})
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError expected'
+
+    htsql = calculationset(a='1')
+    htsql['calculations'][0]['method'] = 'htsql'
+    try:
+        evaluate_batch(htsql, {'x': [1]})
+    except ConversionValueError as exc:
+        assert 'htsql' in str(exc)
+    else:
+        assert False, 'ConversionValueError expected'
+
+
+def test_calculation_evaluator():
+    evaluator = CalculationEvaluator(CALCULATIONSET)
+    assert [name for name, _, _ in evaluator.calculations][:2] \
+        == ['bmi', 'double']
+    for index in range(4):
+        values = dict(
+            (name, column[index])
+            for name, column in COLUMNS.items()
+        )
+        results = evaluator.evaluate(values)
+        assert list(results) == list(evaluator.names)
+        assert_close(
+            list(results.values()),
+            [EXPECTED[name][index] for name in results],
+        )
+    assert evaluator.timings['bmi'].count == 4
+    assert evaluator.timings['bmi'].errors == 2
+    assert evaluator.timings['bmi'].seconds > 0
+    assert evaluator.timings['bmi'].mean > 0
+    evaluator.reset_timings()
+    assert evaluator.timings['bmi'].count == 0
+
+    # Missing values
+    results = evaluator.evaluate_assessment({
+        'instrument': CALCULATIONSET['instrument'],
+        'values': {'a': {'value': 3}, 'b': {'value': 2}},
+    })
+    assert results['ratio'] == 1.5
+    assert results['bmi'] is None
+
+    untimed = CalculationEvaluator(CALCULATIONSET, timing=False)
+    assert untimed.evaluate({'a': 3, 'b': 2})['ratio'] == 1.5
+    assert untimed.timings['ratio'].count == 0
+
+
+def test_get_evaluator():
+    evaluator = get_evaluator(CALCULATIONSET)
+    assert isinstance(evaluator, CalculationEvaluator)
+    copy = dict(CALCULATIONSET)
+    copy['calculations'] = [
+        dict(calculation)
+        for calculation in CALCULATIONSET['calculations']
+    ]
+    assert get_evaluator(copy) is evaluator
+    copy['calculations'][0] = dict(
+        copy['calculations'][0],
+        options={'expression': 'calculations["bmi"] * 3'},
+    )
+    assert get_evaluator(copy) is not evaluator
+    assert get_evaluator(copy).evaluate({
+        'weight': 70,
+        'height': 170,
+    })['double'] == 24.2 * 3
+
+    for expressions, message in (
+            ({'a': 'calculations["b"]', 'b': "calculations['a'] + 1"},
+                'a -> b -> a'),
+            ({'a': 'calculations["x"]'}, 'unknown calculation'),
+            ({'a': 'if(1, 2, 3)'}, 'Unable to compile')):
+        try:
+            get_evaluator(calculationset(**expressions))
+        except ConversionValueError as exc:
+            assert message in str(exc), str(exc)
+        else:
+            assert False, 'ConversionValueError expected'
@@ -0,0 +1,85 @@
+from __future__ import print_function
+
+import math
+
+import rios.conversion.redcap.functions  # noqa: F401
+from rios.conversion.redcap import expression
+from rios.conversion.redcap.expression import (
+    parse,
+    redcap_to_python,
+    rexl_to_redcap,
+)
+
+
+print("\n====== EXPRESSION TESTS ======")
+
+
+def test_references():
+    assert redcap_to_python('[a] = "1" and [b][c] <> 2', ['b']) \
+        == 'assessment["a"] = "1" and b["c"] != 2'
+    assert redcap_to_python('[c1] + [a]', ['c1']) \
+        == 'calculations["c1"] + assessment["a"]'
+    # Checkbox references and quoted text are left as is
+    assert redcap_to_python('[q(1)] = "[a] <> x"') == '[q(1)] = "[a] <> x"'
+    assert parse('[a][b] + [c] * [d]').variables == set(['c', 'd'])
+
+
+def test_functions():
+    assert redcap_to_python('median([a], 2)') \
+        == 'rios.conversion.redcap.functions.median(assessment["a"], 2)'
+    assert redcap_to_python('sqrt(2) + other(1) and (1)') \
+        == 'math.sqrt(2) + other(1) and (1)'
+
+
+def test_powers():
+    assert redcap_to_python('(1 + [a])^(2)') \
+        == 'math.pow(1 + assessment["a"], 2)'
+    assert redcap_to_python('2^3^2') == 'math.pow(2, math.pow(3, 2))'
+    assert redcap_to_python('sqrt(4) ^ (a)') == 'math.pow(math.sqrt(4), a)'
+    assert redcap_to_python('((2)^(3))^(2)') \
+        == 'math.pow(math.pow(2, 3), 2)'
+    assert redcap_to_python('^2') == '^2'
+    value = eval(redcap_to_python('round((2)^(1 + 2)^(2), 0) + 1'), {
+        'math': math,
+        'rios': __import__('rios'),
+    })
+    assert value == 513
+
+
+def test_unbalanced():
+    assert redcap_to_python('min((1, 2)') == 'min((1, 2)'
+    assert redcap_to_python('1) + (2') == '1) + (2'
+
+
+def test_translation_cache():
+    text = '[x_cached] + mean([y_cached])'
+    assert redcap_to_python(text) == redcap_to_python(text, ['other'])
+    hits = expression._translated.hits
+    redcap_to_python(text, set(['unrelated']))
+    assert expression._translated.hits == hits + 1
+    assert redcap_to_python(text, ['x_cached']).startswith('calculations')
+
+
+def test_rexl_to_redcap():
+    assert rexl_to_redcap(
+        'assessment["a"] != 1 and t[\'b\'] + calculations[ "c" ]'
+    ) == '[a] <> 1 and [t][b] + [c]'
+    assert rexl_to_redcap(
+        'math.pow(assessment["a"], 2) + '
+        'rios.conversion.redcap.functions.mean(1, math.sqrt(4))'
+    ) == '([a])^(2) + mean(1, sqrt(4))'
+    assert rexl_to_redcap('math.pow(2, math.pow((1 + 2), 2))') \
+        == '(2)^(((1 + 2))^(2))'
+    # Quoted text, unknown functions, and other math.pow arities are left
+    # as is
+    assert rexl_to_redcap('assessment["x"] == "a != b" and f(1)') \
+        == '[x] == "a != b" and f(1)'
+    assert rexl_to_redcap('math.pow(1, 2, 3) + math.pow(1,') \
+        == 'math.pow(1, 2, 3) + math.pow(1,'
+    # Round trip of a REDCap calculation
+    text = 'round(([a]*10000)/(([b])^(2)),1) + [c][d]'
+    assert rexl_to_redcap(redcap_to_python(text)) == text
+
+    hits = expression._rexl_translated.hits
+    rexl_to_redcap('math.pow(2, math.pow((1 + 2), 2))')
+    assert expression._rexl_translated.hits == hits + 1
@@ -0,0 +1,69 @@
+from __future__ import print_function
+
+import io
+import os
+
+import simplejson
+import six
+
+from rios.conversion.utils import JsonReader, JsonScanner
+
+
+print("\n====== JSON READER TESTS ======")
+
+
+def test_json_scanner():
+    document = {
+        'skipped': {'a': ['"]}', u'\u00e9\\', {'b': [1.5, -2e3]}], 'c': None},
+        'kept': [True, 'x\\"y', {}],
+        'last': 'end',
+    }
+    text = simplejson.dumps(document, indent=1, sort_keys=True)
+    binary = simplejson.dumps(document, ensure_ascii=False).encode('utf-8')
+    for chunk_size in (1, 7, 1024):
+        scanner = JsonScanner(
+            io.StringIO(six.text_type(text)),
+            chunk_size=chunk_size,
+        )
+        seen = {}
+        for key in scanner.iter_object():
+            if key == 'skipped':
+                scanner.skip()
+            elif key == 'kept':
+                seen[key] = simplejson.loads(scanner.capture())
+            else:
+                seen[key] = scanner.decode()
+        assert seen == {'kept': document['kept'], 'last': 'end'}
+        assert scanner.next_char() is None
+        # Binary streams are decoded from UTF-8
+        scanner = JsonScanner(
+            io.BytesIO(binary),
+            chunk_size=chunk_size,
+        )
+        for key in scanner.iter_object():
+            assert scanner.decode() == document[key]
+    for text in (u'{"a": 1,}', u'[1, 2,]', u'{"a": [1}', u'{"a": "b'):
+        scanner = JsonScanner(io.StringIO(text))
+        if text.startswith('{'):
+            items = scanner.iter_object()
+        else:
+            items = scanner.iter_array()
+        try:
+            for _ in items:
+                scanner.skip()
+        except ValueError:
+            pass
+        else:
+            assert False, 'ValueError expected for %r' % text
+
+
+def test_unseekable_streams():
+    # Pipes have a seek method, which fails
+    for read in (
+            lambda stream: JsonReader.get_reader(stream),
+            lambda stream: JsonScanner(stream).decode()):
+        fd_in, fd_out = os.pipe()
+        with os.fdopen(fd_out, 'w') as stream:
+            stream.write('{"a": [1, 2]}')
+        with os.fdopen(fd_in, 'r') as stream:
+            assert read(stream) == {'a': [1, 2]}
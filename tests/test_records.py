@@ -0,0 +1,154 @@
+from __future__ import print_function
+
+import io
+import os
+
+import simplejson
+import six
+
+from rios.core import validate_assessment
+from rios.conversion import (
+    redcap_to_rios,
+    redcap_records_to_rios_assessments,
+)
+from rios.conversion.exception import ConversionFailureError
+from rios.conversion.utils import iter_json_array
+
+
+print("\n====== REDCAP RECORD TESTS ======")
+
+
+def instrument(name):
+    filename = os.path.join(os.path.dirname(__file__), 'redcap', name)
+    with open(filename, 'r') as stream:
+        package = redcap_to_rios(
+            id='urn:' + name.split('.')[0].replace('_', '-'),
+            title=name,
+            description='',
+            stream=stream,
+        )
+    return package['instrument']
+
+
+def convert(instrument, text, **kwargs):
+    return list(redcap_records_to_rios_assessments(
+        instrument,
+        io.StringIO(six.text_type(text)),
+        validate=True,
+        **kwargs
+    ))
+
+
+def test_iter_json_array():
+    items = [{'a': '1', 'b': [1, 2]}, {'a': ' ] , '}, 3, 'x', None]
+    text = simplejson.dumps(items, indent=2)
+    for chunk_size in (1, 7, 1024):
+        stream = io.StringIO(six.text_type(text))
+        assert list(iter_json_array(stream, chunk_size=chunk_size)) == items
+    assert list(iter_json_array(io.StringIO(u' [ ] '))) == []
+    assert list(iter_json_array(io.StringIO(u'{"a": 1}'))) == [{'a': 1}]
+    try:
+        list(iter_json_array(io.StringIO(u'[1 2]')))
+    except ValueError:
+        pass
+    else:
+        assert False, 'ValueError expected'
+
+
+def test_csv_records():
+    definition = instrument('complex_1.csv')
+    assessments = convert(definition, (
+        'study_id,redcap_event_name,date_enrolled,sex,'
+        'race___0,race___4,height,dob\n'
+        '1,baseline_arm_1,2016-01-02,0,1,1,150,\n'
+        '2,,,1,0,0,,\n'
+    ))
+    assert len(assessments) == 2
+    first, second = assessments
+    for assessment in assessments:
+        validate_assessment(assessment, instrument=definition)
+    assert first['meta'] == {
+        'redcapRecordId': '1',
+        'redcapEventName': 'baseline_arm_1',
+    }
+    values = first['values']
+    assert values['date_enrolled_demographic_characteristics']['value'] \
+        == '2016-01-02'
+    assert values['sex']['value'] == 'id_0'
+    assert values['race']['value'] == ['id_0', 'id_4']
+    assert values['height']['value'] == 150
+    assert values['dob']['value'] is None
+    assert values['email']['value'] is None
+    assert second['values']['race']['value'] is None
+    assert second['meta'] == {'redcapRecordId': '2'}
+
+
+def test_json_records():
+    definition = instrument('complex_1.csv')
+    text = simplejson.dumps([
+        {'study_id': '3', 'sex': '1', 'race___4': '1'},
+        {'study_id': '4', 'sex': '', 'race___4': '0'},
+    ])
+    first, second = convert(definition, text)
+    assert first['values']['sex']['value'] == 'id_1'
+    assert first['values']['race']['value'] == ['id_4']
+    assert second['values']['sex']['value'] is None
+    assert first == convert(definition, text, format='json')[0]
+
+
+def test_matrix_records():
+    definition = instrument('matrix_1.csv')
+    assessment, = convert(definition, (
+        'record_id,matrixrow1,matrixrow3\n'
+        '1,1,3\n'
+    ))
+    assert assessment['values']['matrixgroupname']['value'] == {
+        'matrixrow1': {'radio': {'value': 'id_1'}},
+        'matrixrow2': {'radio': {'value': None}},
+        'matrixrow3': {'radio': {'value': 'id_3'}},
+    }
+
+
+def test_shards():
+    definition = instrument('complex_1.csv')
+    text = 'study_id,sex\n' + ''.join(
+        '%d,%d\n' % (i // 2, i % 2)
+        for i in range(200)
+    )
+    everything = convert(definition, text)
+    shards = [convert(definition, text, shard=(i, 3)) for i in range(3)]
+    assert sorted(len(shard) for shard in shards)[0] > 0
+    assert sum(len(shard) for shard in shards) == len(everything)
+    for shard in shards:
+        for assessment in shard:
+            assert assessment in everything
+    # Both records with the same ID are in the same shard
+    for shard in shards:
+        ids = [a['meta']['redcapRecordId'] for a in shard]
+        assert all(ids.count(record_id) == 2 for record_id in ids)
+    # Records can't be sharded without their IDs
+    try:
+        convert(definition, 'sex\n0\n1\n', shard=(0, 2))
+    except ConversionFailureError as exc:
+        assert 'record ID column' in str(exc)
+    else:
+        assert False, 'ConversionFailureError expected'
+    assert len(convert(definition, 'sex\n0\n1\n')) == 2
+
+
+def test_record_errors():
+    definition = instrument('complex_1.csv')
+    for text in ('study_id,sex\n9,7\n', 'study_id,height\n9,tall\n'):
+        try:
+            convert(definition, text)
+        except ConversionFailureError as exc:
+            assert 'Unable to convert REDCap record:' in str(exc)
+            assert '9' in str(exc)
+        else:
+            assert False, 'ConversionFailureError expected'
+    try:
+        convert(definition, 'study_id\n1\n', shard=(3, 3))
+    except ConversionFailureError as exc:
+        assert 'Invalid shard' in str(exc)
+    else:
+        assert False, 'ConversionFailureError expected'
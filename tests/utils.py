@@ -8,6 +8,17 @@ import yaml
 import six
 
 
+REDCAP_HEADER = (
+    'Variable / Field Name,Form Name,Section Header,Field Type,'
+    'Field Label,"Choices, Calculations, OR Slider Labels",'
+    'Field Note,Text Validation Type OR Show Slider Number,'
+    'Text Validation Min,Text Validation Max,Identifier?,'
+    'Branching Logic (Show field only if...),Required Field?,'
+    'Custom Alignment,Question Number (surveys only),'
+    'Matrix Group Name\n'
+)
+
+
 def flatten(array):
     result = []
     for x in array: